@@ -1,38 +1,295 @@
-from django.contrib import admin
-from .models import Medicine, Pharmacist, CashBox
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.template.response import TemplateResponse
+from .batches import opening_batch
+from .bulk import StockChanged, adjust_stock, mark_expired, reprice_medicines
+from .expiry_calendar import forget_medicines
+from .expressions import MEDICINE_STATUSES, medicine_status, medicine_status_filter
+from .models import (
+    Medicine, Pharmacist, CashBox, Checkout, Sale, StockBatch, ExpiryPurge, ArchivedMedicine,
+    PriceChange, PriceChangeLine,
+)
+from .stats import medicine_categories
+
+
 @admin.register(CashBox)
 class CashBoxAdmin(admin.ModelAdmin):
-    list_display = ['id', 'current_cash', 'last_updated']
-    readonly_fields = ['last_updated']
+    list_display = ['id', 'current_cash', 'rolled_up_to', 'get_balance', 'last_updated']
+    readonly_fields = ['rolled_up_to', 'last_updated']
+    
+    def get_balance(self, obj):
+        return obj.balance
+    get_balance.short_description = 'Balance'
+
+
+@admin.register(Sale)
+class SaleAdmin(admin.ModelAdmin):
+    list_display = ['id', 'medicine_name', 'quantity', 'unit_price', 'total', 'checkout', 'sold_by', 'sold_at']
+    list_select_related = ['sold_by', 'checkout']
+    search_fields = ['medicine_name']
+    date_hierarchy = 'sold_at'
+    ordering = ['-id']
+    list_per_page = 50
+    readonly_fields = ['medicine', 'checkout', 'medicine_name', 'category', 'quantity', 'unit_price', 'total', 'sold_by', 'sold_at']
+    
+    def has_add_permission(self, request):
+        # The ledger is append-only through the sale path
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class SaleInline(admin.TabularInline):
+    model = Sale
+    fields = ['medicine_name', 'quantity', 'unit_price', 'total']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Checkout)
+class CheckoutAdmin(admin.ModelAdmin):
+    list_display = ['id', 'line_count', 'total', 'sold_by', 'created_at']
+    list_select_related = ['sold_by']
+    date_hierarchy = 'created_at'
+    ordering = ['-id']
+    list_per_page = 50
+    readonly_fields = ['total', 'line_count', 'sold_by', 'created_at']
+    inlines = [SaleInline]
+    
+    def has_add_permission(self, request):
+        # Checkouts are recorded by the checkout page only
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class StockBatchInline(admin.TabularInline):
+    model = StockBatch
+    fields = ['lot_number', 'quantity', 'manufacture_date', 'expiry_date', 'received_at']
+    readonly_fields = fields
+    ordering = ['expiry_date', 'id']
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        # Lots are received through the Receive Stock page
+        return False
+
+
+class StatusFilter(admin.SimpleListFilter):
+    """The medicine status, filtered on the expiry and stock columns"""
+    title = 'status'
+    parameter_name = 'status'
+    
+    def lookups(self, request, model_admin):
+        return [(status, status) for status in MEDICINE_STATUSES]
+    
+    def queryset(self, request, queryset):
+        if self.value() in MEDICINE_STATUSES:
+            return queryset.filter(medicine_status_filter(self.value()))
+        return queryset
+
+
+class CategoryFilter(admin.SimpleListFilter):
+    """Category choices from the cached category list, not a DISTINCT per page"""
+    title = 'category'
+    parameter_name = 'category'
+    
+    def lookups(self, request, model_admin):
+        return [(category, category) for category in medicine_categories()]
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(category=self.value())
+        return queryset
+
+
+class AdjustStockForm(forms.Form):
+    units = forms.IntegerField(help_text='Units to add to each medicine; negative to take them away.')
+    
+    def clean_units(self):
+        units = self.cleaned_data['units']
+        if units == 0:
+            raise forms.ValidationError('Adjust stock by a non-zero number of units.')
+        return units
+
+
+class RepriceForm(forms.Form):
+    percent = forms.DecimalField(
+        max_digits=5, decimal_places=2, min_value=-99.99,
+        help_text='Percentage change: 5 raises prices 5%, -10 cuts them 10%.',
+    )
+
+
+class ConfirmForm(forms.Form):
+    pass
 
 
 @admin.register(Medicine)
 class MedicineAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'category', 'price', 'stock_quantity', 'expiry_date', 'get_status']
-    list_filter = ['category', 'expiry_date']
+    list_filter = [StatusFilter, CategoryFilter, 'expiry_date']
     search_fields = ['name', 'category']
     ordering = ['-id']
     list_per_page = 25
+    # Filtered pages count their own rows only, not the whole catalog again
+    show_full_result_count = False
+    inlines = [StockBatchInline]
+    actions = ['adjust_stock_action', 'reprice_action', 'mark_expired_action']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(status=medicine_status())
+    
+    def get_readonly_fields(self, request, obj=None):
+        # Maintained from the lots once there are any
+        if obj is not None and obj.batches.exists():
+            return ['stock_quantity', 'expiry_date']
+        return []
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change and obj.stock_quantity > 0:
+            opening_batch(obj).save()
+    
+    def delete_model(self, request, obj):
+        forget_medicines([obj.pk])
+        super().delete_model(request, obj)
+    
+    def delete_queryset(self, request, queryset):
+        forget_medicines(list(queryset.values_list('pk', flat=True)))
+        super().delete_queryset(request, queryset)
     
     def get_status(self, obj):
-        from datetime import date
-        if obj.expiry_date < date.today():
-            return "Expired"
-        elif obj.stock_quantity == 0:
-            return "Out of Stock"
-        elif obj.stock_quantity <= 10:
-            return "Low Stock"
-        return "Active"
+        return obj.status
     get_status.short_description = 'Status'
+    get_status.admin_order_field = 'status'
+    
+    def bulk_action(self, request, queryset, form_class, title, apply):
+        """
+        Show `form_class` for the selected medicines, then run
+        apply(medicine_ids, cleaned_data) on them once it is submitted.
+        """
+        form = form_class(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            medicine_ids = queryset.order_by().values_list('pk', flat=True)
+            try:
+                self.message_user(request, apply(medicine_ids, form.cleaned_data), messages.SUCCESS)
+            except (StockChanged, ValueError) as error:
+                self.message_user(request, str(error), messages.ERROR)
+            return None
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': title,
+            'form': form,
+            'count': queryset.count(),
+            'preview': queryset[:10],
+            'action': request.POST.get('action'),
+            'select_across': request.POST.get('select_across', '0'),
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/inventory/medicine/bulk_action.html', context)
+    
+    def adjust_stock_action(self, request, queryset):
+        def apply(medicine_ids, data):
+            adjusted, skipped = adjust_stock(medicine_ids, data['units'])
+            note = f' {skipped} had fewer than {-data["units"]} units and were left alone.' if skipped else ''
+            return f'Adjusted the stock of {adjusted} medicine(s) by {data["units"]:+d} units.{note}'
+        return self.bulk_action(request, queryset, AdjustStockForm, 'Adjust stock', apply)
+    adjust_stock_action.short_description = 'Adjust stock of selected medicines'
+    
+    def reprice_action(self, request, queryset):
+        def apply(medicine_ids, data):
+            change = reprice_medicines(medicine_ids, percent=data['percent'], changed_by=request.user)
+            return f'Repriced {change.medicines} medicine(s) by {change.adjustment}.'
+        return self.bulk_action(request, queryset, RepriceForm, 'Reprice', apply)
+    reprice_action.short_description = 'Reprice selected medicines'
+    
+    def mark_expired_action(self, request, queryset):
+        def apply(medicine_ids, data):
+            return f'Marked {mark_expired(medicine_ids)} medicine(s) as expired.'
+        return self.bulk_action(request, queryset, ConfirmForm, 'Mark as expired', apply)
+    mark_expired_action.short_description = 'Mark selected medicines as expired'
+
+
+@admin.register(ExpiryPurge)
+class ExpiryPurgeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'cutoff', 'status', 'archived', 'kept', 'total', 'started_by', 'created_at', 'finished_at']
+    list_filter = ['status']
+    list_select_related = ['started_by']
+    ordering = ['-id']
+    readonly_fields = ['cutoff', 'status', 'total', 'archived', 'kept', 'error', 'started_by', 'created_at', 'updated_at', 'finished_at']
+    
+    def has_add_permission(self, request):
+        # Purges are started from the expired stock page or manage.py purge_expired
+        return False
+
+
+@admin.register(ArchivedMedicine)
+class ArchivedMedicineAdmin(admin.ModelAdmin):
+    list_display = ['original_id', 'name', 'category', 'stock_quantity', 'expiry_date', 'purge', 'archived_at']
+    list_filter = ['category']
+    search_fields = ['name', 'category']
+    ordering = ['-id']
+    list_per_page = 50
+    readonly_fields = ['original_id', 'name', 'category', 'price', 'stock_quantity', 'manufacture_date', 'expiry_date', 'purge', 'archived_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PriceChange)
+class PriceChangeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'get_adjustment', 'category', 'expires_from', 'expires_to', 'medicines', 'changed_by', 'created_at']
+    list_select_related = ['changed_by']
+    readonly_fields = ['percent', 'amount', 'category', 'expires_from', 'expires_to', 'medicines', 'changed_by', 'created_at']
+
+    def get_adjustment(self, obj):
+        return obj.adjustment
+    get_adjustment.short_description = 'Change'
+
+    def has_add_permission(self, request):
+        # Prices are changed from the bulk repricing page or manage.py reprice_medicines
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PriceChangeLine)
+class PriceChangeLineAdmin(admin.ModelAdmin):
+    """Audit rows; a chain-wide change has one per medicine, so no inline on PriceChange"""
+    list_display = ['id', 'change', 'medicine_name', 'old_price', 'new_price']
+    list_select_related = ['change']
+    search_fields = ['medicine_name']
+    ordering = ['-id']
+    show_full_result_count = False
+    readonly_fields = ['change', 'medicine', 'medicine_name', 'old_price', 'new_price']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Pharmacist)
 class PharmacistAdmin(admin.ModelAdmin):
     list_display = ['employee_id', 'get_full_name', 'phone_number', 'date_of_joining', 'qualification']
     search_fields = ['employee_id', 'user__first_name', 'user__last_name', 'phone_number']
+    list_select_related = ['user']
     ordering = ['employee_id']
     list_per_page = 25
     
     def get_full_name(self, obj):
         return obj.user.get_full_name() or obj.user.username
     get_full_name.short_description = 'Full Name'
+    get_full_name.admin_order_field = 'user__first_name'
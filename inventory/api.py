@@ -0,0 +1,118 @@
+"""
+Async JSON read API for tills, scanners and other POS clients.
+
+The views are coroutines on the async ORM, so under ASGI
+(pharmacy_pro.asgi) one worker serves many concurrent clients from its
+event loop instead of holding a thread per request. They answer JSON only,
+including errors: an anonymous client gets a 401, not a login redirect.
+"""
+import functools
+from datetime import date
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from .batches import in_stock_batches
+from .expressions import DaysUntil, medicine_status
+from .filters import filter_medicines
+from .models import Medicine
+from .pagination import KeysetPaginator
+from .stats import LOW_STOCK_THRESHOLD, aget_inventory_stats
+from .versioning import inventory_conditional
+
+
+MEDICINE_FIELDS = [
+    'id', 'name', 'category', 'price', 'stock_quantity',
+    'manufacture_date', 'expiry_date', 'days_until_expiry', 'status',
+]
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Medicines per stock status request, e.g. one scanned basket.
+MAX_STOCK_IDS = 100
+
+
+def api_login_required(view):
+    """login_required for API coroutines: 401 JSON instead of a redirect"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def medicine_rows(queryset, today):
+    """Named MEDICINE_FIELDS rows, with status and days until expiry computed by the database"""
+    return queryset.annotate(
+        days_until_expiry=DaysUntil('expiry_date', today=today),
+        status=medicine_status(today),
+    ).values_list(*MEDICINE_FIELDS, named=True)
+
+
+@require_GET
+@api_login_required
+@inventory_conditional
+async def medicine_list(request):
+    """Medicines with the medicine list filters (q, category, status), paged by ?after= cursors"""
+    try:
+        limit = min(max(int(request.GET.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = API_PAGE_SIZE
+    today = date.today()
+    queryset, filters = filter_medicines(Medicine.objects.all(), request.GET, today)
+    page = await KeysetPaginator(medicine_rows(queryset, today), limit).apage(after=request.GET.get('after'))
+    return JsonResponse({
+        'filters': filters,
+        'results': [row._asdict() for row in page],
+        'next': page.next_cursor,
+    })
+
+
+@require_GET
+@api_login_required
+@inventory_conditional
+async def medicine_detail(request, pk):
+    """One medicine and its lots in stock, first-expiring first"""
+    row = await medicine_rows(Medicine.objects.filter(pk=pk), date.today()).afirst()
+    if row is None:
+        return JsonResponse({'error': 'Medicine not found'}, status=404)
+    lots = [lot async for lot in in_stock_batches(pk).values('lot_number', 'quantity', 'expiry_date')]
+    return JsonResponse({**row._asdict(), 'lots': lots})
+
+
+@require_GET
+@api_login_required
+@inventory_conditional
+async def stock_status(request):
+    """Stock and status of several medicines at once: ?id=1&id=2..."""
+    try:
+        ids = list(dict.fromkeys(int(value) for value in request.GET.getlist('id')))
+    except ValueError:
+        return JsonResponse({'error': 'Every id must be an integer'}, status=400)
+    if not ids or len(ids) > MAX_STOCK_IDS:
+        return JsonResponse({'error': f'Give between 1 and {MAX_STOCK_IDS} ids'}, status=400)
+
+    rows = medicine_rows(Medicine.objects.filter(pk__in=ids), date.today())
+    found = {row.id: row async for row in rows}
+    return JsonResponse({
+        'results': [
+            {
+                'id': pk,
+                'stock_quantity': found[pk].stock_quantity,
+                'expiry_date': found[pk].expiry_date,
+                'status': found[pk].status,
+            }
+            for pk in ids if pk in found
+        ],
+        'missing': [pk for pk in ids if pk not in found],
+    })
+
+
+@require_GET
+@api_login_required
+@inventory_conditional
+async def inventory_stats(request):
+    """The dashboard counters, read from the stock level and expiry counters the writes keep current"""
+    stats = await aget_inventory_stats()
+    return JsonResponse({**stats, 'low_stock_threshold': LOW_STOCK_THRESHOLD, 'date': date.today()})
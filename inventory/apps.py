@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from django.core import checks
+        from . import signals  # noqa: F401
+        from .assets import check_vendored_assets
+        checks.register(check_vendored_assets, checks.Tags.staticfiles)
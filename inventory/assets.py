@@ -0,0 +1,302 @@
+"""
+Self-hosted static assets.
+
+Bootstrap and Bootstrap Icons are vendored under inventory/static/vendor by
+`manage.py vendor_assets`, which checks every download against the sha384
+pinned for it in VENDOR_LOCK. Vendoring is a required build step: the
+inventory.E001 system check fails while a file is missing, and pages never
+fall back to a CDN. collectstatic then strips the CSS rules no
+template or script uses from the vendored stylesheets, fingerprints every
+file (ManifestStaticFilesStorage) and writes .gz and, with brotli
+installed, .br copies of the hashed text assets. serve_static() sends
+those files with year-long immutable cache headers, so pages make no
+requests to a CDN and repeat visits fetch nothing.
+"""
+import gzip
+import json
+import mimetypes
+import re
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.contrib.staticfiles.views import serve as serve_found
+from django.core import checks
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.template import engines
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # optional; without it only .gz copies are written
+    brotli = None
+
+
+BOOTSTRAP_CDN = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/'
+BOOTSTRAP_ICONS_CDN = 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/'
+
+# Static path of each vendored file, and the pinned build it is fetched from.
+VENDOR_FILES = {
+    'vendor/bootstrap/bootstrap.min.css': BOOTSTRAP_CDN + 'css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': BOOTSTRAP_CDN + 'js/bootstrap.bundle.min.js',
+    'vendor/bootstrap-icons/bootstrap-icons.css': BOOTSTRAP_ICONS_CDN + 'bootstrap-icons.css',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2': BOOTSTRAP_ICONS_CDN + 'fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff': BOOTSTRAP_ICONS_CDN + 'fonts/bootstrap-icons.woff',
+}
+
+VENDOR_ROOT = Path(__file__).resolve().parent / 'static'
+
+# {static path: 'sha384-...'} of each file as downloaded, before the source
+# map comment is stripped; the same value as a Subresource Integrity hash.
+VENDOR_LOCK = Path(__file__).resolve().parent / 'vendor-lock.json'
+
+
+def vendor_pins():
+    return json.loads(VENDOR_LOCK.read_text())
+
+
+def check_vendored_assets(app_configs=None, **kwargs):
+    """inventory.E001 for every vendored file that has not been downloaded"""
+    return [
+        checks.Error(
+            f'The vendored asset {path} is missing.',
+            hint='Run manage.py vendor_assets to download the pinned builds.',
+            obj=str(VENDOR_ROOT / path),
+            id='inventory.E001',
+        )
+        for path in VENDOR_FILES
+        if not (VENDOR_ROOT / path).is_file()
+    ]
+
+# Stylesheets collectstatic strips down to the rules in use.
+PURGED_CSS = {'vendor/bootstrap/bootstrap.min.css', 'vendor/bootstrap-icons/bootstrap-icons.css'}
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+
+# Matches the fingerprint ManifestStaticFilesStorage adds to file names.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# At-rules whose block holds style rules, stripped like the top level.
+NESTED_AT_RULES = ('@media', '@supports', '@container', '@layer')
+
+WORD = re.compile(r'[A-Za-z_][\w-]*')
+# A class name completed at render time: alert-{{ message.tags }}, `bs-${name}`, "carousel-item-"+order
+DYNAMIC_PREFIX = re.compile(r'([A-Za-z_][\w-]*-)(?=\{\{|\{%|\$\{|["\'`])')
+SELECTOR_CLASS = re.compile(r'\.(-?[A-Za-z_][\w-]*)')
+
+
+def _string_end(css, start):
+    """Index just past the CSS string opening at `start`"""
+    quote, i = css[start], start + 1
+    while i < len(css) and css[i] != quote:
+        i += 2 if css[i] == '\\' else 1
+    return i + 1
+
+
+def _rules(css):
+    """(prelude, block) of each top-level rule; block is None for statements and kept /*! comments */"""
+    rules, depth, start, block_start, i = [], 0, 0, 0, 0
+    while i < len(css):
+        char = css[i]
+        if char in '"\'':
+            i = _string_end(css, i)
+            continue
+        if css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            end = len(css) if end == -1 else end + 2
+            if depth == 0 and not css[start:i].strip():
+                if css.startswith('/*!', i):
+                    rules.append((css[i:end], None))
+                start = end
+            i = end
+            continue
+        if char == '{':
+            if depth == 0:
+                block_start = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:block_start].strip(), css[block_start + 1:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            rules.append((css[start:i + 1].strip(), None))
+            start = i + 1
+        i += 1
+    return rules
+
+
+def _selectors(prelude):
+    """The comma-separated selectors of a rule, commas inside () and [] left alone"""
+    selectors, depth, start, i = [], 0, 0, 0
+    while i < len(prelude):
+        char = prelude[i]
+        if char in '"\'':
+            i = _string_end(prelude, i)
+            continue
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+        i += 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def _selector_classes(selector):
+    """Classes an element must carry to match; :not(), :is() and attribute parts are ignored"""
+    selector = re.sub(r'\[[^\]]*\]', '', selector)
+    while '(' in selector:
+        stripped = re.sub(r'\([^()]*\)', '', selector)
+        if stripped == selector:
+            break
+        selector = stripped
+    return SELECTOR_CLASS.findall(selector)
+
+
+def strip_unused_css(css, words, prefixes=()):
+    """
+    `css` without the style rules whose selectors all need a class that is
+    not in `words` and starts with none of `prefixes`. At-rules other than
+    NESTED_AT_RULES (@font-face, @keyframes...) are kept as they are.
+    """
+    prefixes = tuple(prefixes)
+
+    def used(selector):
+        return all(name in words or name.startswith(prefixes) for name in _selector_classes(selector))
+
+    kept = []
+    for prelude, block in _rules(css):
+        if block is None:
+            kept.append(prelude)
+        elif prelude.lower().startswith(NESTED_AT_RULES):
+            inner = strip_unused_css(block, words, prefixes)
+            if inner:
+                kept.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            kept.append(f'{prelude}{{{block}}}')
+        else:
+            selectors = [selector for selector in _selectors(prelude) if used(selector)]
+            if selectors:
+                kept.append(f'{",".join(selectors)}{{{block}}}')
+    return ''.join(kept)
+
+
+def content_words():
+    """
+    (words, dynamic class prefixes) of every template and script, the class
+    names pages can use. Bootstrap's own script is scanned too, which keeps
+    the classes it toggles at runtime (show, collapsing, modal-open...).
+    """
+    sources = []
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            sources.extend(Path(directory).rglob('*.html'))
+    for finder in finders.get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            if path.endswith('.js'):
+                sources.append(Path(storage.path(path)))
+
+    words, prefixes = set(), set()
+    for source in sources:
+        text = source.read_text(encoding='utf-8', errors='ignore')
+        words.update(WORD.findall(text))
+        prefixes.update(DYNAMIC_PREFIX.findall(text))
+    return words, prefixes
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that strips the vendored stylesheets down to
+    the rules in use before fingerprinting them, and writes precompressed
+    copies of the hashed text assets for serve_static().
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            self._strip_unused_css(paths)
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for name in set(self.hashed_files.values()):
+                if name.endswith(COMPRESSIBLE):
+                    self._compress(name)
+
+    def _strip_unused_css(self, paths):
+        # Strips from the source every run, so a rule a template starts
+        # using comes back even when the vendored file itself is unchanged
+        words, prefixes = content_words()
+        for name in PURGED_CSS.intersection(paths):
+            storage, path = paths[name]
+            with storage.open(path) as source:
+                css = strip_unused_css(source.read().decode(), words, prefixes)
+            self.delete(name)
+            self.save(name, ContentFile(css.encode()))
+            paths[name] = (self, name)
+
+    def _compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(content):
+                self.delete(name + suffix)
+                self.save(name + suffix, ContentFile(compressed))
+
+
+def _accepted_encodings(request):
+    header = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip() for part in header.split(',')}
+
+
+def serve_static(request, path):
+    """
+    Collected static files, for deployments without a web server in front
+    of the app. Fingerprinted names are cached for a year as immutable, and
+    the .br or .gz copy is sent to clients that accept it.
+    """
+    if settings.DEBUG:
+        # Straight from the app directories, as runserver does
+        return serve_found(request, path)
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404('Not found')
+    if not fullpath.is_file():
+        raise Http404('Not found')
+
+    served, encoding = fullpath, None
+    accepted = _accepted_encodings(request)
+    for name, suffix in [('br', '.br'), ('gzip', '.gz')]:
+        variant = fullpath.with_name(fullpath.name + suffix)
+        if name in accepted and variant.is_file():
+            served, encoding = variant, name
+            break
+
+    modified = served.stat().st_mtime
+    if not was_modified_since(request.headers.get('If-Modified-Since'), modified):
+        response = HttpResponseNotModified()
+    else:
+        content_type, _ = mimetypes.guess_type(fullpath.name)
+        response = FileResponse(
+            served.open('rb'), content_type=content_type or 'application/octet-stream', filename=fullpath.name,
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.headers['Last-Modified'] = http_date(modified)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if HASHED_NAME.search(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
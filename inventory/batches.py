@@ -0,0 +1,188 @@
+from collections import defaultdict
+from datetime import date
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from .models import Medicine, StockBatch
+from .expiry_calendar import CalendarDelta
+from .stock_levels import StockDelta
+from .versioning import bump_inventory_version
+
+
+# Lot number given to stock that was entered without one.
+OPENING_LOT = 'OPENING'
+
+# Lots read per query while allocating a sale. Almost every sale is covered
+# by the first lot or two.
+ALLOCATION_CHUNK = 4
+
+
+def in_stock_batches(medicine_id):
+    """Lots of a medicine still holding stock, first-expiring first (stockbatch_fefo_idx)"""
+    return StockBatch.objects.filter(medicine_id=medicine_id, quantity__gt=0).order_by('expiry_date', 'id')
+
+
+def opening_batch(medicine, lot_number=None):
+    """Unsaved lot holding a new medicine's whole stock, for create() or bulk_create()"""
+    return StockBatch(
+        medicine=medicine,
+        lot_number=lot_number or OPENING_LOT,
+        quantity=medicine.stock_quantity,
+        manufacture_date=medicine.manufacture_date,
+        expiry_date=medicine.expiry_date,
+    )
+
+
+def receive_batch(medicine, lot_number, quantity, manufacture_date, expiry_date):
+    """
+    Add a received lot to a medicine and raise its totals to match.
+
+    The stock total goes up by `quantity`; the medicine's expiry becomes the
+    lot's when it is the first to expire (or the medicine was out of stock).
+    Returns the new StockBatch.
+    """
+    if quantity <= 0:
+        raise ValueError('Received quantity must be greater than 0.')
+
+    with transaction.atomic():
+        # The insert comes first so the read below happens under the write lock
+        batch = StockBatch.objects.create(
+            medicine=medicine,
+            lot_number=lot_number or OPENING_LOT,
+            quantity=quantity,
+            manufacture_date=manufacture_date,
+            expiry_date=expiry_date,
+        )
+        stock, current_expiry = Medicine.objects.filter(pk=medicine.pk).values_list('stock_quantity', 'expiry_date').get()
+        new_expiry = expiry_date if stock <= 0 else min(current_expiry, expiry_date)
+        Medicine.objects.filter(pk=medicine.pk).update(
+            expiry_date=new_expiry,
+            stock_quantity=F('stock_quantity') + quantity,
+        )
+        delta = CalendarDelta()
+        delta.move_medicine(current_expiry, new_expiry)
+        delta.apply()
+        levels = StockDelta()
+        levels.move(stock, stock + quantity)
+        levels.apply()
+    return batch
+
+
+def allocate_batches(medicine_id, quantity):
+    """
+    Take `quantity` units from a medicine's lots, first-expiring first.
+
+    Only the lots consumed are read and written: lots are fetched
+    ALLOCATION_CHUNK at a time along stockbatch_fefo_idx until the quantity
+    is covered. Units not covered by any lot (stock entered before lots were
+    kept, or set directly) come out of that unbatched remainder.
+
+    Must run inside the sale's transaction, after its stock check. Returns
+    (expiry date of the first lot left in stock or None, [(expiry date,
+    units taken)] of the lots consumed).
+    """
+    remaining = quantity
+    taken = []
+    emptied = []
+    partial = None
+    next_expiry = None
+    exhausted = False
+    lots = in_stock_batches(medicine_id).values_list('pk', 'quantity', 'expiry_date')
+    after = None
+    while remaining and not exhausted:
+        chunk = lots
+        if after is not None:
+            chunk = chunk.filter(
+                Q(expiry_date__gt=after[1]) | Q(expiry_date=after[1], pk__gt=after[0])
+            )
+        chunk = list(chunk[:ALLOCATION_CHUNK])
+        exhausted = len(chunk) < ALLOCATION_CHUNK
+        for pk, available, expiry in chunk:
+            if not remaining:
+                next_expiry = expiry
+                break
+            if available <= remaining:
+                emptied.append(pk)
+                taken.append((expiry, available))
+                remaining -= available
+            else:
+                partial = (pk, remaining)
+                taken.append((expiry, remaining))
+                remaining = 0
+                next_expiry = expiry
+                break
+        if chunk:
+            after = (pk, expiry)
+
+    if emptied:
+        StockBatch.objects.filter(pk__in=emptied).update(quantity=0)
+    if partial is not None:
+        StockBatch.objects.filter(pk=partial[0]).update(quantity=F('quantity') - partial[1])
+    if next_expiry is None and not exhausted:
+        # The sale used up the last lot of a full chunk; there may be more
+        next_expiry = in_stock_batches(medicine_id).values_list('expiry_date', flat=True).first()
+    return next_expiry, taken
+
+
+def consume_stock(medicine, quantity):
+    """
+    Allocate a sale of `quantity` units of `medicine` to its lots, move the
+    medicine's expiry on to the next lot once one runs out, and take the
+    units off the expiry calendar and the stock level counters.
+
+    `medicine` must already show the decremented stock. Runs inside the
+    sale's transaction.
+    """
+    next_expiry, taken = allocate_batches(medicine.pk, quantity)
+    delta = CalendarDelta()
+    for expiry, units in taken:
+        delta.stock(expiry, -units, medicine.price)
+    if next_expiry is not None and next_expiry != medicine.expiry_date:
+        Medicine.objects.filter(pk=medicine.pk).update(expiry_date=next_expiry)
+        delta.move_medicine(medicine.expiry_date, next_expiry)
+        medicine.expiry_date = next_expiry
+    delta.apply()
+    levels = StockDelta()
+    levels.move(medicine.stock_quantity + quantity, medicine.stock_quantity)
+    levels.apply()
+
+
+def write_off_expired_batches(medicine_ids, cutoff=None):
+    """
+    Empty the lots of these medicines that expire before `cutoff` (default
+    today), taking them out of stock and moving each medicine's expiry on
+    to its first lot still in stock. Returns the units written off.
+    """
+    cutoff = cutoff or date.today()
+    expired = StockBatch.objects.filter(medicine_id__in=medicine_ids, quantity__gt=0, expiry_date__lt=cutoff)
+    delta = CalendarDelta()
+    written_off = defaultdict(int)
+    for medicine_id, expiry, price, units in (
+        expired.values('medicine_id', 'expiry_date', 'medicine__price').annotate(units=Sum('quantity'))
+        .values_list('medicine_id', 'expiry_date', 'medicine__price', 'units')
+    ):
+        written_off[medicine_id] += units
+        delta.stock(expiry, -units, price)
+    expired.update(quantity=0)
+    current = {
+        pk: (expiry_date, stock)
+        for pk, expiry_date, stock in Medicine.objects.filter(pk__in=medicine_ids).values_list('pk', 'expiry_date', 'stock_quantity')
+    }
+    levels = StockDelta()
+    for medicine_id in medicine_ids:
+        if medicine_id not in current:
+            continue
+        changes = {}
+        current_expiry, stock = current[medicine_id]
+        if written_off.get(medicine_id):
+            changes['stock_quantity'] = F('stock_quantity') - written_off[medicine_id]
+            levels.move(stock, stock - written_off[medicine_id])
+        next_expiry = in_stock_batches(medicine_id).values_list('expiry_date', flat=True).first()
+        if next_expiry is not None:
+            changes['expiry_date'] = next_expiry
+            delta.move_medicine(current_expiry, next_expiry)
+        if changes:
+            Medicine.objects.filter(pk=medicine_id).update(**changes)
+    delta.apply()
+    levels.apply()
+    bump_inventory_version()
+    return sum(written_off.values())
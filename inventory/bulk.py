@@ -0,0 +1,243 @@
+"""
+Changes to many medicines at once, for the admin's bulk actions.
+
+Each change runs as a few set-based statements per BULK_BATCH_SIZE
+medicines (repricing as a few statements in all) instead of a save() per
+medicine, and moves the expiry calendar by the same deltas the
+single-medicine paths do. Price changes leave an audit trail of old and
+new prices in PriceChangeLine.
+"""
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from django.db import connections, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Round
+from .batches import consume_stock
+from .expiry_calendar import CENT, CalendarDelta
+from .models import Medicine, PriceChange, PriceChangeLine, StockBatch
+from .stock_levels import StockDelta
+from .versioning import bump_inventory_version
+
+
+# Medicines per round of statements; keeps IN lists under SQLite's limits.
+BULK_BATCH_SIZE = 500
+
+# Lot number of stock added by a bulk adjustment.
+ADJUSTMENT_LOT = 'ADJUSTMENT'
+
+# Lowest price a bulk price change may leave a medicine at.
+MIN_PRICE = Decimal('0.01')
+
+
+class StockChanged(Exception):
+    """Raised when sales took stock a bulk removal had counted on"""
+
+
+def _batches(medicine_ids):
+    for start in range(0, len(medicine_ids), BULK_BATCH_SIZE):
+        yield medicine_ids[start:start + BULK_BATCH_SIZE]
+
+
+def adjust_stock(medicine_ids, units):
+    """
+    Add `units` to the stock of each medicine, or take them away when
+    negative. Added units go into one new lot per medicine that expires with
+    the medicine; removed units come out of its lots first-expiring first,
+    and medicines holding fewer units are left alone.
+
+    Returns (adjusted, skipped). Raises StockChanged if a sale took stock
+    being removed mid-way, in which case nothing is adjusted.
+    """
+    if units == 0:
+        raise ValueError('Adjust stock by a non-zero number of units.')
+    medicine_ids = list(medicine_ids)
+    adjusted = 0
+    with transaction.atomic():
+        for batch in _batches(medicine_ids):
+            adjusted += _add_stock(batch, units) if units > 0 else _remove_stock(batch, -units)
+        bump_inventory_version()
+    return adjusted, len(medicine_ids) - adjusted
+
+
+def _add_stock(batch, units):
+    # Update first, so the stock read below is taken under the write lock
+    Medicine.objects.filter(pk__in=batch).update(stock_quantity=F('stock_quantity') + units)
+    medicines = list(
+        Medicine.objects.filter(pk__in=batch).values_list('pk', 'price', 'manufacture_date', 'expiry_date', 'stock_quantity')
+    )
+    StockBatch.objects.bulk_create([
+        StockBatch(
+            medicine_id=pk,
+            lot_number=ADJUSTMENT_LOT,
+            quantity=units,
+            manufacture_date=manufacture_date,
+            expiry_date=expiry_date,
+        )
+        for pk, _, manufacture_date, expiry_date, _ in medicines
+    ])
+    delta = CalendarDelta()
+    levels = StockDelta()
+    for _, price, _, expiry_date, stock in medicines:
+        delta.stock(expiry_date, units, price)
+        levels.move(stock - units, stock)
+    delta.apply()
+    levels.apply()
+    return len(medicines)
+
+
+def _remove_stock(batch, units):
+    medicines = list(Medicine.objects.filter(pk__in=batch, stock_quantity__gte=units))
+    # Conditional like a sale, so stock sold since the read above is noticed
+    updated = Medicine.objects.filter(
+        pk__in=[medicine.pk for medicine in medicines], stock_quantity__gte=units
+    ).update(stock_quantity=F('stock_quantity') - units)
+    if updated != len(medicines):
+        raise StockChanged('Stock changed while it was being adjusted. Please try again.')
+    # Lots are allocated per medicine, as a sale of `units` would be, from
+    # the stock as updated under the write lock
+    stock = dict(Medicine.objects.filter(pk__in=[medicine.pk for medicine in medicines]).values_list('pk', 'stock_quantity'))
+    for medicine in medicines:
+        medicine.stock_quantity = stock[medicine.pk]
+        consume_stock(medicine, units)
+    return len(medicines)
+
+
+def price_change_medicines(category='', expires_from=None, expires_to=None):
+    """The medicines a price change limited to a category and expiry window applies to"""
+    medicines = Medicine.objects.all()
+    if category:
+        medicines = medicines.filter(category=category)
+    if expires_from:
+        medicines = medicines.filter(expiry_date__gte=expires_from)
+    if expires_to:
+        medicines = medicines.filter(expiry_date__lte=expires_to)
+    return medicines
+
+
+def _finite_decimal(value):
+    """`value` (an int, float, str or Decimal) as a finite Decimal; None stays None"""
+    if value is None:
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f'{value!r} is not a number.') from None
+    if not number.is_finite():
+        raise ValueError(f'Prices cannot change by {value!r}.')
+    return number
+
+
+def price_after(percent=None, amount=None):
+    """A medicine's price after a change by `percent` (5 raises it 5%) or by a fixed `amount`"""
+    if (percent is None) == (amount is None):
+        raise ValueError('Change prices either by a percentage or by an amount.')
+    if percent is not None:
+        factor = 1 + _finite_decimal(percent) / 100
+        if factor <= 0:
+            raise ValueError('Prices cannot be cut by 100% or more.')
+        price = F('price') * factor
+    else:
+        price = F('price') + _finite_decimal(amount)
+    return Round(price, 2, output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def repriced(medicines, percent=None, amount=None):
+    """
+    `medicines` annotated with their new_price, less those the change would
+    leave as they are or below MIN_PRICE.
+    """
+    return (
+        medicines.annotate(new_price=price_after(percent, amount))
+        .filter(new_price__gte=MIN_PRICE).exclude(new_price=F('price'))
+    )
+
+
+def reprice_medicines(medicine_ids, percent=None, amount=None, changed_by=None, **limits):
+    """
+    Change the price of each medicine by `percent` or a fixed `amount`,
+    rounded to two decimals, in one transaction of a few set-based
+    statements however many medicines there are: one INSERT ... SELECT
+    copies the old and new prices into PriceChangeLine rows, one UPDATE
+    sets the new prices from them and one aggregate revalues the lots on
+    the expiry calendar. `medicine_ids` may be a queryset of pks, which is
+    then used as a subquery. Medicines the change would leave unchanged or
+    below MIN_PRICE are skipped.
+
+    `limits` (category, expires_from, expires_to) are only recorded on the
+    PriceChange; select the medicines with price_change_medicines(). Returns
+    the PriceChange.
+    """
+    # An int percent would otherwise reach PriceChange as an int
+    percent, amount = _finite_decimal(percent), _finite_decimal(amount)
+    rows = repriced(Medicine.objects.filter(pk__in=medicine_ids), percent, amount)
+    with transaction.atomic():
+        change = PriceChange.objects.create(percent=percent, amount=amount, changed_by=changed_by, **limits)
+        change.medicines = _insert_select(
+            PriceChangeLine, ['change', 'medicine', 'medicine_name', 'old_price', 'new_price'],
+            rows.order_by().values_list(Value(change.pk), 'pk', 'name', 'price', 'new_price'),
+        )
+        change.save(update_fields=['medicines'])
+
+        lines = PriceChangeLine.objects.filter(change=change)
+        Medicine.objects.filter(price_changes__change=change).update(
+            price=Subquery(lines.filter(medicine=OuterRef('pk')).values('new_price')[:1])
+        )
+        delta = CalendarDelta()
+        for expiry_date, value in (
+            StockBatch.objects.filter(quantity__gt=0, medicine__price_changes__change=change)
+            .values('expiry_date')
+            .annotate(value=Sum(
+                F('quantity') * (F('medicine__price_changes__new_price') - F('medicine__price_changes__old_price')),
+                output_field=DecimalField(max_digits=16, decimal_places=2),
+            ))
+            .values_list('expiry_date', 'value')
+        ):
+            # SQLite sums decimals as floats
+            delta.value(expiry_date, Decimal(value or 0).quantize(CENT))
+        delta.apply()
+        bump_inventory_version()
+    return change
+
+
+def _insert_select(model, fields, rows):
+    """INSERT the values_list `rows` into `fields` of `model` without reading them out. Returns the row count"""
+    connection = connections[rows.db]
+    sql, params = rows.query.sql_with_params()
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) {sql}', params)
+        return cursor.rowcount
+
+
+def mark_expired(medicine_ids, today=None):
+    """
+    Expire each medicine and its lots in stock as of yesterday, e.g. after
+    a recall, so it shows as Expired and the expired stock purge takes it.
+    Lots and medicines already expired keep their dates. Returns the number
+    of medicines marked.
+    """
+    today = today or date.today()
+    expired_on = today - timedelta(days=1)
+    medicine_ids = list(medicine_ids)
+    marked = 0
+    with transaction.atomic():
+        for batch in _batches(medicine_ids):
+            lots = StockBatch.objects.filter(medicine_id__in=batch, quantity__gt=0, expiry_date__gte=today)
+            medicines = Medicine.objects.filter(pk__in=batch, expiry_date__gte=today)
+            delta = CalendarDelta()
+            for expiry_date, price, units in (
+                lots.values('expiry_date', 'medicine__price').annotate(units=Sum('quantity'))
+                .values_list('expiry_date', 'medicine__price', 'units')
+            ):
+                delta.stock(expiry_date, -units, price)
+                delta.stock(expired_on, units, price)
+            for expiry_date, count in (
+                medicines.values('expiry_date').annotate(count=Count('pk')).values_list('expiry_date', 'count')
+            ):
+                delta.medicine(expiry_date, -count)
+                delta.medicine(expired_on, count)
+            lots.update(expiry_date=expired_on)
+            marked += medicines.update(expiry_date=expired_on)
+            delta.apply()
+        bump_inventory_version()
+    return marked
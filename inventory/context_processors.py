@@ -0,0 +1,7 @@
+from django.utils.functional import SimpleLazyObject
+from .roles import get_roles
+
+
+def roles(request):
+    """Expose the current user's resolved roles to templates as `roles`"""
+    return {'roles': SimpleLazyObject(lambda: get_roles(request))}
@@ -0,0 +1,203 @@
+"""
+The expiry calendar: medicines, units and value expiring per day.
+
+ExpiryBucket holds one row per day, moved by deltas in the same transaction
+as the stock change that causes them, so reports and counters read a few
+rows per day of horizon instead of scanning the catalog. Weeks and months
+are sums of their days. Bulk loaders that bypass the deltas call
+rebuild_expiry_calendar() once at the end.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Trunc
+from .models import ExpiryBucket, Medicine, StockBatch
+from .stock_levels import forget_stock
+
+
+PERIODS = ['day', 'week', 'month']
+
+CENT = Decimal('0.01')
+
+
+class CalendarDelta:
+    """Changes to the calendar, collected per day and applied together"""
+
+    def __init__(self):
+        self.days = defaultdict(lambda: [0, 0, Decimal('0')])
+
+    def medicine(self, day, count=1):
+        self.days[day][0] += count
+
+    def stock(self, day, units, price):
+        self.days[day][1] += units
+        self.value(day, units * Decimal(str(price)))
+
+    def value(self, day, amount):
+        self.days[day][2] += amount
+
+    def move_medicine(self, old_day, new_day):
+        if old_day != new_day:
+            self.medicine(old_day, -1)
+            self.medicine(new_day, 1)
+
+    def apply(self):
+        """Write the deltas: one insert for unseen days, one update per day"""
+        changes = {day: delta for day, delta in self.days.items() if any(delta)}
+        if not changes:
+            return
+        ExpiryBucket.objects.bulk_create(
+            [ExpiryBucket(day=day) for day in changes], ignore_conflicts=True
+        )
+        for day, (medicines, units, value) in changes.items():
+            ExpiryBucket.objects.filter(day=day).update(
+                medicines=F('medicines') + medicines,
+                units=F('units') + units,
+                value=F('value') + value,
+            )
+        self.days.clear()
+
+
+def lot_value():
+    return ExpressionWrapper(F('quantity') * F('medicine__price'), output_field=DecimalField(max_digits=16, decimal_places=2))
+
+
+def forget_medicines(medicine_ids):
+    """Take medicines about to be deleted, and their lots, off the calendar and the stock level counters"""
+    forget_stock(medicine_ids)
+    delta = CalendarDelta()
+    for day, count in (
+        Medicine.objects.filter(pk__in=medicine_ids)
+        .values('expiry_date').annotate(count=Count('pk')).values_list('expiry_date', 'count')
+    ):
+        delta.medicine(day, -count)
+    for day, units, price in (
+        StockBatch.objects.filter(medicine_id__in=medicine_ids, quantity__gt=0)
+        .values('expiry_date', 'medicine__price').annotate(units=Sum('quantity'))
+        .values_list('expiry_date', 'units', 'medicine__price')
+    ):
+        delta.stock(day, -units, price)
+    delta.apply()
+
+
+def reprice(medicine_id, old_price, new_price):
+    """Revalue a medicine's lots in stock after a price change"""
+    delta = CalendarDelta()
+    change = Decimal(str(new_price)) - Decimal(str(old_price))
+    for day, units in (
+        StockBatch.objects.filter(medicine_id=medicine_id, quantity__gt=0)
+        .values('expiry_date').annotate(units=Sum('quantity')).values_list('expiry_date', 'units')
+    ):
+        delta.value(day, units * change)
+    delta.apply()
+
+
+def compute_expiry_calendar():
+    """{day: [medicines, units, value]} computed from the medicines and their lots"""
+    days = defaultdict(lambda: [0, 0, Decimal('0')])
+    for day, count in Medicine.objects.values('expiry_date').annotate(count=Count('pk')).values_list('expiry_date', 'count'):
+        days[day][0] = count
+    for day, units, value in (
+        StockBatch.objects.filter(quantity__gt=0).values('expiry_date')
+        .annotate(units=Sum('quantity'), value=Sum(lot_value())).values_list('expiry_date', 'units', 'value')
+    ):
+        days[day][1] = units
+        # SQLite sums decimals as floats
+        days[day][2] = Decimal(value or 0).quantize(CENT)
+    return days
+
+
+def calendar_drift():
+    """Days where the maintained calendar differs from a fresh computation, as (day, stored, computed)"""
+    computed = compute_expiry_calendar()
+    stored = {
+        day: [medicines, units, value]
+        for day, medicines, units, value in ExpiryBucket.objects.values_list('day', 'medicines', 'units', 'value')
+    }
+    empty = [0, 0, Decimal('0')]
+    return [
+        (day, stored.get(day, empty), computed.get(day, empty))
+        for day in sorted(computed.keys() | stored.keys())
+        if stored.get(day, empty) != computed.get(day, empty)
+    ]
+
+
+def rebuild_expiry_calendar():
+    """Recompute the whole calendar from the medicines and their lots. Returns the number of days"""
+    # Aggregate inside the transaction that replaces the buckets, so a delta
+    # committed in between cannot be lost or applied twice
+    with transaction.atomic():
+        days = compute_expiry_calendar()
+        ExpiryBucket.objects.all().delete()
+        ExpiryBucket.objects.bulk_create(
+            [ExpiryBucket(day=day, medicines=m, units=u, value=v) for day, (m, u, v) in sorted(days.items())],
+            batch_size=2000,
+        )
+    return len(days)
+
+
+def _expiry_counter_sums(today, soon):
+    return {
+        'expired': Sum('medicines', filter=Q(day__lt=today)),
+        'expiring_soon': Sum('medicines', filter=Q(day__gte=today, day__lte=soon)),
+        'expiring_soon_units': Sum('units', filter=Q(day__gte=today, day__lte=soon)),
+        'expiring_soon_value': Sum('value', filter=Q(day__gte=today, day__lte=soon)),
+    }
+
+
+def _counter_values(counters):
+    counters = {key: value or 0 for key, value in counters.items()}
+    counters['expiring_soon_value'] = Decimal(counters['expiring_soon_value']).quantize(CENT)
+    return counters
+
+
+def expiry_counters(today, soon):
+    """Medicines expired before `today` and expiring from `today` to `soon`, from the calendar"""
+    return _counter_values(ExpiryBucket.objects.aggregate(**_expiry_counter_sums(today, soon)))
+
+
+async def aexpiry_counters(today, soon):
+    """expiry_counters() for async views"""
+    return _counter_values(await ExpiryBucket.objects.aaggregate(**_expiry_counter_sums(today, soon)))
+
+
+def expiry_horizon(period='month', months=12, today=None):
+    """
+    Units and value expiring per `period` over the next `months` months, as
+    dicts with start, medicines, units, value and the running value total.
+    Stock already expired is summed into one leading row with start None.
+    """
+    if period not in PERIODS:
+        raise ValueError(f'Unknown period {period!r}; use one of {", ".join(PERIODS)}')
+    today = today or date.today()
+    end = _add_months(today, months)
+    totals = ('medicines', 'units', 'value')
+
+    expired = ExpiryBucket.objects.filter(day__lt=today).aggregate(
+        **{name: Sum(name) for name in totals}
+    )
+    rows = [{'start': None, **{name: expired[name] or 0 for name in totals}}]
+    buckets = (
+        ExpiryBucket.objects.filter(day__gte=today, day__lt=end)
+        .annotate(start=Trunc('day', period, output_field=DateField()))
+        .values('start')
+        .annotate(**{name: Sum(name) for name in totals})
+        .order_by('start')
+    )
+    rows += list(buckets)
+
+    running = Decimal('0')
+    for row in rows:
+        running += row['value'] or 0
+        row['cumulative_value'] = running
+    return rows
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    # Clamp to the end of shorter months
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
@@ -0,0 +1,57 @@
+import csv
+import json
+from datetime import date
+from .expressions import DaysUntil, medicine_status
+from .pagination import KeysetPaginator
+
+
+EXPORT_FIELDS = [
+    'id', 'name', 'category', 'price', 'stock_quantity',
+    'manufacture_date', 'expiry_date', 'days_until_expiry', 'status',
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, today=None):
+    """
+    Yield one tuple per medicine in EXPORT_FIELDS order, with status and days
+    until expiry computed by the database, in (expiry_date, id) chunks.
+    """
+    today = today or date.today()
+    queryset = queryset.annotate(
+        days_until_expiry=DaysUntil('expiry_date', today=today),
+        status=medicine_status(today),
+    ).values_list(*EXPORT_FIELDS, named=True)
+    # Named rows expose expiry_date and id as attributes, which is all the
+    # paginator needs to build its cursors
+    yield from KeysetPaginator(queryset, EXPORT_CHUNK_SIZE).iterate()
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        record = dict(zip(EXPORT_FIELDS, row))
+        record['price'] = str(record['price'])
+        record['manufacture_date'] = record['manufacture_date'].isoformat()
+        record['expiry_date'] = record['expiry_date'].isoformat()
+        yield json.dumps(record) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+}
@@ -0,0 +1,67 @@
+from datetime import date
+from django.db.models import Case, CharField, DateField, Func, IntegerField, Q, Value, When
+from .stats import LOW_STOCK_THRESHOLD
+
+
+class DaysUntil(Func):
+    """
+    Whole days from `today` until a date column, computed in the database.
+
+    DaysUntil('expiry_date') is negative for dates in the past.
+    """
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = IntegerField()
+
+    def __init__(self, expression, today=None, **extra):
+        today = today or date.today()
+        super().__init__(expression, Value(today, output_field=DateField()), **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='DATEDIFF(%(expressions)s)',
+            arg_joiner=', ',
+            **extra_context,
+        )
+
+
+def medicine_status(today=None, low_stock=LOW_STOCK_THRESHOLD):
+    """
+    Database expression for a medicine's status label: Expired, Out of
+    Stock, Low Stock or Active, checked in that order.
+    """
+    today = today or date.today()
+    return Case(
+        When(Q(expiry_date__lt=today), then=Value('Expired')),
+        When(Q(stock_quantity=0), then=Value('Out of Stock')),
+        When(Q(stock_quantity__lte=low_stock), then=Value('Low Stock')),
+        default=Value('Active'),
+        output_field=CharField(),
+    )
+
+
+MEDICINE_STATUSES = ['Expired', 'Out of Stock', 'Low Stock', 'Active']
+
+
+def medicine_status_filter(status, today=None, low_stock=LOW_STOCK_THRESHOLD):
+    """
+    Q for the medicines whose medicine_status() is `status`, written on the
+    columns themselves so the expiry and stock indexes can serve it.
+    """
+    today = today or date.today()
+    current = Q(expiry_date__gte=today)
+    return {
+        'Expired': Q(expiry_date__lt=today),
+        'Out of Stock': current & Q(stock_quantity=0),
+        'Low Stock': current & ~Q(stock_quantity=0) & Q(stock_quantity__lte=low_stock),
+        'Active': current & Q(stock_quantity__gt=low_stock),
+    }[status]
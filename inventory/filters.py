@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+from django.db.models.functions import Lower
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+from .stats import EXPIRING_SOON_DAYS, LOW_STOCK_THRESHOLD
+
+
+STATUS_CHOICES = [
+    ('', 'All'),
+    ('expired', 'Expired'),
+    ('expiring', 'Expiring Soon'),
+    ('low_stock', 'Low Stock'),
+    ('out_of_stock', 'Out of Stock'),
+]
+
+
+def name_prefix(prefix):
+    """
+    Conditions for names starting with `prefix` in any case, as a range on
+    Lower('name') so medicine_lower_name_idx answers it; a "contains"
+    match could only scan the table.
+    """
+    low = prefix.lower()
+    high = low[:-1] + chr(ord(low[-1]) + 1)
+    return GreaterThanOrEqual(Lower('name'), low), LessThan(Lower('name'), high)
+
+
+def filter_medicines(queryset, params, today=None):
+    """
+    Apply the medicine list filters from a GET-style mapping.
+
+    Supported keys: q (name starts with, any case), category (exact) and
+    status (one of STATUS_CHOICES). Returns (queryset, cleaned filter dict).
+    """
+    today = today or date.today()
+    filters = {
+        'q': (params.get('q') or '').strip(),
+        'category': (params.get('category') or '').strip(),
+        'status': (params.get('status') or '').strip(),
+    }
+    if filters['q']:
+        queryset = queryset.filter(*name_prefix(filters['q']))
+    if filters['category']:
+        queryset = queryset.filter(category=filters['category'])
+
+    status = filters['status']
+    if status == 'expired':
+        queryset = queryset.filter(expiry_date__lt=today)
+    elif status == 'expiring':
+        queryset = queryset.filter(expiry_date__gte=today, expiry_date__lte=today + timedelta(days=EXPIRING_SOON_DAYS))
+    elif status == 'low_stock':
+        queryset = queryset.filter(stock_quantity__lte=LOW_STOCK_THRESHOLD)
+    elif status == 'out_of_stock':
+        queryset = queryset.filter(stock_quantity=0)
+    else:
+        filters['status'] = ''
+    return queryset, filters
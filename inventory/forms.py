@@ -1,6 +1,15 @@
 from django import forms
 from django.contrib.auth.models import User, Group
-from .models import Medicine
+from datetime import date
+from .models import Medicine, StockBatch
+from .stats import medicine_categories
+
+
+def validate_medicine_dates(manufacture_date, expiry_date):
+    """Cross-field rule shared by MedicineForm and the bulk importer"""
+    if manufacture_date and expiry_date:
+        if expiry_date <= manufacture_date:
+            raise forms.ValidationError('Expiry date must be after manufacture date.')
 
 
 class MedicineForm(forms.ModelForm):
@@ -26,18 +35,149 @@ class MedicineForm(forms.ModelForm):
             'expiry_date': 'Expiry Date',
         }
     
+    # Derived from the lots once the medicine has any; stock comes in
+    # through "Receive Lot" and goes out through sales
+    LOT_FIELDS = ('stock_quantity', 'expiry_date')
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lot_fields_derived = bool(self.instance.pk and self.instance.batches.exists())
+        if self.lot_fields_derived:
+            for name in self.LOT_FIELDS:
+                self.fields[name].disabled = True
+                self.fields[name].help_text = 'Maintained from the stock lots.'
+    
+    def save(self, commit=True):
+        if not (commit and self.lot_fields_derived):
+            return super().save(commit)
+        medicine = super().save(commit=False)
+        # A sale or delivery may have moved the lot fields since the instance
+        # was read; leave them out so their stale copies are never written back
+        medicine.save(update_fields=[name for name in self._meta.fields if name not in self.LOT_FIELDS])
+        medicine.refresh_from_db(fields=self.LOT_FIELDS)
+        return medicine
+    
     def clean(self):
         cleaned_data = super().clean()
-        manufacture_date = cleaned_data.get('manufacture_date')
-        expiry_date = cleaned_data.get('expiry_date')
-        
-        if manufacture_date and expiry_date:
-            if expiry_date <= manufacture_date:
-                raise forms.ValidationError('Expiry date must be after manufacture date.')
-        
+        validate_medicine_dates(cleaned_data.get('manufacture_date'), cleaned_data.get('expiry_date'))
         return cleaned_data
 
 
+class NewMedicineForm(MedicineForm):
+    """Form for adding medicine; its opening stock becomes the first lot"""
+    lot_number = forms.CharField(
+        max_length=50,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., B24117'}),
+        label='Lot Number',
+    )
+
+
+class StockBatchForm(forms.ModelForm):
+    """Form for receiving a new lot of a medicine"""
+    
+    class Meta:
+        model = StockBatch
+        fields = ['lot_number', 'quantity', 'manufacture_date', 'expiry_date']
+        widgets = {
+            'lot_number': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., B24117'}),
+            'quantity': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'placeholder': '0'}),
+            'manufacture_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'expiry_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        }
+        labels = {
+            'lot_number': 'Lot Number',
+            'quantity': 'Quantity Received',
+            'manufacture_date': 'Manufacture Date',
+            'expiry_date': 'Expiry Date',
+        }
+    
+    def clean_quantity(self):
+        quantity = self.cleaned_data['quantity']
+        if quantity <= 0:
+            raise forms.ValidationError('Received quantity must be greater than 0.')
+        return quantity
+    
+    def clean_expiry_date(self):
+        expiry_date = self.cleaned_data['expiry_date']
+        if expiry_date <= date.today():
+            raise forms.ValidationError('This lot has already expired.')
+        return expiry_date
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        validate_medicine_dates(cleaned_data.get('manufacture_date'), cleaned_data.get('expiry_date'))
+        return cleaned_data
+
+
+class PriceChangeForm(forms.Form):
+    """Form for a bulk price change: how prices change, and which medicines"""
+    PERCENT = 'percent'
+    AMOUNT = 'amount'
+    MODE_CHOICES = [
+        (PERCENT, 'By percentage (%)'),
+        (AMOUNT, 'By fixed amount (₹)'),
+    ]
+    
+    mode = forms.ChoiceField(
+        choices=MODE_CHOICES,
+        initial=PERCENT,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Change',
+    )
+    value = forms.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'placeholder': 'e.g., 5 or -10'}),
+        label='Amount',
+        help_text='Positive to raise prices, negative to cut them.',
+    )
+    category = forms.ChoiceField(
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Category',
+    )
+    expires_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        label='Expiring From',
+    )
+    expires_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+        label='Expiring To',
+    )
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].choices = [('', 'All categories')] + [
+            (category, category) for category in medicine_categories()
+        ]
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        mode, value = cleaned_data.get('mode'), cleaned_data.get('value')
+        if value is not None:
+            if value == 0:
+                self.add_error('value', 'Change prices by a non-zero amount.')
+            elif mode == self.PERCENT and not -100 < value < 1000:
+                self.add_error('value', 'Give a percentage between -99.99 and 999.99.')
+        expires_from, expires_to = cleaned_data.get('expires_from'), cleaned_data.get('expires_to')
+        if expires_from and expires_to and expires_to < expires_from:
+            raise forms.ValidationError('The expiry window ends before it starts.')
+        return cleaned_data
+    
+    @property
+    def change(self):
+        """percent= or amount= for reprice_medicines()"""
+        return {self.cleaned_data['mode']: self.cleaned_data['value']}
+    
+    @property
+    def limits(self):
+        """The category and expiry window, for price_change_medicines()"""
+        return {name: self.cleaned_data[name] for name in ('category', 'expires_from', 'expires_to')}
+
+
 class EmployeeForm(forms.ModelForm):
     """Form for adding new employee"""
     password1 = forms.CharField(
@@ -0,0 +1,78 @@
+"""
+Cached rows for the medicine tables.
+
+Each row is rendered once per medicine version, viewer role and day, and
+kept in the 'fragments' cache; a page's rows are fetched with one get_many
+and the joined table is cached under a key built from its row keys. The
+version is a fingerprint of the fields a row shows, so an edited, sold or
+restocked medicine (F() updates included) gets new keys on its next render
+and its stale rows simply age out, whichever code path changed it.
+"""
+import hashlib
+from django.core.cache import InvalidCacheBackendError, caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from .stats import LOW_STOCK_THRESHOLD
+
+
+FRAGMENT_CACHE = 'fragments'
+FRAGMENT_TIMEOUT = 60 * 60
+
+# What a row shows; anything else on the medicine leaves its row as is.
+VERSION_FIELDS = ['pk', 'name', 'category', 'price', 'stock_quantity', 'manufacture_date', 'expiry_date']
+
+
+def fragment_cache():
+    """The 'fragments' cache, or the default one when it is not configured"""
+    try:
+        return caches[FRAGMENT_CACHE]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def _digest(text):
+    return hashlib.md5(text.encode(), usedforsecurity=False).hexdigest()
+
+
+def role_key(roles):
+    """The one part of the viewer a row depends on: which action button it gets"""
+    if roles.is_manager:
+        return 'manager'
+    if roles.is_staff_member:
+        return 'staff'
+    return 'user'
+
+
+def medicine_version(medicine):
+    """Fingerprint of the fields shown in a medicine's row"""
+    return _digest('|'.join(str(getattr(medicine, field)) for field in VERSION_FIELDS))
+
+
+def render_medicine_rows(medicines, template_name, roles, today):
+    """
+    The <tr> rows of `medicines` rendered with `template_name`, from cache
+    where possible. A repeat of the same page is a single cache hit; a page
+    where some medicines changed renders just those rows.
+    """
+    cache = fragment_cache()
+    prefix = f'fragment:row:{template_name}:{role_key(roles)}:{today.isoformat()}'
+    keys = [f'{prefix}:{medicine.pk}:{medicine_version(medicine)}' for medicine in medicines]
+    table_key = f'fragment:table:{_digest(" ".join(keys))}'
+
+    table = cache.get(table_key)
+    if table is None:
+        rows = cache.get_many(keys)
+        missing = {}
+        for key, medicine in zip(keys, medicines):
+            if key not in rows:
+                rows[key] = missing[key] = render_to_string(template_name, {
+                    'medicine': medicine,
+                    'today': today,
+                    'roles': roles,
+                    'low_stock': LOW_STOCK_THRESHOLD,
+                })
+        if missing:
+            cache.set_many(missing, FRAGMENT_TIMEOUT)
+        table = ''.join(rows[key] for key in keys)
+        cache.set(table_key, table, FRAGMENT_TIMEOUT)
+    return mark_safe(table)
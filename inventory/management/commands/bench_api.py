@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from inventory.models import Medicine
+
+
+class Command(BaseCommand):
+    help = 'Compare read throughput of the async JSON API under ASGI with the HTML views under WSGI, in one worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent clients (WSGI threads or ASGI coroutines)')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['clients'] <= 0 or options['seconds'] <= 0:
+            raise CommandError('--clients and --seconds must be positive')
+        medicine_id = Medicine.objects.filter(stock_quantity__gt=0).values_list('pk', flat=True).first()
+        if medicine_id is None:
+            raise CommandError('No medicine in stock to read; load some data first (generate_data)')
+
+        # The same four read paths, rendered as pages and answered as JSON
+        html_pages = [
+            reverse('medicine_dashboard'),
+            reverse('medicine_list'),
+            reverse('medicine_list') + '?status=expiring',
+            reverse('update_stock', kwargs={'pk': medicine_id}),
+        ]
+        api_pages = [
+            reverse('api_stats'),
+            reverse('api_medicine_list'),
+            reverse('api_medicine_list') + '?status=expiring',
+            reverse('api_medicine', kwargs={'pk': medicine_id}),
+        ]
+
+        User.objects.filter(username='__bench_api__').delete()
+        user = User.objects.create_superuser('__bench_api__', password=None)
+        # The test environment lets the clients' 'testserver' host through
+        # ALLOWED_HOSTS, whatever the settings allow
+        setup_test_environment()
+        try:
+            results = {
+                'HTML views, WSGI': self.run_threads(html_pages, user, options),
+                'JSON API, WSGI': self.run_threads(api_pages, user, options),
+                'JSON API, ASGI': asyncio.run(self.run_coroutines(api_pages, user, options)),
+            }
+        finally:
+            teardown_test_environment()
+            user.delete()
+
+        failed = [label for label, result in results.items() if result['errors'] == result['count']]
+        if failed:
+            raise CommandError(f'Every request failed in: {", ".join(failed)}')
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('Read API Benchmark'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+        self.stdout.write(f'  {options["clients"]} clients for {options["seconds"]:.0f}s per run, one worker\n')
+        self.stdout.write(f'  {"":<18}' + ''.join(f'{label:>20}' for label in results))
+        rows = [
+            ('Requests/s', lambda r: f'{r["per_second"]:.1f}'),
+            ('p50 (ms)', lambda r: f'{r["p50_ms"]:.1f}'),
+            ('p95 (ms)', lambda r: f'{r["p95_ms"]:.1f}'),
+            ('p99 (ms)', lambda r: f'{r["p99_ms"]:.1f}'),
+            ('Errors', lambda r: str(r['errors'])),
+            ('Threads used', lambda r: str(r['threads'])),
+        ]
+        for label, value in rows:
+            self.stdout.write(f'  {label:<18}' + ''.join(f'{value(result):>20}' for result in results.values()))
+
+    def run_threads(self, pages, user, options):
+        """A threaded WSGI worker: one thread per concurrent client"""
+        results = []
+        lock = threading.Lock()
+        stop_at = []
+        # Everyone logs in first; the clock starts when the last one is ready
+        gate = threading.Barrier(
+            options['clients'], action=lambda: stop_at.append(time.perf_counter() + options['seconds'])
+        )
+
+        def client_thread():
+            try:
+                client = Client()
+                client.force_login(user)
+            finally:
+                gate.wait()
+            latencies = []
+            failed = 0
+            i = 0
+            try:
+                while time.perf_counter() < stop_at[0]:
+                    started = time.perf_counter()
+                    response = client.get(pages[i % len(pages)])
+                    latencies.append(time.perf_counter() - started)
+                    failed += response.status_code != 200
+                    i += 1
+            finally:
+                connection.close()
+                with lock:
+                    results.append((latencies, failed))
+
+        threads = [threading.Thread(target=client_thread) for _ in range(options['clients'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(results, options['seconds'], threads=options['clients'])
+
+    async def run_coroutines(self, pages, user, options):
+        """An ASGI worker: every client is a coroutine on one event loop"""
+        clients = []
+        for _ in range(options['clients']):
+            client = AsyncClient()
+            await client.aforce_login(user)
+            clients.append(client)
+        stop_at = time.perf_counter() + options['seconds']
+
+        async def client_task(client):
+            latencies = []
+            failed = 0
+            i = 0
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                response = await client.get(pages[i % len(pages)])
+                latencies.append(time.perf_counter() - started)
+                failed += response.status_code != 200
+                i += 1
+            return latencies, failed
+
+        results = await asyncio.gather(*(client_task(client) for client in clients))
+        # Besides the event loop, the async ORM and sync middleware hooks
+        # share the one thread asgiref keeps for thread-sensitive code
+        return summarize(results, options['seconds'], threads=2)
+
+
+def summarize(results, seconds, threads):
+    """Throughput and latency percentiles of [(latencies, failures)] per client"""
+    latencies = sorted(latency for run, _ in results for latency in run)
+    errors = sum(failed for _, failed in results)
+
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'per_second': (len(latencies) - errors) / seconds,
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'threads': threads,
+    }
@@ -0,0 +1,260 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from inventory.batches import opening_batch
+from inventory.models import Medicine
+from inventory.sales import InsufficientStock, sell_medicine
+from pharmacy_pro.database import DATABASE_PROFILES
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent sales and page reads against the SQLite database profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=sorted(DATABASE_PROFILES),
+                            help='Run one profile in a fresh process (default: compare all of them)')
+        parser.add_argument('--sellers', type=int, default=4, help='Concurrent seller processes')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent page reader processes')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Duration of each run')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_db compares SQLite profiles; the default database is not SQLite')
+        if options['profile']:
+            self.run_profile(options)
+        else:
+            self.compare(options)
+
+    def compare(self, options):
+        """Run every profile in its own process, since settings are read at startup"""
+        results = {}
+        for profile in DATABASE_PROFILES:
+            command = [
+                sys.executable, sys.argv[0], 'bench_db', '--json', '--profile', profile,
+                '--sellers', str(options['sellers']), '--readers', str(options['readers']),
+                '--seconds', str(options['seconds']),
+            ]
+            env = {**os.environ, 'PHARMACY_DB_PROFILE': profile}
+            completed = subprocess.run(command, env=env, capture_output=True, text=True)
+            if completed.returncode:
+                raise CommandError(f'The {profile} run failed:\n{completed.stderr}')
+            results[profile] = json.loads(completed.stdout)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('SQLite Profile Benchmark'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+        self.stdout.write(f'  {options["sellers"]} sellers + {options["readers"]} readers for {options["seconds"]:.0f}s per profile\n')
+        self.stdout.write(f'  {"":<24}' + ''.join(f'{profile:>14}' for profile in results))
+        rows = [
+            ('Sales/s', lambda r: f'{r["sales"]["per_second"]:.1f}'),
+            ('Sale p95 (ms)', lambda r: f'{r["sales"]["p95_ms"]:.1f}'),
+            ('Sale p99 (ms)', lambda r: f'{r["sales"]["p99_ms"]:.1f}'),
+            ('Page reads/s', lambda r: f'{r["reads"]["per_second"]:.1f}'),
+            ('Page p95 (ms)', lambda r: f'{r["reads"]["p95_ms"]:.1f}'),
+            ('Page p99 (ms)', lambda r: f'{r["reads"]["p99_ms"]:.1f}'),
+            ('"Database is locked"', lambda r: str(r['sales']['locked'] + r['reads']['locked'])),
+            ('Other failures', lambda r: str(r['sales']['failed'] + r['reads']['failed'])),
+            ('Connections opened', lambda r: str(r['connections_opened'])),
+        ]
+        for label, value in rows:
+            self.stdout.write(f'  {label:<24}' + ''.join(f'{value(result):>14}' for result in results.values()))
+
+    def run_profile(self, options):
+        # Sell from and read a copy of the database, so the live ledger and
+        # its journal mode are never touched; forked workers inherit the name
+        scratch_dir = tempfile.mkdtemp(prefix='bench_db_')
+        live_name = connection.settings_dict['NAME']
+        scratch_name = os.path.join(scratch_dir, 'bench_db.sqlite3')
+        connection.close()
+        with closing(sqlite3.connect(live_name)) as live, closing(sqlite3.connect(scratch_name)) as scratch:
+            live.backup(scratch)
+        connection.settings_dict['NAME'] = scratch_name
+        try:
+            self.bench_profile(options)
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = live_name
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def bench_profile(self, options):
+        profile = options['profile']
+        journal_mode = 'WAL' if profile == 'production' else 'DELETE'
+        # The journal mode is stored in the database file, so set the copy's
+        # to what this profile would leave it at before measuring
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+
+        medicine = Medicine.objects.create(
+            name='__bench_db__',
+            category='Benchmark',
+            price=Decimal('2.50'),
+            stock_quantity=10**9,
+            manufacture_date=date.today(),
+            expiry_date=date.today() + timedelta(days=365),
+        )
+        opening_batch(medicine).save()
+        user = User.objects.create_superuser('__bench_db__', password=None)
+        pages = [
+            reverse('medicine_dashboard'),
+            reverse('medicine_list'),
+            reverse('medicine_list') + '?status=expiring',
+            reverse('update_stock', kwargs={'pk': medicine.pk}),
+        ]
+
+        # Workers are processes, like the worker processes of a WSGI server;
+        # threads would serialize on the GIL while one of them holds the
+        # write lock and measure that instead of the database
+        connection.close()
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        ready = context.Queue()
+        start_gate = context.Event()
+        workers = [
+            context.Process(target=bench_worker, args=('sales', medicine.pk, user.pk, pages, options['seconds'], ready, start_gate, queue))
+            for _ in range(options['sellers'])
+        ] + [
+            context.Process(target=bench_worker, args=('reads', medicine.pk, user.pk, pages, options['seconds'], ready, start_gate, queue))
+            for _ in range(options['readers'])
+        ]
+        # Set up one worker at a time so connecting and logging in happen
+        # outside the measured window and do not pile onto each other
+        # The test environment lets the readers' 'testserver' host through
+        # ALLOWED_HOSTS; forked workers inherit it
+        setup_test_environment()
+        try:
+            for worker in workers:
+                worker.start()
+                ready.get()
+            start_gate.set()
+            results = {kind: {'count': 0, 'locked': 0, 'failed': 0, 'latencies': []} for kind in ('sales', 'reads')}
+            opened = 0
+            for _ in workers:
+                kind, count, locked, failed, latencies, connections_opened = queue.get()
+                results[kind]['count'] += count
+                results[kind]['locked'] += locked
+                results[kind]['failed'] += failed
+                results[kind]['latencies'].extend(latencies)
+                opened += connections_opened
+            for worker in workers:
+                worker.join()
+        finally:
+            teardown_test_environment()
+        wall = options['seconds']
+
+        def summary(kind):
+            latencies = sorted(results[kind]['latencies'])
+
+            def percentile(p):
+                if not latencies:
+                    return 0.0
+                return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+            return {
+                'count': results[kind]['count'],
+                'locked': results[kind]['locked'],
+                'failed': results[kind]['failed'],
+                'per_second': results[kind]['count'] / wall,
+                'p50_ms': percentile(50),
+                'p95_ms': percentile(95),
+                'p99_ms': percentile(99),
+            }
+
+        report = {
+            'profile': profile,
+            'options': settings.DATABASES['default'].get('OPTIONS', {}),
+            'conn_max_age': settings.DATABASES['default'].get('CONN_MAX_AGE', 0),
+            'seconds': wall,
+            'sales': summary('sales'),
+            'reads': summary('reads'),
+            'connections_opened': opened,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, default=str))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Profile {profile}:'))
+        for kind in ('sales', 'reads'):
+            r = report[kind]
+            self.stdout.write(
+                f'  • {kind.title()}: {r["per_second"]:.1f}/s, p50/p95/p99 '
+                f'{r["p50_ms"]:.1f} / {r["p95_ms"]:.1f} / {r["p99_ms"]:.1f} ms, '
+                f'{r["locked"]} database locked, {r["failed"]} other failures'
+            )
+        self.stdout.write(f'  • Connections opened: {report["connections_opened"]}')
+
+
+def bench_worker(kind, medicine_id, user_id, pages, seconds, ready, start_gate, queue):
+    """
+    One benchmark process: sell or read pages for `seconds`, handling each
+    operation like a request (close_old_connections before and after, which
+    is what honours CONN_MAX_AGE), then report back through `queue`.
+    "Database is locked" errors are counted apart from other failures,
+    such as a page that did not answer 200.
+    """
+    opened = [0]
+    original = connection.get_new_connection
+
+    def get_new_connection(conn_params):
+        opened[0] += 1
+        return original(conn_params)
+    connection.get_new_connection = get_new_connection
+
+    count = locked = failed = 0
+    latencies = []
+    try:
+        try:
+            connection.ensure_connection()
+            if kind == 'reads':
+                client = Client()
+                client.force_login(User.objects.get(pk=user_id))
+        finally:
+            ready.put(kind)
+        start_gate.wait()
+        stop_at = time.perf_counter() + seconds
+        i = 0
+        while time.perf_counter() < stop_at:
+            close_old_connections()
+            started = time.perf_counter()
+            ok = False
+            try:
+                if kind == 'sales':
+                    sell_medicine(medicine_id, 1)
+                    ok = True
+                else:
+                    ok = client.get(pages[i % len(pages)]).status_code == 200
+                failed += not ok
+            except OperationalError as error:
+                if 'locked' in str(error):
+                    locked += 1
+                else:
+                    failed += 1
+            except InsufficientStock:
+                failed += 1
+            latencies.append(time.perf_counter() - started)
+            count += ok
+            close_old_connections()
+            i += 1
+    finally:
+        connection.close()
+        # Always report, or the parent would wait for this worker forever
+        queue.put((kind, count, locked, failed, latencies, opened[0]))
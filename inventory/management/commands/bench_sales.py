@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.db.models import Sum
+from inventory.models import Medicine, StockBatch
+from inventory.sales import InsufficientStock, get_cash_box, sell_medicine
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress the sale path with many concurrent sellers and check for lost updates. '
+        'Runs against a scratch database created for the run, never the live ledger.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sellers', type=int, default=32, help='Number of concurrent seller threads')
+        parser.add_argument('--sales', type=int, default=25, help='Sales attempted by each seller')
+        parser.add_argument('--stock', type=int, default=500, help='Starting stock of the benchmark medicine')
+
+    def handle(self, *args, **options):
+        # A throwaway database built from the migrations, like the test
+        # runner's; on SQLite a file, so every seller thread shares it
+        scratch_dir = tempfile.mkdtemp(prefix='bench_sales_')
+        test_settings = connection.settings_dict['TEST']
+        live_name, test_name = connection.settings_dict['NAME'], test_settings.get('NAME')
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(scratch_dir, 'bench_sales.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.bench(options)
+        finally:
+            connection.creation.destroy_test_db(live_name, verbosity=0)
+            test_settings['NAME'] = test_name
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def bench(self, options):
+        sellers = options['sellers']
+        sales_per_seller = options['sales']
+        price = Decimal('2.50')
+
+        medicine = Medicine.objects.create(
+            name='__bench_sales__',
+            category='Benchmark',
+            price=price,
+            stock_quantity=options['stock'],
+            manufacture_date=date.today(),
+            expiry_date=date.today() + timedelta(days=365),
+        )
+        # Three lots, so sellers allocate across lot boundaries
+        sizes = [options['stock'] // 3, options['stock'] // 3]
+        sizes.append(options['stock'] - sum(sizes))
+        for i, size in enumerate(sizes):
+            if size:
+                StockBatch.objects.create(
+                    medicine=medicine,
+                    lot_number=f'BENCH{i}',
+                    quantity=size,
+                    manufacture_date=date.today(),
+                    expiry_date=date.today() + timedelta(days=365 + 30 * i),
+                )
+        cash_before = get_cash_box().balance
+
+        lock = threading.Lock()
+        results = {'sold': 0, 'rejected': 0, 'errors': 0, 'latencies': []}
+        start_gate = threading.Event()
+
+        def seller():
+            start_gate.wait()
+            try:
+                for _ in range(sales_per_seller):
+                    started = time.perf_counter()
+                    try:
+                        sell_medicine(medicine.pk, 1)
+                        outcome = 'sold'
+                    except InsufficientStock:
+                        outcome = 'rejected'
+                    except OperationalError:
+                        outcome = 'errors'
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        results[outcome] += 1
+                        results['latencies'].append(elapsed)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=seller) for _ in range(sellers)]
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        start_gate.set()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        medicine.refresh_from_db()
+        cash_after = get_cash_box().balance
+        expected_stock = options['stock'] - results['sold']
+        expected_cash = cash_before + results['sold'] * price
+
+        latencies = sorted(results['latencies'])
+        attempts = len(latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(attempts - 1, int(p / 100 * attempts))] * 1000
+
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('Concurrent Sale Benchmark'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+        self.stdout.write(f'  • Sellers: {sellers} x {sales_per_seller} sales')
+        self.stdout.write(f'  • Sold: {results["sold"]}, rejected (no stock): {results["rejected"]}, lock errors: {results["errors"]}')
+        self.stdout.write(f'  • Throughput: {attempts / wall:.1f} sales/s over {wall:.2f}s')
+        self.stdout.write(f'  • Latency p50/p95/p99: {percentile(50):.1f} / {percentile(95):.1f} / {percentile(99):.1f} ms')
+        self.stdout.write(f'  • Final stock: {medicine.stock_quantity} (expected {expected_stock})')
+        lot_stock = medicine.batches.aggregate(total=Sum('quantity'))['total'] or 0
+        self.stdout.write(f'  • Stock in lots: {lot_stock} (expected {expected_stock})')
+        self.stdout.write(f'  • Cash moved: ₹{cash_after - cash_before} (expected ₹{expected_cash - cash_before})')
+
+        consistent = medicine.stock_quantity == expected_stock == lot_stock and cash_after == expected_cash
+        if consistent:
+            self.stdout.write(self.style.SUCCESS('✓ No lost updates'))
+        else:
+            self.stdout.write(self.style.ERROR('✗ Lost updates detected'))
@@ -0,0 +1,87 @@
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from inventory.models import Medicine
+from inventory.search import search_index
+from inventory.views import search_autocomplete
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the medicine search index and the autocomplete endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=2000, help='Number of keystroke queries to replay')
+        parser.add_argument('--target-ms', type=float, default=10.0, help='p95 latency target for autocomplete, in ms')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        started = time.perf_counter()
+        search_index.rebuild()
+        build_seconds = time.perf_counter() - started
+
+        names = list(Medicine.objects.values_list('name', flat=True)[:5000])
+        if not names:
+            self.stdout.write(self.style.ERROR('No medicines found! Load some data first.'))
+            return
+
+        # Replay what a user types: growing prefixes, plus some with a typo
+        queries = []
+        while len(queries) < options['queries']:
+            name = rng.choice(names)
+            for length in range(2, min(len(name), 8) + 1):
+                query = name[:length]
+                if length > 4 and rng.random() < 0.2:
+                    i = rng.randrange(1, length)
+                    query = query[:i] + query[i + 1:] + query[i]
+                queries.append(query)
+        queries = queries[:options['queries']]
+
+        index_timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search_index.suggest(query)
+            index_timings.append(time.perf_counter() - started)
+
+        factory = RequestFactory()
+        endpoint_timings = []
+        hits = 0
+        # The view answers conditional GETs per user, so it needs a saved
+        # one; the user is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user('__bench_search__', password=None)
+            for query in queries:
+                request = factory.get('/search/autocomplete/', {'q': query})
+                request.user = user
+                started = time.perf_counter()
+                response = search_autocomplete(request)
+                endpoint_timings.append(time.perf_counter() - started)
+                hits += bool(json.loads(response.content)['results'])
+            transaction.set_rollback(True)
+
+        def percentile(timings, p):
+            ordered = sorted(timings)
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('Search Benchmark'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+        self.stdout.write(f'  • Medicines indexed: {Medicine.objects.count()} in {build_seconds:.2f}s')
+        self.stdout.write(f'  • Queries replayed: {len(queries)} ({hits / len(queries):.0%} with suggestions)')
+        for label, timings in (('Index suggest', index_timings), ('Autocomplete view', endpoint_timings)):
+            self.stdout.write(
+                f'  • {label} p50/p95/p99: {percentile(timings, 50):.2f} / '
+                f'{percentile(timings, 95):.2f} / {percentile(timings, 99):.2f} ms'
+            )
+
+        p95 = percentile(endpoint_timings, 95)
+        if p95 <= options['target_ms']:
+            self.stdout.write(self.style.SUCCESS(f'✓ Autocomplete p95 {p95:.2f} ms is within the {options["target_ms"]} ms target'))
+        else:
+            self.stdout.write(self.style.ERROR(f'✗ Autocomplete p95 {p95:.2f} ms exceeds the {options["target_ms"]} ms target'))
@@ -0,0 +1,212 @@
+import re
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import get_resolver, reverse
+from inventory.models import ExpiryPurge, Medicine
+
+
+# Tables whose size grows with the business; a full scan of one of these in a
+# request path is a regression. Small lookup tables are not checked.
+WATCHED_TABLES = ['inventory_medicine', 'inventory_sale']
+
+# One or more sample requests per inventory URL name: (url name, kwargs, GET).
+# A URL name missing here fails the check, so new views must be added.
+SAMPLE_REQUESTS = [
+    ('medicine_dashboard', {}, {}),
+    ('medicine_list', {}, {}),
+    ('medicine_list', {}, {'status': 'expired'}),
+    ('medicine_list', {}, {'status': 'expiring'}),
+    ('medicine_list', {}, {'status': 'low_stock'}),
+    ('medicine_list', {}, {'status': 'out_of_stock'}),
+    ('medicine_list', {}, {'category': 'Antibiotic'}),
+    ('medicine_list', {}, {'q': 'para'}),
+    ('export_medicines', {'fmt': 'csv'}, {'status': 'expiring'}),
+    ('bulk_reprice', {}, {}),
+    ('bulk_reprice', {}, {'mode': 'percent', 'value': '5', 'category': 'Antibiotic'}),
+    ('expiry_report', {}, {}),
+    ('expiry_report', {}, {'period': 'week', 'months': '60'}),
+    ('expiry_report', {}, {'period': 'day', 'months': '3'}),
+    ('reorder_report', {}, {}),
+    ('reorder_report', {}, {'window': '90'}),
+    ('sales_report', {}, {}),
+    ('sales_report', {}, {'months': '60'}),
+    ('search_medicine', {}, {'q': 'para'}),
+    ('search_autocomplete', {}, {'q': 'para'}),
+    ('add_medicine', {}, {}),
+    ('edit_medicine', {'pk': 'medicine'}, {}),
+    ('receive_stock', {'pk': 'medicine'}, {}),
+    ('delete_expired', {}, {}),
+    ('purge_status', {'pk': 'purge'}, {}),
+    ('purge_status', {'pk': 'purge'}, {'format': 'json'}),
+    ('update_stock', {'pk': 'medicine'}, {}),
+    ('checkout', {}, {}),
+    ('api_medicine_list', {}, {}),
+    ('api_medicine_list', {}, {'status': 'expiring'}),
+    ('api_medicine', {'pk': 'medicine'}, {}),
+    ('api_stock_status', {}, {'id': 'medicine'}),
+    ('api_stats', {}, {}),
+    ('employee_list', {}, {}),
+    ('add_employee', {}, {}),
+    ('edit_employee', {'pk': 'user'}, {}),
+]
+
+# URL names that are not inventory read paths (or that mutate on GET).
+SKIPPED_URLS = {'login', 'logout', 'delete_employee'}
+
+# Scans of watched tables that are deliberate, as (URL name, plan line, reason).
+# Each is matched exactly, so a new scan on the same page still fails.
+ALLOWED_SCANS = [
+    ('search_medicine', 'SCAN inventory_medicine USING COVERING INDEX medicine_category_name_idx',
+     'loads the in-memory search index, once per process; signals keep it fresh after that'),
+]
+
+# SQLite plan lines that read a table from one end: "SCAN t", or
+# "SCAN t USING [COVERING] INDEX i" when walking an index in order.
+SQLITE_SCAN = re.compile(r'\bSCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?')
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN every query the inventory views issue and fail on full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the plan of every query')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Query plan checks are not implemented for {connection.vendor}')
+
+        covered = {name for name, _, _ in SAMPLE_REQUESTS} | SKIPPED_URLS
+        inventory_names = {
+            pattern.name for pattern in get_resolver('inventory.urls').url_patterns if pattern.name
+        }
+        missing = sorted(inventory_names - covered)
+        if missing:
+            raise CommandError(f'No sample request for URL name(s): {", ".join(missing)}. Add them to SAMPLE_REQUESTS.')
+
+        # The test environment lets the client's 'testserver' host through
+        # ALLOWED_HOSTS, whatever the settings allow
+        setup_test_environment()
+        try:
+            failures, checked = self.check_requests(options['verbose_plans'])
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f'Checked {checked} distinct queries across {len(SAMPLE_REQUESTS)} requests')
+        if not checked:
+            raise CommandError('No queries were captured, so nothing was checked')
+        if failures:
+            for name, url, sql, problem in failures:
+                self.stdout.write(self.style.ERROR(f'\n✗ {name} ({url}): {problem}'))
+                if sql:
+                    self.stdout.write(f'  {sql}')
+            raise CommandError(f'{len(failures)} problem(s) found')
+        self.stdout.write(self.style.SUCCESS('✓ No full scans of watched tables'))
+
+    def check_requests(self, verbose_plans):
+        """Replay SAMPLE_REQUESTS and return (failures, distinct queries checked)"""
+        failures = []
+        checked = 0
+        # Everything, including the temporary superuser and its session,
+        # is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_superuser('__plan_check__', password=None)
+            client = Client()
+            client.force_login(user)
+            purge = ExpiryPurge.objects.order_by('pk').first()
+            if purge is None:
+                purge = ExpiryPurge.objects.create(cutoff=date.today(), status=ExpiryPurge.DONE)
+            medicine = Medicine.objects.order_by('pk').first()
+            if medicine is None:
+                raise CommandError('The catalog is empty; load some medicines first (manage.py generate_data)')
+            sample_pks = {'medicine': medicine.pk, 'user': user.pk, 'purge': purge.pk}
+
+            for name, kwargs, params in SAMPLE_REQUESTS:
+                kwargs = {key: sample_pks.get(value, value) for key, value in kwargs.items()}
+                params = {key: sample_pks.get(value, value) for key, value in params.items()}
+                url = reverse(name, kwargs=kwargs)
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url, params)
+                    if response.streaming:
+                        # Drain it fully: the test client only closes a
+                        # streamed response safely once it is exhausted
+                        b''.join(response.streaming_content)
+                if not 200 <= response.status_code < 300:
+                    failures.append((name, url, '', f'answered {response.status_code} instead of a page'))
+                    continue
+
+                seen = set()
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith('SELECT') or sql in seen:
+                        continue
+                    seen.add(sql)
+                    checked += 1
+                    plan = self.explain(sql)
+                    if verbose_plans:
+                        self.stdout.write(f'\n{name}: {sql}\n  ' + '\n  '.join(plan))
+                    problem = self.full_scan(sql, plan)
+                    if problem and (name, problem) not in {(url_name, line) for url_name, line, _ in ALLOWED_SCANS}:
+                        failures.append((name, url, sql, problem))
+
+            transaction.set_rollback(True)
+        return failures, checked
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[-1] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+
+    def full_scan(self, sql, plan):
+        """Return the plan line of the first full scan of a watched table, if any"""
+        if connection.vendor != 'sqlite':
+            for line in plan:
+                if any(re.search(rf'Seq Scan on {table}\b', line) for table in WATCHED_TABLES):
+                    return line.strip()
+            return None
+        aliases = dict(re.findall(r'"(\w+)" ([A-Z]\d+)\b', sql))
+        for line in plan:
+            match = SQLITE_SCAN.search(line)
+            if not match:
+                continue
+            table, index = aliases.get(match[1], match[1]), match[2]
+            if table in WATCHED_TABLES and not self.stops_early(sql, plan, table, match[1], index):
+                return line.strip()
+        return None
+
+    def stops_early(self, sql, plan, table, name, index):
+        """
+        Whether a scan of `table` (called `name` in the plan) stops after a
+        page of rows: the statement has a LIMIT, its ORDER BY is served by
+        walking the index (or the rowid, for a bare SCAN) with no sort, and
+        it filters only on columns the index holds, so every row read is a
+        row returned.
+        """
+        if not re.search(r'\bLIMIT \d+\s*$', sql) or ' ORDER BY ' not in sql:
+            return False
+        if any('USE TEMP B-TREE' in line for line in plan):
+            return False
+        where = re.search(r' WHERE (.*?)(?: GROUP BY | ORDER BY )', sql)
+        filtered = set(re.findall(rf'(?:"{table}"|\b{name})\."(\w+)"', where[1])) if where else set()
+        return filtered <= self.index_columns(table, index)
+
+    def index_columns(self, table, index):
+        """Columns an index holds, those in a partial index's WHERE included; the primary key for None"""
+        with connection.cursor() as cursor:
+            primary_key = connection.introspection.get_primary_key_column(cursor, table)
+            if index is None:
+                return {primary_key}
+            cursor.execute(f'PRAGMA index_xinfo("{index}")')
+            columns = {row[2] or primary_key for row in cursor.fetchall() if row[1] != -2 and row[5]}
+            cursor.execute('SELECT sql FROM sqlite_master WHERE type = %s AND name = %s', ['index', index])
+            definition = cursor.fetchone()[0] or ''
+        if ' WHERE ' in definition:
+            columns |= set(re.findall(r'"(\w+)"', definition.split(' WHERE ', 1)[1]))
+        return columns
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from inventory.exports import EXPORT_FORMATS, export_rows
+from inventory.filters import STATUS_CHOICES, filter_medicines
+from inventory.models import Medicine
+
+
+class Command(BaseCommand):
+    help = 'Stream the medicine inventory to CSV or JSON Lines, with the medicine list filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--q', help='Only medicines whose name starts with this text, in any case')
+        parser.add_argument('--category', help='Only medicines in this category')
+        parser.add_argument('--status', choices=[value for value, _ in STATUS_CHOICES if value])
+
+    def handle(self, *args, **options):
+        queryset, _ = filter_medicines(Medicine.objects.all(), options)
+        render_lines, _ = EXPORT_FORMATS[options['format']]
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        count = 0
+        try:
+            for line in render_lines(export_rows(queryset)):
+                output.write(line)
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        if options['output']:
+            rows = count - 1 if options['format'] == 'csv' else count
+            self.stdout.write(self.style.SUCCESS(f'✓ Exported {rows} medicine(s) to {options["output"]}'))
@@ -0,0 +1,283 @@
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from inventory.expiry_calendar import rebuild_expiry_calendar
+from inventory.models import Medicine, Pharmacist, Sale, StockBatch
+from inventory.rollups import rebuild_sales_rollups
+from inventory.sales import rollup_cash
+from inventory.search import search_index
+from inventory.stock_levels import rebuild_stock_levels
+from inventory.versioning import bump_inventory_version
+
+
+GENERICS = [
+    'Paracetamol', 'Ibuprofen', 'Aspirin', 'Diclofenac', 'Naproxen', 'Amoxicillin', 'Azithromycin',
+    'Ciprofloxacin', 'Doxycycline', 'Cefuroxime', 'Metformin', 'Glimepiride', 'Sitagliptin',
+    'Atorvastatin', 'Rosuvastatin', 'Amlodipine', 'Losartan', 'Telmisartan', 'Metoprolol',
+    'Lisinopril', 'Omeprazole', 'Pantoprazole', 'Ranitidine', 'Cetirizine', 'Loratadine',
+    'Montelukast', 'Salbutamol', 'Prednisolone', 'Levothyroxine', 'Sertraline', 'Escitalopram',
+    'Gabapentin', 'Pregabalin', 'Tramadol', 'Clopidogrel', 'Warfarin', 'Furosemide',
+    'Hydrochlorothiazide', 'Ondansetron', 'Domperidone', 'Multivitamin', 'Folic Acid',
+    'Vitamin D3', 'Calcium Carbonate', 'Iron Sucrose', 'Insulin Glargine', 'Fluconazole',
+    'Acyclovir', 'Ivermectin', 'Albendazole',
+]
+CATEGORIES = {
+    'Painkiller': ['Paracetamol', 'Ibuprofen', 'Aspirin', 'Diclofenac', 'Naproxen', 'Tramadol'],
+    'Antibiotic': ['Amoxicillin', 'Azithromycin', 'Ciprofloxacin', 'Doxycycline', 'Cefuroxime'],
+    'Diabetes': ['Metformin', 'Glimepiride', 'Sitagliptin', 'Insulin Glargine'],
+    'Cholesterol': ['Atorvastatin', 'Rosuvastatin'],
+    'Blood Pressure': ['Amlodipine', 'Losartan', 'Telmisartan', 'Metoprolol', 'Lisinopril', 'Hydrochlorothiazide', 'Furosemide'],
+    'Antacid': ['Omeprazole', 'Pantoprazole', 'Ranitidine', 'Domperidone', 'Ondansetron'],
+    'Antihistamine': ['Cetirizine', 'Loratadine', 'Montelukast'],
+    'Asthma': ['Salbutamol', 'Prednisolone'],
+    'Thyroid': ['Levothyroxine'],
+    'Antidepressant': ['Sertraline', 'Escitalopram'],
+    'Nerve Pain': ['Gabapentin', 'Pregabalin'],
+    'Blood Thinner': ['Clopidogrel', 'Warfarin'],
+    'Vitamin': ['Multivitamin', 'Folic Acid', 'Vitamin D3', 'Calcium Carbonate', 'Iron Sucrose'],
+    'Antifungal': ['Fluconazole'],
+    'Antiviral': ['Acyclovir'],
+    'Antiparasitic': ['Ivermectin', 'Albendazole'],
+}
+CATEGORY_OF = {generic: category for category, generics in CATEGORIES.items() for generic in generics}
+STRENGTHS = ['5mg', '10mg', '20mg', '25mg', '40mg', '50mg', '100mg', '250mg', '400mg', '500mg', '650mg', '1g']
+FORMS = ['Tablet', 'Capsule', 'Syrup', 'Suspension', 'Injection', 'Gel', 'Drops', 'Inhaler']
+SYLLABLES = ['ca', 'lo', 'mi', 'ra', 'to', 'ze', 'vi', 'na', 'dex', 'cor', 'pro', 'flu', 'zol', 'tin', 'max', 'gen', 'ly', 'sa']
+FIRST_NAMES = ['Aarav', 'Diya', 'Ishaan', 'Meera', 'Kabir', 'Ananya', 'Rohan', 'Priya', 'Arjun', 'Sneha', 'Vikram', 'Nisha']
+LAST_NAMES = ['Sharma', 'Iyer', 'Nair', 'Reddy', 'Patel', 'Gupta', 'Menon', 'Rao', 'Das', 'Khan', 'Pillai', 'Joshi']
+QUALIFICATIONS = ['B.Pharm', 'M.Pharm', 'D.Pharm', 'Pharm.D']
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, deterministic synthetic catalog with sales and staff accounts for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medicines', type=int, default=10000, help='Medicines to create (10k to 1M is typical)')
+        parser.add_argument('--sales', type=int, default=None, help='Sales to record (default: 2 per medicine)')
+        parser.add_argument('--staff', type=int, default=20, help='Staff accounts to create (one in ten is a Manager)')
+        parser.add_argument('--password', default='loadtest123', help='Password for every generated account')
+        parser.add_argument('--seed', type=int, default=2024, help='Random seed; the same seed builds the same data')
+        parser.add_argument('--anchor', type=date.fromisoformat, default=None,
+                            help='Date the data is generated around (default: today); fix it to reproduce a run exactly')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0 or options['medicines'] < 0 or options['staff'] < 0:
+            raise CommandError('--medicines, --staff and --batch-size must not be negative')
+        if options['staff'] and User.objects.filter(username__startswith='gen_').exists():
+            raise CommandError('Generated staff accounts already exist; pass --staff 0 to add only medicines and sales')
+        try:
+            manager_group = Group.objects.get(name='Manager')
+            staff_group = Group.objects.get(name='Staff')
+        except Group.DoesNotExist:
+            raise CommandError('Groups not found! Run: python manage.py setup_groups')
+
+        rng = random.Random(options['seed'])
+        # Every date is an offset from the anchor, so the expired / expiring
+        # mix stays realistic whenever the data is generated
+        self.anchor = options['anchor'] or date.today()
+        sales = options['sales'] if options['sales'] is not None else 2 * options['medicines']
+        started = time.perf_counter()
+
+        users = self.generate_staff(rng, options['staff'], options['password'], manager_group, staff_group)
+        medicine_ids = self.generate_medicines(rng, options['medicines'], options['batch_size'])
+        sale_count = self.generate_sales(rng, sales, medicine_ids, users, options['batch_size'])
+
+        # Bulk writes send no model signals
+        bump_inventory_version()
+        search_index.invalidate()
+        rebuild_expiry_calendar()
+        rebuild_stock_levels()
+        rebuild_sales_rollups()
+        rollup_cash()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('Synthetic Data Generated!'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+        self.stdout.write(f'  • Medicines: {len(medicine_ids)}')
+        self.stdout.write(f'  • Sales: {sale_count}')
+        self.stdout.write(f'  • Staff accounts: {len(users)} (password: {options["password"]})')
+        if users:
+            self.stdout.write(f'  • Manager login for load tests: {users[0].username}')
+        self.stdout.write(f'  • Seed: {options["seed"]}, anchor: {self.anchor}, took {elapsed:.1f}s')
+
+    def generate_staff(self, rng, count, password, manager_group, staff_group):
+        """Create `count` users with Pharmacist profiles; every tenth one is a Manager"""
+        # Hashing is deliberately slow, so hash once and share it
+        hashed = make_password(password)
+        users = []
+        with transaction.atomic():
+            for i in range(count):
+                first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                user = User.objects.create(
+                    username=f'gen_{"manager" if i % 10 == 0 else "staff"}_{i:05d}',
+                    password=hashed,
+                    first_name=first,
+                    last_name=last,
+                    email=f'{first}.{last}.{i}@pharmacy.example'.lower(),
+                )
+                user.groups.add(manager_group if i % 10 == 0 else staff_group)
+                Pharmacist.objects.create(
+                    user=user,
+                    employee_id=f'GEN{i:05d}',
+                    phone_number=f'9{rng.randrange(10**9):09d}',
+                    address=f'{rng.randrange(1, 500)} {rng.choice(LAST_NAMES)} Street',
+                    date_of_joining=self.anchor - timedelta(days=rng.randrange(3650)),
+                    qualification=rng.choice(QUALIFICATIONS),
+                )
+                users.append(user)
+        return users
+
+    def medicine_name(self, rng, seen):
+        """A unique "Brand (Generic) strength form" name"""
+        while True:
+            brand = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+            generic = rng.choice(GENERICS)
+            name = f'{brand} ({generic}) {rng.choice(STRENGTHS)} {rng.choice(FORMS)}'
+            if name not in seen:
+                seen.add(name)
+                return name, generic
+
+    def generate_medicines(self, rng, count, batch_size):
+        """Insert `count` medicines and their stock lots in batches and return their ids"""
+        seen = set()
+        ids = []
+        batch = []
+        for _ in range(count):
+            name, generic = self.medicine_name(rng, seen)
+            manufactured = self.anchor - timedelta(days=rng.randrange(2 * 365))
+            # Mostly 1-3 years of shelf life, so a realistic share has
+            # expired or is about to
+            expiry = manufactured + timedelta(days=rng.randrange(365, 3 * 365))
+            # Most stock levels are healthy; a long tail is low or out
+            roll = rng.random()
+            if roll < 0.03:
+                stock = 0
+            elif roll < 0.12:
+                stock = rng.randint(1, 10)
+            else:
+                stock = int(rng.lognormvariate(4.5, 0.8))
+            lots = self.split_into_lots(rng, stock, manufactured, expiry)
+            batch.append((Medicine(
+                name=name,
+                category=CATEGORY_OF[generic],
+                price=Decimal(str(round(rng.lognormvariate(3, 0.9), 2))).max(Decimal('0.50')),
+                stock_quantity=stock,
+                manufacture_date=manufactured,
+                expiry_date=expiry,
+            ), lots))
+            if len(batch) >= batch_size:
+                ids.extend(self.insert_medicines(batch))
+                batch = []
+                if len(ids) % (batch_size * 20) == 0:
+                    self.stdout.write(f'  … {len(ids)} medicines')
+        if batch:
+            ids.extend(self.insert_medicines(batch))
+        return ids
+
+    def split_into_lots(self, rng, stock, manufactured, expiry):
+        """
+        Spread `stock` over one to three lots, each received later and
+        expiring later than the one before, the first one expiring on `expiry`.
+        """
+        if not stock:
+            return []
+        count = 1 if stock < 10 else rng.choice([1, 1, 2, 3])
+        cuts = sorted(rng.sample(range(1, stock), count - 1))
+        lots = []
+        offset = 0
+        for start, end in zip([0] + cuts, cuts + [stock]):
+            lots.append(StockBatch(
+                lot_number=f'{rng.choice("ABCDEFGHKLMNPRST")}{rng.randrange(10000, 100000)}',
+                quantity=end - start,
+                manufacture_date=manufactured + timedelta(days=offset),
+                expiry_date=expiry + timedelta(days=offset),
+            ))
+            offset += rng.randrange(30, 180)
+        return lots
+
+    def insert_medicines(self, batch):
+        with transaction.atomic():
+            created = Medicine.objects.bulk_create([medicine for medicine, _ in batch])
+            if created and created[0].pk is None:
+                # Backends that cannot return ids from a bulk insert
+                pks = dict(Medicine.objects.filter(name__in=[medicine.name for medicine in created]).values_list('name', 'pk'))
+                for medicine in created:
+                    medicine.pk = pks[medicine.name]
+            lots = []
+            for medicine, medicine_lots in batch:
+                for lot in medicine_lots:
+                    lot.medicine_id = medicine.pk
+                    lots.append(lot)
+            StockBatch.objects.bulk_create(lots)
+        return [medicine.pk for medicine in created]
+
+    def generate_sales(self, rng, count, medicine_ids, users, batch_size):
+        """
+        Record `count` sales spread over the year before the anchor date.
+        Half of them go to a best-selling 2% of the catalog.
+        """
+        if not medicine_ids or not count:
+            return 0
+        best_sellers = medicine_ids[:max(1, len(medicine_ids) // 50)]
+        sellers = users or [None]
+        sale_table = connection.ops.quote_name(Sale._meta.db_table)
+        sold_at_field = Sale._meta.get_field('sold_at')
+        update_sql = f'UPDATE {sale_table} SET {connection.ops.quote_name(sold_at_field.column)} = %s WHERE {connection.ops.quote_name(Sale._meta.pk.column)} = %s'
+        catalog = {}
+        recorded = 0
+        while recorded < count:
+            size = min(batch_size, count - recorded)
+            picks = [
+                rng.choice(best_sellers if rng.random() < 0.5 else medicine_ids)
+                for _ in range(size)
+            ]
+            missing = set(picks) - catalog.keys()
+            if missing:
+                catalog.update(
+                    (pk, (name, category, price))
+                    for pk, name, category, price in (
+                        Medicine.objects.filter(pk__in=missing).values_list('pk', 'name', 'category', 'price')
+                    )
+                )
+            sales = []
+            sold_at = []
+            for pk in picks:
+                name, category, price = catalog[pk]
+                quantity = rng.choice([1, 1, 1, 2, 2, 3, 5, 10])
+                sales.append(Sale(
+                    medicine_id=pk,
+                    medicine_name=name,
+                    category=category,
+                    quantity=quantity,
+                    unit_price=price,
+                    total=price * quantity,
+                    sold_by=rng.choice(sellers),
+                ))
+                moment = datetime.combine(
+                    self.anchor - timedelta(days=rng.randrange(365)),
+                    dt_time(rng.randrange(8, 22), rng.randrange(60), rng.randrange(60)),
+                )
+                sold_at.append(timezone.make_aware(moment))
+            with transaction.atomic():
+                created = Sale.objects.bulk_create(sales)
+                # sold_at is auto_now_add, so backdate it after the insert
+                # (on backends that return the new ids)
+                with connection.cursor() as cursor:
+                    cursor.executemany(update_sql, [
+                        (sold_at_field.get_db_prep_save(moment, connection), sale.pk)
+                        for sale, moment in zip(created, sold_at)
+                        if sale.pk is not None
+                    ])
+            recorded += size
+            if recorded % (batch_size * 20) == 0:
+                self.stdout.write(f'  … {recorded} sales')
+        return recorded
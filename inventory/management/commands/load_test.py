@@ -0,0 +1,264 @@
+import http.cookiejar
+import json
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import get_resolver, reverse
+from inventory.models import ExpiryPurge, Medicine
+
+
+# Routes to drive, as (url name, kwargs, GET params, weight). The weight is
+# the relative share of requests, roughly as busy as each page is at a till.
+# A URL name of inventory.urls missing here fails the run, so new views get
+# load tested too.
+ROUTES = [
+    ('medicine_dashboard', {}, {}, 10),
+    ('medicine_list', {}, {}, 8),
+    ('medicine_list', {}, {'status': 'expiring'}, 2),
+    ('medicine_list', {}, {'status': 'low_stock'}, 2),
+    ('export_medicines', {'fmt': 'csv'}, {'status': 'expiring'}, 1),
+    ('bulk_reprice', {}, {}, 1),
+    ('expiry_report', {}, {}, 2),
+    ('reorder_report', {}, {}, 1),
+    ('sales_report', {}, {}, 1),
+    ('search_medicine', {}, {'q': 'search'}, 6),
+    ('search_autocomplete', {}, {'q': 'search'}, 12),
+    ('add_medicine', {}, {}, 1),
+    ('edit_medicine', {'pk': 'medicine'}, {}, 2),
+    ('receive_stock', {'pk': 'medicine'}, {}, 1),
+    ('update_stock', {'pk': 'medicine'}, {}, 6),
+    ('checkout', {}, {}, 3),
+    ('api_medicine_list', {}, {}, 3),
+    ('api_medicine', {'pk': 'medicine'}, {}, 6),
+    ('api_stock_status', {}, {'id': 'medicine'}, 6),
+    ('api_stats', {}, {}, 4),
+    ('delete_expired', {}, {}, 1),
+    ('purge_status', {'pk': 'purge'}, {'format': 'json'}, 1),
+    ('employee_list', {}, {}, 2),
+    ('add_employee', {}, {}, 1),
+    ('edit_employee', {'pk': 'user'}, {}, 1),
+]
+
+# Distinct search terms tried per search route.
+SEARCH_VARIANTS = 20
+
+# URL names that change data on GET or end the session.
+SKIPPED_URLS = {'login', 'logout', 'delete_employee'}
+
+_CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class Command(BaseCommand):
+    help = 'Drive every inventory route over HTTP with concurrent logged-in clients and report latency per route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of a running server using this database')
+        parser.add_argument('--username', required=True, help='Account to log in as (a Manager reaches every route)')
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent clients, each with its own session')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the route mix and sample rows')
+        parser.add_argument('--output', default='loadtest.json', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Earlier results file to compare against')
+
+    def handle(self, *args, **options):
+        covered = {name for name, _, _, _ in ROUTES} | SKIPPED_URLS
+        inventory_names = {
+            pattern.name for pattern in get_resolver('inventory.urls').url_patterns if pattern.name
+        }
+        missing = sorted(inventory_names - covered)
+        if missing:
+            raise CommandError(f'No load test route for URL name(s): {", ".join(missing)}. Add them to ROUTES.')
+
+        rng = random.Random(options['seed'])
+        targets = self.build_targets(rng, options['url'].rstrip('/'))
+        clients = [self.login(options['url'].rstrip('/'), options['username'], options['password'])
+                   for _ in range(options['clients'])]
+
+        lock = threading.Lock()
+        samples = {label: [] for label, _, _ in targets}
+        errors = dict.fromkeys(samples, 0)
+        weights = [weight for _, _, weight in targets]
+        start_gate = threading.Event()
+        stop_at = [0.0]
+
+        def run_client(opener, seed):
+            client_rng = random.Random(seed)
+            start_gate.wait()
+            while time.perf_counter() < stop_at[0]:
+                label, url, _ = client_rng.choices(targets, weights)[0]
+                started = time.perf_counter()
+                try:
+                    with opener.open(url, timeout=60) as response:
+                        response.read()
+                        ok = response.status == 200
+                except (urllib.error.URLError, OSError):
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples[label].append(elapsed)
+                    errors[label] += not ok
+
+        threads = [
+            threading.Thread(target=run_client, args=(opener, rng.random()))
+            for opener in clients
+        ]
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        stop_at[0] = started + options['duration']
+        start_gate.set()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        results = self.summarize(samples, errors, wall, options)
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+
+        self.report(results)
+        self.stdout.write(f'\n  Results written to {options["output"]}')
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline:
+                self.compare(json.load(baseline), results)
+
+    def build_targets(self, rng, base_url):
+        """Resolve ROUTES into (label, absolute url, weight) using rows from this database"""
+        last_pk = Medicine.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        medicine_id = Medicine.objects.filter(pk__gte=rng.randint(0, last_pk)).order_by('pk').values_list('pk', flat=True).first()
+        names = list(Medicine.objects.values_list('name', flat=True)[:1000]) or ['para']
+        sample = {
+            'medicine': medicine_id or 0,
+            'user': User.objects.values_list('pk', flat=True).first() or 0,
+            'purge': ExpiryPurge.objects.values_list('pk', flat=True).first(),
+        }
+        targets = []
+        for name, kwargs, params, weight in ROUTES:
+            kwargs = {key: sample.get(value, value) for key, value in kwargs.items()}
+            params = {key: sample.get(value, value) for key, value in params.items()}
+            if any(value is None for value in kwargs.values()):
+                continue  # nothing to point the route at in this database
+            label = name + (f'?{urllib.parse.urlencode(sorted(params.items()))}' if params and name == 'medicine_list' else '')
+            url = base_url + reverse(name, kwargs=kwargs)
+            if params.get('q') == 'search':
+                # Spread the weight over realistic prefixes of real names, as typed
+                for _ in range(SEARCH_VARIANTS):
+                    word = rng.choice(names)
+                    query = word[:rng.randint(3, min(8, len(word)))] if len(word) > 3 else word
+                    targets.append((label, url + '?' + urllib.parse.urlencode({**params, 'q': query}), weight / SEARCH_VARIANTS))
+                continue
+            if params:
+                url += '?' + urllib.parse.urlencode(params)
+            targets.append((label, url, weight))
+        return targets
+
+    def login(self, base_url, username, password):
+        """Return a urllib opener holding a logged-in session"""
+        jar = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        login_url = base_url + reverse('login')
+        try:
+            with opener.open(login_url, timeout=30) as response:
+                page = response.read().decode()
+        except urllib.error.URLError as exc:
+            raise CommandError(f'Cannot reach {login_url}: {exc}. Start the server first (manage.py runserver).')
+        match = _CSRF_RE.search(page)
+        if not match:
+            raise CommandError('No CSRF token on the login page')
+        data = urllib.parse.urlencode({
+            'csrfmiddlewaretoken': match.group(1), 'username': username, 'password': password,
+        }).encode()
+        request = urllib.request.Request(login_url, data=data, headers={'Referer': login_url})
+        with opener.open(request, timeout=30) as response:
+            if response.geturl().rstrip('/').endswith(reverse('login').rstrip('/')):
+                raise CommandError(f'Could not log in as {username}')
+        return opener
+
+    def summarize(self, samples, errors, wall, options):
+        def percentile(latencies, p):
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else 0.0
+
+        routes = {}
+        for label, latencies in samples.items():
+            latencies.sort()
+            routes[label] = {
+                'requests': len(latencies),
+                'errors': errors[label],
+                'rps': len(latencies) / wall,
+                'p50_ms': percentile(latencies, 50),
+                'p95_ms': percentile(latencies, 95),
+                'p99_ms': percentile(latencies, 99),
+            }
+        everything = sorted(latency for latencies in samples.values() for latency in latencies)
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=10,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit,
+            'url': options['url'],
+            'clients': options['clients'],
+            'duration_s': wall,
+            'medicines': Medicine.objects.count(),
+            'total': {
+                'requests': len(everything),
+                'errors': sum(errors.values()),
+                'rps': len(everything) / wall,
+                'p50_ms': percentile(everything, 50),
+                'p95_ms': percentile(everything, 95),
+                'p99_ms': percentile(everything, 99),
+            },
+            'routes': routes,
+        }
+
+    def report(self, results):
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('Load Test Results'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+        self.stdout.write(
+            f'  {results["clients"]} clients for {results["duration_s"]:.0f}s against {results["url"]} '
+            f'({results["medicines"]} medicines, commit {results["commit"] or "unknown"})\n'
+        )
+        self.stdout.write(f'  {"Route":<40}{"Reqs":>7}{"Err":>5}{"Req/s":>8}{"p50":>9}{"p95":>9}{"p99":>9}')
+        rows = sorted(results['routes'].items()) + [('TOTAL', results['total'])]
+        for label, r in rows:
+            line = (
+                f'  {label[:39]:<40}{r["requests"]:>7}{r["errors"]:>5}{r["rps"]:>8.1f}'
+                f'{r["p50_ms"]:>9.1f}{r["p95_ms"]:>9.1f}{r["p99_ms"]:>9.1f}'
+            )
+            self.stdout.write(self.style.ERROR(line) if r['errors'] else line)
+
+    def compare(self, baseline, results):
+        """Print the p95 and throughput change of every route against a baseline run"""
+        self.stdout.write(self.style.SUCCESS(f'\nCompared with {baseline.get("commit") or "baseline"}:'))
+        self.stdout.write(f'  {"Route":<40}{"p95 before":>12}{"p95 now":>10}{"change":>9}{"Req/s":>16}')
+        rows = sorted(results['routes'].items()) + [('TOTAL', results['total'])]
+        for label, now in rows:
+            before = baseline['total'] if label == 'TOTAL' else baseline.get('routes', {}).get(label)
+            if not before:
+                continue
+            change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            line = (
+                f'  {label[:39]:<40}{before["p95_ms"]:>12.1f}{now["p95_ms"]:>10.1f}{change:>+8.0f}%'
+                f'{before["rps"]:>8.1f} → {now["rps"]:<5.1f}'
+            )
+            if change > 10:
+                self.stdout.write(self.style.ERROR(line))
+            elif change < -10:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from inventory.batches import opening_batch
 from inventory.models import Medicine
 from datetime import date
 
@@ -41,4 +42,6 @@ class Command(BaseCommand):
             )
             if was_created:
                 created += 1
+                if obj.stock_quantity > 0:
+                    opening_batch(obj).save()
         self.stdout.write(self.style.SUCCESS(f"{created} new sample medicines added to the database."))
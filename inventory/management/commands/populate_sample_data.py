@@ -1,4 +1,6 @@
 from django.core.management.base import BaseCommand
+from inventory.batches import opening_batch
+from inventory.expiry_calendar import rebuild_expiry_calendar
 from inventory.models import Medicine
 from datetime import date, timedelta
 import random
@@ -115,8 +117,15 @@ class Command(BaseCommand):
                 for key, value in medicine_data.items():
                     setattr(medicine, key, value)
                 medicine.save()
+                # The sample stock replaces its lots
+                medicine.batches.all().delete()
                 updated_count += 1
                 self.stdout.write(self.style.WARNING(f'○ Updated: {medicine.name}'))
+            if medicine.stock_quantity > 0:
+                opening_batch(medicine).save()
+        
+        # Replaced lots were deleted in bulk
+        rebuild_expiry_calendar()
         
         self.stdout.write(self.style.SUCCESS('\n' + '='*70))
         self.stdout.write(self.style.SUCCESS('Sample Data Population Complete!'))
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.purge import PURGE_BATCH_SIZE, PURGE_PAUSE, active_purge, run_purge, start_purge
+
+
+class Command(BaseCommand):
+    help = 'Move expired medicines to the archive in small batches, resuming an unfinished purge first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cutoff', type=date.fromisoformat, help='Purge medicines expiring before this date (default: today)')
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Rows moved per transaction')
+        parser.add_argument('--pause', type=float, default=PURGE_PAUSE, help='Seconds to wait between batches')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        purge = active_purge()
+        if purge is not None:
+            self.stdout.write(f'Resuming purge #{purge.pk} ({purge.archived}/{purge.total} archived)')
+        else:
+            purge = start_purge(cutoff=options['cutoff'])
+            self.stdout.write(f'Started purge #{purge.pk}: {purge.total} medicine(s) expiring before {purge.cutoff}')
+
+        def progress(purge):
+            self.stdout.write(f'  … {purge.archived}/{purge.total} archived ({purge.percent}%)')
+
+        purge = run_purge(purge.pk, batch_size=options['batch_size'], pause=options['pause'], progress=progress)
+        if purge is None:
+            raise CommandError('The purge is being run by another worker')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Archived {purge.archived} expired medicine(s); kept {purge.kept} for their lots still in date'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.expiry_calendar import calendar_drift, rebuild_expiry_calendar
+
+
+class Command(BaseCommand):
+    help = 'Recompute the expiry calendar from the medicines and their lots (or only check it for drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Report days that differ and write nothing')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = calendar_drift()
+            for day, stored, computed in drift[:20]:
+                self.stdout.write(self.style.ERROR(
+                    f'✗ {day}: stored {stored[0]} medicine(s) / {stored[1]} units / ₹{stored[2]}, '
+                    f'expected {computed[0]} / {computed[1]} / ₹{computed[2]}'
+                ))
+            if drift:
+                raise CommandError(f'{len(drift)} day(s) of the expiry calendar are out of date; run without --check to rebuild')
+            self.stdout.write(self.style.SUCCESS('✓ The expiry calendar matches the stock'))
+            return
+
+        days = rebuild_expiry_calendar()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt the expiry calendar: {days} day(s)'))
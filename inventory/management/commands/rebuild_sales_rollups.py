@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.rollups import rebuild_sales_rollups, rollup_drift
+
+
+class Command(BaseCommand):
+    help = 'Recompute the sales rollups from the sales ledger (or only check them for drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Report rows that differ and write nothing')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = rollup_drift()
+            for model, key, stored, computed in drift[:20]:
+                self.stdout.write(self.style.ERROR(
+                    f'✗ {model._meta.verbose_name_plural} {", ".join(map(str, key))}: '
+                    f'stored {" / ".join(map(str, stored))}, expected {" / ".join(map(str, computed))}'
+                ))
+            if drift:
+                raise CommandError(f'{len(drift)} rollup row(s) are out of date; run without --check to rebuild')
+            self.stdout.write(self.style.SUCCESS('✓ The sales rollups match the ledger'))
+            return
+
+        rows = rebuild_sales_rollups()
+        self.stdout.write(self.style.SUCCESS('✓ Rebuilt the sales rollups'))
+        for model, count in rows.items():
+            self.stdout.write(f'  • {model._meta.verbose_name_plural}: {count} row(s)')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.stock_levels import rebuild_stock_levels, stock_level_drift
+
+
+class Command(BaseCommand):
+    help = 'Recount the stock level counters from the catalog (or only check them for drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Report counters that differ and write nothing')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = stock_level_drift()
+            for band, stored, computed in drift:
+                self.stdout.write(self.style.ERROR(f'✗ {band}: stored {stored} medicine(s), expected {computed}'))
+            if drift:
+                raise CommandError(f'{len(drift)} stock level counter(s) are out of date; run without --check to rebuild')
+            self.stdout.write(self.style.SUCCESS('✓ The stock level counters match the catalog'))
+            return
+
+        levels = rebuild_stock_levels()
+        self.stdout.write(self.style.SUCCESS('✓ Rebuilt the stock level counters'))
+        for band, medicines in levels.items():
+            self.stdout.write(f'  • {band}: {medicines} medicine(s)')
@@ -0,0 +1,69 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.reorder import (
+    LEAD_TIME_DAYS, SAFETY_DAYS, TARGET_COVER_DAYS, VELOCITY_WINDOW_DAYS,
+    reorder_due, reorder_suggestions, reorder_summary,
+)
+
+
+CSV_FIELDS = [
+    'id', 'name', 'category', 'price', 'stock_quantity', 'sold',
+    'velocity', 'days_of_cover', 'reorder_point', 'suggested_quantity',
+]
+
+
+class Command(BaseCommand):
+    help = 'Suggest reorder quantities for every medicine from its recent sales velocity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=VELOCITY_WINDOW_DAYS, help='Days of sales to average over')
+        parser.add_argument('--lead-time', type=int, default=LEAD_TIME_DAYS, help='Days from ordering to delivery')
+        parser.add_argument('--safety-days', type=int, default=SAFETY_DAYS, help='Extra days of sales kept in reserve')
+        parser.add_argument('--cover-days', type=int, default=TARGET_COVER_DAYS, help='Days of sales an order should cover')
+        parser.add_argument('--limit', type=int, default=20, help='Suggestions to print, most urgent first')
+        parser.add_argument('--csv', help='Write every suggestion to this CSV file')
+
+    def handle(self, *args, **options):
+        if options['window'] <= 0:
+            raise CommandError('--window must be at least 1 day')
+        if min(options['lead_time'], options['safety_days'], options['cover_days'], options['limit']) < 0:
+            raise CommandError('--lead-time, --safety-days, --cover-days and --limit cannot be negative')
+
+        started = time.perf_counter()
+        suggestions = reorder_suggestions(
+            window_days=options['window'],
+            lead_time_days=options['lead_time'],
+            safety_days=options['safety_days'],
+            cover_days=options['cover_days'],
+        )
+        due = reorder_due(suggestions)
+        summary = reorder_summary(suggestions)
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='', encoding='utf-8') as output:
+                writer = csv.writer(output)
+                writer.writerow(CSV_FIELDS)
+                writer.writerows(due.values_list(*CSV_FIELDS).iterator(chunk_size=2000))
+        top = list(due[:options['limit']]) if options['limit'] else []
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('Reorder Suggestions'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+        self.stdout.write(f'  • Sales window: {options["window"]} days, lead time: {options["lead_time"]} days, '
+                          f'safety: {options["safety_days"]} days, cover: {options["cover_days"]} days')
+        self.stdout.write(f'  • Medicines to reorder: {summary["medicines"]}')
+        self.stdout.write(f'  • Units to order: {summary["units"]} (₹{summary["cost"]:.2f})')
+        self.stdout.write(f'  • Took {elapsed:.2f}s')
+        if options['csv']:
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote {summary["medicines"]} suggestion(s) to {options["csv"]}'))
+
+        if top:
+            self.stdout.write(f'\n{"Medicine":<40} {"Stock":>7} {"Per day":>8} {"Cover":>7} {"Order":>7}')
+            for suggestion in top:
+                self.stdout.write(
+                    f'{suggestion["name"][:40]:<40} {suggestion["stock_quantity"]:>7} {suggestion["velocity"]:>8.2f} '
+                    f'{suggestion["days_of_cover"]:>6.1f}d {suggestion["suggested_quantity"]:>7}'
+                )
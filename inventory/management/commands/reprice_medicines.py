@@ -0,0 +1,43 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.bulk import price_change_medicines, reprice_medicines, repriced
+
+
+class Command(BaseCommand):
+    help = 'Change the price of every medicine in a category and/or expiry window, recording old and new prices'
+
+    def add_arguments(self, parser):
+        change = parser.add_mutually_exclusive_group(required=True)
+        change.add_argument('--percent', type=Decimal, help='Percentage change: 5 raises prices 5%%, -10 cuts them 10%%')
+        change.add_argument('--amount', type=Decimal, help='Fixed change in ₹: 2 adds ₹2, -1.50 takes ₹1.50 off')
+        parser.add_argument('--category', default='', help='Only medicines in this category')
+        parser.add_argument('--expires-from', type=date.fromisoformat, help='Only medicines expiring on or after this date')
+        parser.add_argument('--expires-to', type=date.fromisoformat, help='Only medicines expiring on or before this date')
+        parser.add_argument('--dry-run', action='store_true', help='Show the medicines that would change and write nothing')
+        parser.add_argument('--preview-rows', type=int, default=20, help='Medicines listed by --dry-run')
+
+    def handle(self, *args, **options):
+        change = {'percent': options['percent']} if options['percent'] is not None else {'amount': options['amount']}
+        limits = {name: options[name] for name in ('category', 'expires_from', 'expires_to')}
+        if not next(iter(change.values())):
+            raise CommandError('Change prices by a non-zero amount')
+        medicines = price_change_medicines(**limits)
+
+        try:
+            if options['dry_run']:
+                changed = repriced(medicines, **change)
+                count = changed.count()
+                for medicine in changed.order_by('name', 'id')[:options['preview_rows']]:
+                    self.stdout.write(f'  • {medicine.name} ({medicine.category}): ₹{medicine.price} → ₹{medicine.new_price:.2f}')
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ {count} price(s) would change; {medicines.count() - count} matching medicine(s) would keep theirs'
+                ))
+                return
+            price_change = reprice_medicines(medicines.values('pk'), **change, **limits)
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Price change #{price_change.pk}: repriced {price_change.medicines} medicine(s) by {price_change.adjustment}'
+        ))
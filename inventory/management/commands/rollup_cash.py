@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from inventory.sales import get_cash_box, rollup_cash
+
+
+class Command(BaseCommand):
+    help = 'Fold recorded sales into the cash box checkpoint (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **kwargs):
+        count = rollup_cash()
+        cash_box = get_cash_box()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rolled up {count} sale(s)'))
+        self.stdout.write(f'  • Checkpoint: ₹{cash_box.current_cash} up to sale #{cash_box.rolled_up_to}')
+        self.stdout.write(f'  • Balance: ₹{cash_box.balance}')
@@ -0,0 +1,73 @@
+import base64
+import hashlib
+import json
+import re
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.assets import VENDOR_FILES, VENDOR_LOCK, VENDOR_ROOT, vendor_pins
+
+
+# The source maps are not vendored, and stripped CSS no longer matches them
+SOURCE_MAP = re.compile(rb'\n?/[*/]# sourceMappingURL=[^\n]*')
+
+
+class Command(BaseCommand):
+    help = (
+        'Download the pinned Bootstrap and Bootstrap Icons builds into inventory/static/vendor, '
+        'checking each against its sha384 in inventory/vendor-lock.json'
+    )
+    # It is what fixes inventory.E001, so it must run while that check fails
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Download files that are already vendored again')
+        parser.add_argument(
+            '--pin', action='store_true',
+            help='Record the sha384 of files the lock has no entry for yet; a pinned file must always match',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('Vendoring Static Assets'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+
+        pins = vendor_pins()
+        pinned = []
+        fetched = 0
+        for path, url in VENDOR_FILES.items():
+            target = VENDOR_ROOT / path
+            if target.exists() and not options['force']:
+                self.stdout.write(f'  • {path}: already vendored')
+                continue
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    content = response.read()
+            except (urllib.error.URLError, TimeoutError) as error:
+                raise CommandError(f'Could not download {url}: {error}')
+            integrity = 'sha384-' + base64.b64encode(hashlib.sha384(content).digest()).decode()
+            if path not in pins:
+                if not options['pin']:
+                    raise CommandError(
+                        f'{path} has no pinned hash in {VENDOR_LOCK.name}; downloaded {integrity}. '
+                        'Check it against the upstream release, then run again with --pin to record it.'
+                    )
+                pins[path] = integrity
+                pinned.append(path)
+                VENDOR_LOCK.write_text(json.dumps(pins, indent=4) + '\n')
+            elif pins[path] != integrity:
+                raise CommandError(f'{url} does not match its pinned hash: expected {pins[path]}, got {integrity}')
+            if path.endswith(('.css', '.js')):
+                content = SOURCE_MAP.sub(b'', content)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(content)
+            fetched += 1
+            state = 'pinned' if path in pinned else 'verified'
+            self.stdout.write(f'  • {path}: {len(content) / 1024:.1f} KiB, {integrity} {state}')
+
+        if pinned:
+            self.stdout.write(self.style.WARNING(f'  Pinned {", ".join(pinned)} in {VENDOR_LOCK.name}; review and commit it.'))
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Downloaded {fetched} file(s) into {VENDOR_ROOT / "vendor"}'))
+        self.stdout.write('  Run collectstatic to strip, fingerprint and compress them.')
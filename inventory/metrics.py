@@ -0,0 +1,284 @@
+import contextvars
+import heapq
+import logging
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this are logged with their slowest queries.
+SLOW_REQUEST_SECONDS = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500) / 1000
+
+# Slowest queries kept per request for the slow-request log.
+SLOW_QUERIES_KEPT = 3
+
+# Histogram buckets, Prometheus style (upper bounds, cumulative).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """Fixed-bucket histogram: per-bucket counts, sum and count"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-local request metrics, keyed by URL name.
+
+    Every worker process keeps its own registry; /metrics reports the
+    process that serves the scrape, as with Prometheus' multi-worker
+    Python clients without a shared store.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}       # (view, method, status) -> count
+            self.latency = {}        # (view, method) -> Histogram
+            self.queries = {}        # view -> Histogram of queries per request
+            self.query_seconds = {}  # view -> total seconds spent in SQL
+            self.render = {}         # view -> Histogram of template render time
+
+    def record(self, view, method, status, seconds, stats):
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._histogram(self.latency, (view, method), LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.queries, view, QUERY_COUNT_BUCKETS).observe(stats.query_count)
+            self.query_seconds[view] = self.query_seconds.get(view, 0.0) + stats.query_seconds
+            if stats.render_seconds:
+                self._histogram(self.render, view, LATENCY_BUCKETS).observe(stats.render_seconds)
+
+    @staticmethod
+    def _histogram(histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def render_prometheus(self):
+        """The registry in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += _counter(
+                'pharmacy_http_requests_total', 'Requests handled, by URL name, method and status code',
+                (({'view': v, 'method': m, 'status': s}, n) for (v, m, s), n in sorted(self.requests.items())),
+            )
+            lines += _histogram_lines(
+                'pharmacy_http_request_duration_seconds', 'Request latency, by URL name and method',
+                (({'view': v, 'method': m}, h) for (v, m), h in sorted(self.latency.items())),
+            )
+            lines += _histogram_lines(
+                'pharmacy_db_queries_per_request', 'SQL queries issued per request, by URL name',
+                (({'view': v}, h) for v, h in sorted(self.queries.items())),
+            )
+            lines += _counter(
+                'pharmacy_db_query_seconds_total', 'Time spent executing SQL, by URL name',
+                (({'view': v}, s) for v, s in sorted(self.query_seconds.items())),
+            )
+            lines += _histogram_lines(
+                'pharmacy_template_render_seconds', 'Template render time per request, by URL name',
+                (({'view': v}, h) for v, h in sorted(self.render.items())),
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+def _counter(name, help_text, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    lines += [f'{name}{{{_labels(labels)}}} {value}' for labels, value in samples]
+    return lines
+
+
+def _histogram_lines(name, help_text, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, histogram in samples:
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{_labels({**labels, "le": bound})}}} {cumulative}')
+        lines.append(f'{name}_bucket{{{_labels({**labels, "le": "+Inf"})}}} {histogram.count}')
+        lines.append(f'{name}_sum{{{_labels(labels)}}} {histogram.sum}')
+        lines.append(f'{name}_count{{{_labels(labels)}}} {histogram.count}')
+    return lines
+
+
+registry = MetricsRegistry()
+
+
+class RequestStats:
+    """
+    What one request spent in SQL and template rendering.
+
+    Query time is the time spent in cursor.execute(); rows fetched later
+    through a chunked iterator are not included.
+    """
+
+    __slots__ = ('query_count', 'query_seconds', 'slowest', 'render_seconds', 'render_depth')
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.slowest = []  # min-heap of (seconds, sql)
+        self.render_seconds = 0.0
+        self.render_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.query_count += 1
+            self.query_seconds += elapsed
+            if len(self.slowest) < SLOW_QUERIES_KEPT:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+
+_current_stats = contextvars.ContextVar('inventory_request_stats', default=None)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL and template render time of every request under
+    its URL name, and log requests slower than METRICS_SLOW_REQUEST_MS.
+
+    Put it first in MIDDLEWARE so the latency covers the other middleware.
+    Streaming responses are timed until the response starts. Works under
+    WSGI and ASGI alike, so async views stay on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with self.wrap_connections(stats):
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with self.wrap_connections(stats):
+                response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def wrap_connections(stats):
+        stack = ExitStack()
+        # Wrappers sit on the connection objects of this thread (or, under
+        # ASGI, of this request's context), so this also covers connections
+        # opened later in the request
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    @staticmethod
+    def record(request, response, stats, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        # Unmatched paths share one label so 404 scans cannot blow up the
+        # number of series
+        view = match.view_name if match is not None and match.view_name else '<unmatched>'
+        registry.record(view, request.method, response.status_code, elapsed, stats)
+
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            worst = sorted(stats.slowest, reverse=True)
+            logger.warning(
+                'Slow request: %s %s (%s) took %.0fms, %d queries in %.0fms, templates %.0fms%s',
+                request.method, request.path, view, elapsed * 1000, stats.query_count,
+                stats.query_seconds * 1000, stats.render_seconds * 1000,
+                ''.join(f'\n  {seconds * 1000:.1f}ms: {sql[:500]}' for seconds, sql in worst),
+            )
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """Django template backend that adds render time to the current request's stats"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current_stats.get()
+        if stats is None:
+            return self.template.render(context, request)
+        # Only the outermost render counts; render_to_string() inside a
+        # template tag is already part of it
+        stats.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.render_depth -= 1
+            if not stats.render_depth:
+                stats.render_seconds += time.perf_counter() - started
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, for METRICS_ALLOWED_IPS only"""
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden('Metrics are only served to METRICS_ALLOWED_IPS')
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_sale_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['expiry_date', 'id'], name='medicine_expiry_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['stock_quantity'], name='medicine_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['name'], name='medicine_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='medicine_lower_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['category', 'name'], name='medicine_category_name_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_batches(apps, schema_editor):
+    """Give every medicine in stock one opening lot holding all of it"""
+    Medicine = apps.get_model('inventory', 'Medicine')
+    StockBatch = apps.get_model('inventory', 'StockBatch')
+    in_stock = Medicine.objects.filter(stock_quantity__gt=0).order_by('pk').values_list(
+        'pk', 'stock_quantity', 'manufacture_date', 'expiry_date'
+    )
+    batch = []
+    for pk, quantity, manufactured, expiry in in_stock.iterator(chunk_size=5000):
+        batch.append(StockBatch(
+            medicine_id=pk, lot_number='OPENING', quantity=quantity,
+            manufacture_date=manufactured, expiry_date=expiry,
+        ))
+        if len(batch) >= 5000:
+            StockBatch.objects.bulk_create(batch)
+            batch = []
+    StockBatch.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_checkout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_number', models.CharField(max_length=50)),
+                ('quantity', models.PositiveIntegerField()),
+                ('manufacture_date', models.DateField()),
+                ('expiry_date', models.DateField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='inventory.medicine')),
+            ],
+            options={
+                'verbose_name_plural': 'Stock Batches',
+                'indexes': [models.Index(condition=models.Q(('quantity__gt', 0)), fields=['medicine', 'expiry_date', 'id'], name='stockbatch_fefo_idx')],
+            },
+        ),
+        migrations.RunPython(open_batches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:00
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def fill_calendar(apps, schema_editor):
+    """Build the calendar from the existing medicines and lots"""
+    Medicine = apps.get_model('inventory', 'Medicine')
+    StockBatch = apps.get_model('inventory', 'StockBatch')
+    ExpiryBucket = apps.get_model('inventory', 'ExpiryBucket')
+    days = defaultdict(lambda: [0, 0, Decimal('0')])
+    for day, count in Medicine.objects.values('expiry_date').annotate(count=models.Count('pk')).values_list('expiry_date', 'count'):
+        days[day][0] = count
+    value = models.ExpressionWrapper(
+        models.F('quantity') * models.F('medicine__price'),
+        output_field=models.DecimalField(max_digits=16, decimal_places=2),
+    )
+    for day, units, total in (
+        StockBatch.objects.filter(quantity__gt=0).values('expiry_date')
+        .annotate(units=models.Sum('quantity'), total=models.Sum(value)).values_list('expiry_date', 'units', 'total')
+    ):
+        days[day][1] = units
+        days[day][2] = total or Decimal('0')
+    ExpiryBucket.objects.bulk_create(
+        [ExpiryBucket(day=day, medicines=m, units=u, value=v) for day, (m, u, v) in sorted(days.items())],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_batches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('medicines', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'Expiry Calendar',
+            },
+        ),
+        migrations.RunPython(fill_calendar, migrations.RunPython.noop),
+    ]
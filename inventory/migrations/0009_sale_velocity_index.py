@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_expiry_calendar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['medicine', 'sold_at'], name='sale_medicine_sold_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:19
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def create_marker(apps, schema_editor):
+    """The single marker row, as of now"""
+    InventoryVersion = apps.get_model('inventory', 'InventoryVersion')
+    InventoryVersion.objects.create(pk=1, version=1, updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_sale_velocity_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Inventory Version',
+            },
+        ),
+        migrations.RunPython(create_marker, migrations.RunPython.noop),
+    ]
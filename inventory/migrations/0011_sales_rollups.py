@@ -0,0 +1,125 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:29
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+
+
+def fill_sale_categories(apps, schema_editor):
+    """Give recorded sales the current category of their medicine"""
+    Medicine = apps.get_model('inventory', 'Medicine')
+    Sale = apps.get_model('inventory', 'Sale')
+    category = Medicine.objects.filter(pk=models.OuterRef('medicine_id')).values('category')[:1]
+    Sale.objects.filter(medicine__isnull=False).update(
+        category=Coalesce(models.Subquery(category), models.Value(''))
+    )
+
+
+def fill_rollups(apps, schema_editor):
+    """Roll up the sales recorded so far"""
+    Sale = apps.get_model('inventory', 'Sale')
+    SalesDay = apps.get_model('inventory', 'SalesDay')
+    SalesMonth = apps.get_model('inventory', 'SalesMonth')
+    CategorySales = apps.get_model('inventory', 'CategorySales')
+    MedicineSales = apps.get_model('inventory', 'MedicineSales')
+    cent = Decimal('0.01')
+    sales = Sale.objects.order_by()
+    month = TruncMonth('sold_at', output_field=models.DateField())
+    totals = {'units': models.Sum('quantity'), 'total_revenue': models.Sum('total')}
+
+    def revenue(row):
+        return Decimal(row['total_revenue'] or 0).quantize(cent)
+
+    SalesDay.objects.bulk_create([
+        SalesDay(day=row['day'], sales=row['count'], units=row['units'], revenue=revenue(row))
+        for row in sales.values(day=TruncDate('sold_at')).annotate(count=models.Count('pk'), **totals)
+    ], batch_size=2000)
+    SalesMonth.objects.bulk_create([
+        SalesMonth(month=row['first_day'], sales=row['count'], units=row['units'], revenue=revenue(row))
+        for row in sales.values(first_day=month).annotate(count=models.Count('pk'), **totals)
+    ], batch_size=2000)
+    CategorySales.objects.bulk_create([
+        CategorySales(month=row['first_day'], category=row['category'], units=row['units'], revenue=revenue(row))
+        for row in sales.values('category', first_day=month).annotate(**totals)
+    ], batch_size=2000)
+    MedicineSales.objects.bulk_create([
+        MedicineSales(
+            month=row['first_day'], medicine_id=row['medicine_id'], medicine_name=row['name'],
+            units=row['units'], revenue=revenue(row),
+        )
+        for row in sales.values('medicine_id', first_day=month).annotate(name=models.Max('medicine_name'), **totals)
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_inventory_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('sales', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'Sales per Day',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('sales', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'Sales per Month',
+            },
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='CategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(max_length=100)),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name_plural': 'Sales per Category',
+                'constraints': [models.UniqueConstraint(fields=('month', 'category'), name='category_sales_month_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MedicineSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('medicine_name', models.CharField(max_length=200)),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('medicine', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='monthly_sales', to='inventory.medicine')),
+            ],
+            options={
+                'verbose_name_plural': 'Sales per Medicine',
+                'constraints': [models.UniqueConstraint(fields=('month', 'medicine'), name='medicine_sales_month_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_sale_categories, migrations.RunPython.noop),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:58
+
+from django.db import migrations, models
+
+
+def fill_stock_levels(apps, schema_editor):
+    """Count the existing medicines per stock band (LOW_STOCK_THRESHOLD was 10)"""
+    Medicine = apps.get_model('inventory', 'Medicine')
+    StockLevel = apps.get_model('inventory', 'StockLevel')
+    counts = Medicine.objects.aggregate(
+        out=models.Count('pk', filter=models.Q(stock_quantity=0)),
+        low=models.Count('pk', filter=~models.Q(stock_quantity=0) & models.Q(stock_quantity__lte=10)),
+        ok=models.Count('pk', filter=models.Q(stock_quantity__gt=10)),
+    )
+    StockLevel.objects.bulk_create([StockLevel(band=band, medicines=count) for band, count in counts.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_price_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.CharField(max_length=3, unique=True)),
+                ('medicines', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_stock_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_stock_levels'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(condition=models.Q(('stock_quantity__lte', 10)), fields=['expiry_date', 'id'], name='medicine_low_stock_idx'),
+        ),
+    ]
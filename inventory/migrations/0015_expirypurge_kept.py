@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_medicine_low_stock_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expirypurge',
+            name='kept',
+            field=models.PositiveIntegerField(default=0, help_text='Expired medicines kept for their lots still in date'),
+        ),
+    ]
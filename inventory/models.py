@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from django.utils.functional import cached_property
 
 
 class Medicine(models.Model):
@@ -16,19 +18,353 @@ class Medicine(models.Model):
     
     class Meta:
         verbose_name_plural = "Medicines"
+        indexes = [
+            # Expiry filters and the (expiry_date, id) keyset on the medicine list
+            models.Index(fields=['expiry_date', 'id'], name='medicine_expiry_id_idx'),
+            # Low-stock and out-of-stock filters
+            models.Index(fields=['stock_quantity'], name='medicine_stock_idx'),
+            # The low-stock list in (expiry_date, id) order: walking the
+            # whole expiry index would read every well-stocked medicine
+            # between two low ones (10 is stock_levels.LOW_STOCK_THRESHOLD)
+            models.Index(
+                fields=['expiry_date', 'id'],
+                condition=models.Q(stock_quantity__lte=10),
+                name='medicine_low_stock_idx',
+            ),
+            # Exact name lookups (import upserts) and name ordering
+            models.Index(fields=['name'], name='medicine_name_idx'),
+            # Case-insensitive name lookups through Lower('name')
+            models.Index(Lower('name'), name='medicine_lower_name_idx'),
+            # Category filters in the list and admin
+            models.Index(fields=['category', 'name'], name='medicine_category_name_idx'),
+        ]
+
+
+class StockBatch(models.Model):
+    """
+    One received lot of a medicine.
+
+    The medicine's stock_quantity is kept equal to the sum of its lots, and
+    its expiry_date to that of the first-expiring lot in stock, as lots are
+    received and sold.
+    """
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='batches')
+    lot_number = models.CharField(max_length=50)
+    quantity = models.PositiveIntegerField()
+    manufacture_date = models.DateField()
+    expiry_date = models.DateField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.medicine_id} lot {self.lot_number}: {self.quantity} (expires {self.expiry_date})"
+
+    class Meta:
+        verbose_name_plural = "Stock Batches"
+        indexes = [
+            # First-expiring-first-out allocation over the lots still in stock
+            models.Index(
+                fields=['medicine', 'expiry_date', 'id'],
+                condition=models.Q(quantity__gt=0),
+                name='stockbatch_fefo_idx',
+            ),
+        ]
+
+
+class ExpiryBucket(models.Model):
+    """
+    What expires on one day, maintained as stock moves (see expiry_calendar).
+
+    `medicines` counts medicines whose expiry_date is this day; `units` and
+    `value` are the stock of the lots expiring this day and its worth at
+    current prices.
+    """
+    day = models.DateField(unique=True)
+    medicines = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.medicines} medicine(s), {self.units} units (₹{self.value})"
+
+    class Meta:
+        verbose_name_plural = "Expiry Calendar"
+
+
+class StockLevel(models.Model):
+    """
+    How many medicines are in one stock band, maintained as stock moves
+    (see stock_levels): out of stock, low on stock or stocked.
+    """
+    band = models.CharField(max_length=3, unique=True)
+    medicines = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.band}: {self.medicines} medicine(s)"
 
 
 class CashBox(models.Model):
-    """Model representing the cash box in the pharmacy"""
+    """
+    Model representing the cash box in the pharmacy.
+
+    The box is a rolled-up checkpoint over the sales ledger: `current_cash`
+    holds the balance as of sale `rolled_up_to`, and the live balance is that
+    checkpoint plus the (short) tail of sales recorded since.
+    """
     current_cash = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rolled_up_to = models.BigIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"CashBox: ₹{self.current_cash}"
+        return f"CashBox: ₹{self.balance}"
+
+    @cached_property
+    def balance(self):
+        """Checkpoint balance plus the sales recorded after it"""
+        tail = Sale.objects.filter(pk__gt=self.rolled_up_to).aggregate(
+            total=models.Sum('total')
+        )['total']
+        return self.current_cash + (tail or 0)
 
     class Meta:
         verbose_name_plural = "Cash Box"
 
+
+class InventoryVersion(models.Model):
+    """
+    Single-row marker of the last inventory change.
+
+    Every catalog write bumps it in the writer's own transaction; read
+    views combine it with the newest sale and lot ids into ETag and
+    Last-Modified validators (see inventory.versioning).
+    """
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Inventory version {self.version} ({self.updated_at:%Y-%m-%d %H:%M:%S})"
+
+    class Meta:
+        verbose_name_plural = "Inventory Version"
+
+
+class Checkout(models.Model):
+    """One customer's basket, sold as a single cash movement"""
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    line_count = models.PositiveIntegerField()
+    sold_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='checkouts')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Checkout #{self.pk}: {self.line_count} item(s), ₹{self.total}"
+
+    class Meta:
+        verbose_name_plural = "Checkouts"
+
+
+class Sale(models.Model):
+    """Append-only ledger entry recorded for every sale"""
+    medicine = models.ForeignKey(Medicine, on_delete=models.SET_NULL, null=True, related_name='sales')
+    checkout = models.ForeignKey(Checkout, on_delete=models.PROTECT, null=True, blank=True, related_name='lines')
+    medicine_name = models.CharField(max_length=200)
+    category = models.CharField(max_length=100, blank=True, default='')
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.DecimalField(max_digits=12, decimal_places=2)
+    sold_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales')
+    sold_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.medicine_name} (₹{self.total})"
+
+    class Meta:
+        verbose_name_plural = "Sales"
+        indexes = [
+            # Units sold per medicine over a recent window (reorder velocity)
+            models.Index(fields=['medicine', 'sold_at'], name='sale_medicine_sold_idx'),
+        ]
+
+
+class SalesDay(models.Model):
+    """
+    Sales recorded on one day.
+
+    Like SalesMonth, CategorySales and MedicineSales, moved by each sale in
+    the transaction that records it (see inventory.rollups), so reports
+    read these rows instead of the ledger.
+    """
+    day = models.DateField(unique=True)
+    sales = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.sales} sale(s), ₹{self.revenue}"
+
+    class Meta:
+        verbose_name_plural = "Sales per Day"
+
+
+class SalesMonth(models.Model):
+    """Sales recorded in one month, keyed by its first day"""
+    month = models.DateField(unique=True)
+    sales = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.month:%B %Y}: {self.sales} sale(s), ₹{self.revenue}"
+
+    class Meta:
+        verbose_name_plural = "Sales per Month"
+
+
+class CategorySales(models.Model):
+    """Units and revenue of one category in one month"""
+    month = models.DateField()
+    category = models.CharField(max_length=100)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.category}, {self.month:%B %Y}: {self.units} units"
+
+    class Meta:
+        verbose_name_plural = "Sales per Category"
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'category'], name='category_sales_month_uniq'),
+        ]
+
+
+class MedicineSales(models.Model):
+    """Units and revenue of one medicine in one month"""
+    month = models.DateField()
+    medicine = models.ForeignKey(Medicine, on_delete=models.SET_NULL, null=True, related_name='monthly_sales')
+    medicine_name = models.CharField(max_length=200)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.medicine_name}, {self.month:%B %Y}: {self.units} units"
+
+    class Meta:
+        verbose_name_plural = "Sales per Medicine"
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'medicine'], name='medicine_sales_month_uniq'),
+        ]
+
+
+class PriceChange(models.Model):
+    """
+    One bulk repricing: by a percentage or a fixed amount, and the category
+    and expiry window it was limited to. The old and new price of every
+    medicine it changed are kept as PriceChangeLine rows.
+    """
+    percent = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    category = models.CharField(max_length=100, blank=True)
+    expires_from = models.DateField(null=True, blank=True)
+    expires_to = models.DateField(null=True, blank=True)
+    medicines = models.PositiveIntegerField(default=0)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='price_changes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def adjustment(self):
+        if self.percent is not None:
+            return f"{self.percent.normalize():+f}%"
+        return f"{'-' if self.amount < 0 else '+'}₹{abs(self.amount):.2f}"
+
+    def __str__(self):
+        return f"{self.adjustment} on {self.medicines} medicine(s), {self.created_at:%b %d, %Y}"
+
+    class Meta:
+        verbose_name_plural = "Price Changes"
+        ordering = ['-created_at', '-id']
+
+
+class PriceChangeLine(models.Model):
+    """A medicine's price before and after a PriceChange"""
+    change = models.ForeignKey(PriceChange, on_delete=models.CASCADE, related_name='lines')
+    medicine = models.ForeignKey(Medicine, on_delete=models.SET_NULL, null=True, related_name='price_changes')
+    medicine_name = models.CharField(max_length=200)
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.medicine_name}: ₹{self.old_price} → ₹{self.new_price}"
+
+    class Meta:
+        verbose_name_plural = "Price Change Lines"
+        constraints = [
+            models.UniqueConstraint(fields=['change', 'medicine'], name='price_change_medicine_uniq'),
+        ]
+
+
+class ExpiryPurge(models.Model):
+    """
+    One run of the expired-stock purge, and its progress.
+
+    Rows are moved to ArchivedMedicine in small batches, so a purge that was
+    interrupted is resumed simply by running it again.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    cutoff = models.DateField(help_text='Medicines expiring before this date are purged')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total = models.PositiveIntegerField(default=0)
+    archived = models.PositiveIntegerField(default=0)
+    kept = models.PositiveIntegerField(default=0, help_text='Expired medicines kept for their lots still in date')
+    error = models.TextField(blank=True)
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='expiry_purges')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Purge before {self.cutoff}: {self.archived}/{self.total} ({self.status})"
+
+    @property
+    def percent(self):
+        if self.status == self.DONE or not self.total:
+            return 100 if self.status == self.DONE else 0
+        return min(100, (self.archived + self.kept) * 100 // self.total)
+
+    @property
+    def is_active(self):
+        return self.status in (self.PENDING, self.RUNNING)
+
+    class Meta:
+        verbose_name_plural = "Expiry Purges"
+
+
+class ArchivedMedicine(models.Model):
+    """A medicine removed from the inventory by an expiry purge"""
+    original_id = models.BigIntegerField(db_index=True)
+    name = models.CharField(max_length=200)
+    category = models.CharField(max_length=100)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    stock_quantity = models.IntegerField()
+    manufacture_date = models.DateField()
+    expiry_date = models.DateField()
+    purge = models.ForeignKey(ExpiryPurge, on_delete=models.SET_NULL, null=True, related_name='medicines')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} (expired {self.expiry_date})"
+
+    class Meta:
+        verbose_name_plural = "Archived Medicines"
+
+
 class Pharmacist(models.Model):
     """Model extending User to manage pharmacist/employee details"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
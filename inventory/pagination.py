@@ -0,0 +1,136 @@
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset, shaped like Django's Page"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a unique ordering such as ('expiry_date', 'id')
+    or ('-id',); a '-' prefix orders that field descending.
+
+    Each page is a range seek from the cursor, so page 1000 costs the same as
+    page 1 as long as the ordering columns are indexed together. There is no
+    total page count; pages link to their neighbours through opaque cursors.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('expiry_date', 'id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.names = [name.lstrip('-') for name in self.ordering]
+        meta = queryset.model._meta
+        self.fields = [meta.pk if name in ('id', 'pk') else meta.get_field(name) for name in self.names]
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field in self.fields]
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def decode_cursor(self, cursor):
+        """Return the key values held in a cursor, or None if it is malformed"""
+        try:
+            raw = json.loads(urlsafe_base64_decode(cursor))
+            if len(raw) != len(self.fields):
+                return None
+            return [field.to_python(value) for field, value in zip(self.fields, raw)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _seek(self, key, forward):
+        """Build the row-value comparison (a, b) > (x, y) as nested Q objects"""
+        condition = Q()
+        for i in reversed(range(len(self.ordering))):
+            name = self.names[i]
+            ascending = not self.ordering[i].startswith('-')
+            lookup = 'gt' if forward == ascending else 'lt'
+            step = Q(**{f'{name}__{lookup}': key[i]})
+            if condition:
+                step |= Q(**{name: key[i]}) & condition
+            condition = step
+        return condition
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following the `after` cursor, the page preceding the
+        `before` cursor, or the first page when neither is given.
+        """
+        after_key = self.decode_cursor(after) if after else None
+        before_key = self.decode_cursor(before) if before else None
+
+        if before_key is not None:
+            backwards = [name.lstrip('-') if name.startswith('-') else f'-{name}' for name in self.ordering]
+            rows = list(
+                self.queryset.filter(self._seek(before_key, forward=False))
+                .order_by(*backwards)[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            if not rows:
+                return self.page()
+            return KeysetPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1]),
+                previous_cursor=self.encode_cursor(rows[0]) if has_more else None,
+            )
+
+        return self._forward_page(list(self._forward(after_key)), after_key)
+
+    async def apage(self, after=None):
+        """page() for async views, forward only: the page following `after`"""
+        after_key = self.decode_cursor(after) if after else None
+        return self._forward_page([row async for row in self._forward(after_key)], after_key)
+
+    def _forward(self, after_key):
+        queryset = self.queryset
+        if after_key is not None:
+            queryset = queryset.filter(self._seek(after_key, forward=True))
+        return queryset.order_by(*self.ordering)[:self.per_page + 1]
+
+    def _forward_page(self, rows, after_key):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_more else None,
+            previous_cursor=self.encode_cursor(rows[0]) if after_key is not None and rows else None,
+        )
+
+    def iterate(self):
+        """
+        Yield every row, one page-sized query at a time.
+
+        Unlike QuerySet.iterator() no cursor stays open between chunks, so a
+        long export never holds a read transaction (or SQLite's lock) while
+        the client is slow to consume it.
+        """
+        page = self.page()
+        while True:
+            yield from page.object_list
+            if not page.has_next():
+                return
+            page = self.page(after=page.next_cursor)
@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ArchivedMedicine, ExpiryPurge, Medicine, StockBatch
+from .batches import write_off_expired_batches
+from .expiry_calendar import forget_medicines
+
+
+logger = logging.getLogger(__name__)
+
+# Rows moved per transaction. Each batch holds the write lock only briefly,
+# so sales keep going between batches.
+PURGE_BATCH_SIZE = 200
+
+# Pause between batches, leaving the write lock free for the tills.
+PURGE_PAUSE = 0.05
+
+# A running purge whose progress has not moved for this long is taken to be
+# abandoned (e.g. the worker process restarted) and may be resumed.
+PURGE_STALE_AFTER = timedelta(minutes=2)
+
+
+def expired_medicines(cutoff=None):
+    return Medicine.objects.filter(expiry_date__lt=cutoff or date.today())
+
+
+def active_purge():
+    """Return the latest purge that has not finished (pending, running or failed), if any"""
+    return ExpiryPurge.objects.exclude(status=ExpiryPurge.DONE).order_by('-pk').first()
+
+
+def start_purge(user=None, cutoff=None):
+    """Record a new purge of everything expiring before `cutoff` (default today)"""
+    cutoff = cutoff or date.today()
+    return ExpiryPurge.objects.create(
+        cutoff=cutoff,
+        total=expired_medicines(cutoff).count(),
+        started_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def claim_purge(purge_id):
+    """
+    Mark a purge as running by this worker. Only pending, failed or stale
+    running purges can be claimed, so two workers never run the same purge.
+    """
+    now = timezone.now()
+    claimable = (
+        Q(status__in=[ExpiryPurge.PENDING, ExpiryPurge.FAILED])
+        | Q(status=ExpiryPurge.RUNNING, updated_at__lt=now - PURGE_STALE_AFTER)
+    )
+    return bool(
+        ExpiryPurge.objects.filter(claimable, pk=purge_id).update(
+            status=ExpiryPurge.RUNNING, error='', updated_at=now
+        )
+    )
+
+
+def archive_batch(purge, batch_size=PURGE_BATCH_SIZE):
+    """
+    Move the next batch of expired medicines into the archive in one short
+    transaction. A medicine that also holds lots still in date is kept: only
+    its expired lots are written off, and it counts as kept rather than
+    archived. Returns the number of medicines dealt with; 0 once nothing is
+    left.
+    """
+    with transaction.atomic():
+        # Write first: on SQLite this takes the write lock up front (waiting
+        # for a sale to finish if need be), instead of reading under a shared
+        # lock and failing with "database is locked" when upgrading it.
+        ExpiryPurge.objects.filter(pk=purge.pk).update(updated_at=timezone.now())
+        batch = list(expired_medicines(purge.cutoff).order_by('expiry_date', 'id')[:batch_size])
+        if not batch:
+            return 0
+        restocked = set(
+            StockBatch.objects.filter(
+                medicine_id__in=[medicine.pk for medicine in batch],
+                quantity__gt=0,
+                expiry_date__gte=purge.cutoff,
+            ).values_list('medicine_id', flat=True)
+        )
+        if restocked:
+            write_off_expired_batches(restocked, purge.cutoff)
+        expired = [medicine for medicine in batch if medicine.pk not in restocked]
+        ArchivedMedicine.objects.bulk_create([
+            ArchivedMedicine(
+                original_id=medicine.pk,
+                name=medicine.name,
+                category=medicine.category,
+                price=medicine.price,
+                stock_quantity=medicine.stock_quantity,
+                manufacture_date=medicine.manufacture_date,
+                expiry_date=medicine.expiry_date,
+                purge=purge,
+            )
+            for medicine in expired
+        ])
+        expired_ids = [medicine.pk for medicine in expired]
+        forget_medicines(expired_ids)
+        # Sales keep their medicine_name; their link is set to NULL
+        _, deleted = Medicine.objects.filter(pk__in=expired_ids).delete()
+        ExpiryPurge.objects.filter(pk=purge.pk).update(
+            archived=F('archived') + deleted.get(Medicine._meta.label, 0),
+            kept=F('kept') + len(restocked),
+        )
+    return len(batch)
+
+
+def run_purge(purge_id, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE, progress=None):
+    """
+    Archive every medicine expiring before the purge's cutoff, batch by batch.
+
+    Safe to call again on an interrupted purge: each batch is selected afresh,
+    so it carries on where the last committed batch left off. `progress`, if
+    given, is called with the refreshed purge after every batch.
+    Returns the purge, or None if another worker holds it.
+    """
+    if not claim_purge(purge_id):
+        return None
+    purge = ExpiryPurge.objects.get(pk=purge_id)
+    try:
+        while archive_batch(purge, batch_size):
+            if progress is not None:
+                purge.refresh_from_db()
+                progress(purge)
+            if pause:
+                time.sleep(pause)
+    except Exception as exc:
+        ExpiryPurge.objects.filter(pk=purge_id).update(
+            status=ExpiryPurge.FAILED, error=str(exc), updated_at=timezone.now()
+        )
+        raise
+    ExpiryPurge.objects.filter(pk=purge_id).update(
+        status=ExpiryPurge.DONE, finished_at=timezone.now(), updated_at=timezone.now()
+    )
+    purge.refresh_from_db()
+    return purge
+
+
+def _run_in_thread(purge_id):
+    close_old_connections()
+    try:
+        run_purge(purge_id)
+    except Exception:
+        # Also recorded on the purge itself as FAILED
+        logger.exception('Expiry purge %s failed', purge_id)
+    finally:
+        connection.close()
+
+
+def run_purge_in_background(purge):
+    """Run the purge in a worker thread once the current transaction commits"""
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=_run_in_thread, args=(purge.pk,), name=f'expiry-purge-{purge.pk}', daemon=True
+        ).start()
+    )
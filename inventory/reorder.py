@@ -0,0 +1,84 @@
+"""
+Reorder suggestions from sales velocity.
+
+Only a medicine sold over the window can be due for reorder, so the
+figures are one grouped query driven by the window's sales: SQLite reads
+them along the sold_at index, joins each to its medicine by primary key
+and sums per medicine. Velocity, days of cover, the reorder point and the
+suggested order are annotations on that query, worked out for every
+medicine at once in SQL. Neither the whole catalog nor the whole ledger
+is read.
+"""
+from datetime import date, datetime, time, timedelta
+from django.db.models import Case, Count, F, FloatField, IntegerField, Sum, Value, When
+from django.db.models.functions import Cast, Ceil, Greatest
+from django.utils import timezone
+from .models import Medicine
+
+
+# Days of sales the velocity is averaged over.
+VELOCITY_WINDOW_DAYS = 30
+
+# Days between placing an order and the stock arriving.
+LEAD_TIME_DAYS = 7
+
+# Extra days of sales held back against demand spikes. A medicine is due
+# for reorder once its stock covers no more than lead time plus this.
+SAFETY_DAYS = 7
+
+# Days of sales an order should cover once it arrives.
+TARGET_COVER_DAYS = 30
+
+WINDOW_CHOICES = [7, 30, 90]
+
+SUGGESTION_FIELDS = ['id', 'name', 'category', 'price', 'stock_quantity']
+
+
+def reorder_suggestions(window_days=VELOCITY_WINDOW_DAYS, lead_time_days=LEAD_TIME_DAYS,
+                        safety_days=SAFETY_DAYS, cover_days=TARGET_COVER_DAYS, today=None):
+    """
+    Reorder figures for every medicine sold over the last `window_days`
+    days; the others have nothing to reorder. Each row is the
+    medicine's SUGGESTION_FIELDS plus:
+
+    * sold: units sold over the window
+    * velocity: units sold per day over the window
+    * days_of_cover: days the stock lasts at that velocity
+    * reorder_point: stock at or below which an order is due
+    * suggested_quantity: units to order to cover the lead time and
+      `cover_days` more, 0 if no order is due
+    """
+    today = today or date.today()
+    since = timezone.make_aware(datetime.combine(today - timedelta(days=window_days), time.min))
+    return Medicine.objects.filter(sales__sold_at__gte=since).annotate(
+        sold=Sum('sales__quantity'),
+        velocity=Cast('sold', FloatField()) / window_days,
+        days_of_cover=F('stock_quantity') / F('velocity'),
+        reorder_point=Cast(Ceil(F('velocity') * (lead_time_days + safety_days)), IntegerField()),
+        suggested_quantity=Case(
+            When(
+                stock_quantity__lte=F('reorder_point'),
+                then=Greatest(
+                    Cast(Ceil(F('velocity') * (lead_time_days + cover_days)), IntegerField()) - F('stock_quantity'),
+                    Value(0),
+                ),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    ).values(*SUGGESTION_FIELDS, 'sold', 'velocity', 'days_of_cover', 'reorder_point', 'suggested_quantity')
+
+
+def reorder_due(suggestions):
+    """Suggestions with something to order, least cover first, then fastest selling"""
+    return suggestions.filter(suggested_quantity__gt=0).order_by('days_of_cover', '-velocity', 'name', 'pk')
+
+
+def reorder_summary(suggestions):
+    """How many medicines are due, the units to order and what they cost"""
+    summary = reorder_due(suggestions).order_by().aggregate(
+        medicines=Count('pk'),
+        units=Sum('suggested_quantity'),
+        cost=Sum(F('suggested_quantity') * F('price')),
+    )
+    return {key: value or 0 for key, value in summary.items()}
@@ -0,0 +1,128 @@
+import hashlib
+import time
+import uuid
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+
+ROLES_SESSION_KEY = '_inventory_roles'
+ROLES_VERSION_KEY = 'inventory:roles-version'
+
+# Seconds a session's copy of the roles is trusted. Group changes expire
+# the copies at once through the version tokens, but those live in the
+# default cache, which is per process with LocMemCache: another worker
+# only sees a revoked role once the copy it was handed is this old.
+ROLES_SESSION_TTL = 60
+
+MANAGER = 'Manager'
+STAFF = 'Staff'
+
+
+class UserRoles:
+    """The group names of one user, resolved once per request"""
+
+    def __init__(self, user, groups=()):
+        self.is_superuser = bool(getattr(user, 'is_superuser', False))
+        self.groups = list(groups)
+
+    def __contains__(self, name):
+        return name in self.groups
+
+    @property
+    def is_manager(self):
+        return self.is_superuser or MANAGER in self.groups
+
+    @property
+    def is_staff_member(self):
+        return STAFF in self.groups
+
+    @property
+    def label(self):
+        if self.is_superuser:
+            return 'Administrator'
+        return self.groups[0] if self.groups else 'User'
+
+    @property
+    def token(self):
+        """Short digest that changes with the roles, for validators of pages that show them"""
+        return hashlib.md5(repr((self.is_superuser, self.groups)).encode()).hexdigest()[:8]
+
+
+def _version_keys(user_id):
+    return ROLES_VERSION_KEY, f'{ROLES_VERSION_KEY}:{user_id}'
+
+
+def _current_version(user_id):
+    """
+    Token that changes whenever the user's (or any) group membership does.
+
+    A token missing from the cache is replaced with a fresh one, so an
+    evicted entry invalidates session copies instead of validating them.
+    """
+    keys = _version_keys(user_id)
+    tokens = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in tokens}
+    if missing:
+        cache.set_many(missing, None)
+        tokens.update(missing)
+    return ':'.join(tokens[key] for key in keys)
+
+
+def invalidate_roles(user_id=None):
+    """Expire cached roles of one user, or of everyone when user_id is None"""
+    key = ROLES_VERSION_KEY if user_id is None else f'{ROLES_VERSION_KEY}:{user_id}'
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def resolve_roles(request):
+    """Return the UserRoles of request.user, from the session when still valid"""
+    user = request.user
+    if not user.is_authenticated:
+        return UserRoles(user)
+
+    session = getattr(request, 'session', None)
+    version = _current_version(user.pk)
+    now = time.time()
+    if session is not None:
+        cached = session.get(ROLES_SESSION_KEY)
+        if (
+            cached and cached.get('user') == user.pk and cached.get('version') == version
+            and 0 <= now - cached.get('resolved_at', 0) < ROLES_SESSION_TTL
+        ):
+            return UserRoles(user, cached['groups'])
+
+    groups = list(user.groups.order_by('pk').values_list('name', flat=True))
+    if session is not None:
+        session[ROLES_SESSION_KEY] = {'user': user.pk, 'version': version, 'groups': groups, 'resolved_at': now}
+    return UserRoles(user, groups)
+
+
+async def aresolve_roles(request):
+    """resolve_roles() for async views; the session and group reads run in a thread"""
+    return await sync_to_async(resolve_roles)(request)
+
+
+def get_roles(request):
+    """request.roles when RoleMiddleware is installed, else resolve on the spot"""
+    roles = getattr(request, 'roles', None)
+    return roles if roles is not None else resolve_roles(request)
+
+
+class RoleMiddleware:
+    """Attach a lazily resolved request.roles; must follow AuthenticationMiddleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Resolving touches the database, so async views must not read
+        # request.roles but await aresolve_roles(); nothing is resolved
+        # until it is read
+        request.roles = SimpleLazyObject(lambda: resolve_roles(request))
+        # Under ASGI this is the next middleware's coroutine, awaited by the caller
+        return self.get_response(request)
@@ -0,0 +1,195 @@
+"""
+Sales rollups: sales, units and revenue per day and per month, and units
+and revenue per category and per medicine each month.
+
+record_sales() adds new sales to them in the transaction that records the
+sales, so reports over years of history sum a few hundred rollup rows
+instead of scanning the ledger. Bulk loaders that write sales directly call
+rebuild_sales_rollups() once at the end.
+"""
+from collections import Counter, defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DateField, F, Max, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from .models import CategorySales, MedicineSales, Sale, SalesDay, SalesMonth
+
+
+# Each rollup: its model, the fields that identify a row, the totals it keeps.
+ROLLUPS = [
+    (SalesDay, ('day',), ('sales', 'units', 'revenue')),
+    (SalesMonth, ('month',), ('sales', 'units', 'revenue')),
+    (CategorySales, ('month', 'category'), ('units', 'revenue')),
+    (MedicineSales, ('month', 'medicine_id'), ('units', 'revenue')),
+]
+
+ROLLUP_KEYS = {model: key_fields for model, key_fields, _ in ROLLUPS}
+
+# The same keys and totals as computed from the ledger
+LEDGER_KEYS = {
+    'day': TruncDate('sold_at'),
+    'month': TruncMonth('sold_at', output_field=DateField()),
+    'category': 'category',
+    'medicine_id': 'medicine_id',
+}
+LEDGER_TOTALS = {
+    'sales': Count('pk'),
+    'units': Sum('quantity'),
+    'revenue': Sum('total'),
+}
+
+CENT = Decimal('0.01')
+
+
+class RollupDelta:
+    """Sales to add to the rollups, collected per row and applied together"""
+
+    def __init__(self):
+        self.rows = defaultdict(Counter)
+        self.names = {}
+
+    def sale(self, sale, sign=1):
+        day = timezone.localdate(sale.sold_at)
+        keys = {'day': day, 'month': day.replace(day=1), 'category': sale.category, 'medicine_id': sale.medicine_id}
+        totals = {'sales': sign, 'units': sign * sale.quantity, 'revenue': sign * sale.total}
+        for model, key_fields, total_fields in ROLLUPS:
+            row = self.rows[model, tuple(keys[field] for field in key_fields)]
+            for field in total_fields:
+                row[field] += totals[field]
+        self.names[sale.medicine_id] = sale.medicine_name
+
+    def apply(self):
+        """
+        Write the deltas: one update per row, plus an insert for the rows a
+        period's first sales create. Today's rows nearly always exist, so
+        a sale usually costs one update per rollup.
+        """
+        for (model, key), totals in self.rows.items():
+            key = dict(zip(ROLLUP_KEYS[model], key))
+            increments = {field: F(field) + amount for field, amount in totals.items()}
+            if not model.objects.filter(**key).update(**increments):
+                # Conflicts with a row another sale just created are fine
+                model.objects.bulk_create([self._new_row(model, key)], ignore_conflicts=True)
+                model.objects.filter(**key).update(**increments)
+        self.rows.clear()
+
+    def _new_row(self, model, key):
+        if model is MedicineSales:
+            return model(medicine_name=self.names[key['medicine_id']], **key)
+        return model(**key)
+
+
+def record_sales(sales):
+    """Add saved Sale rows to the rollups; call it inside the sale's transaction"""
+    delta = RollupDelta()
+    for sale in sales:
+        delta.sale(sale)
+    delta.apply()
+
+
+def forget_sales(sales):
+    """Take sales about to be deleted (a Sale queryset) back out of the rollups"""
+    delta = RollupDelta()
+    for sale in sales.iterator():
+        delta.sale(sale, sign=-1)
+    delta.apply()
+
+
+def compute_rollup(model, key_fields, total_fields):
+    """{key: {total: amount}} of one rollup, summed from the ledger"""
+    plain = [field for field in key_fields if isinstance(LEDGER_KEYS[field], str)]
+    truncated = {field: LEDGER_KEYS[field] for field in key_fields if field not in plain}
+    totals = {field: LEDGER_TOTALS[field] for field in total_fields}
+    if model is MedicineSales:
+        totals['last_name'] = Max('medicine_name')
+    rows = {}
+    for row in Sale.objects.order_by().values(*plain, **truncated).annotate(**totals):
+        # SQLite sums decimals as floats
+        row['revenue'] = Decimal(row['revenue'] or 0).quantize(CENT)
+        rows[tuple(row.pop(field) for field in key_fields)] = row
+    return rows
+
+
+def rollup_drift():
+    """Rows where a rollup differs from a fresh computation, as (model, key, stored, computed)"""
+    drift = []
+    for model, key_fields, total_fields in ROLLUPS:
+        computed = {
+            key: tuple(row[field] for field in total_fields)
+            for key, row in compute_rollup(model, key_fields, total_fields).items()
+        }
+        empty = (0,) * len(total_fields)
+        stored = {}
+        for row in model.objects.values_list(*key_fields, *total_fields):
+            key, totals = row[:len(key_fields)], row[len(key_fields):]
+            # Sales of deleted medicines may be spread over several rows
+            stored[key] = tuple(a + b for a, b in zip(stored.get(key, empty), totals))
+        drift += [
+            (model, key, stored.get(key, empty), computed.get(key, empty))
+            for key in sorted(computed.keys() | stored.keys(), key=str)
+            if stored.get(key, empty) != computed.get(key, empty)
+        ]
+    return drift
+
+
+def rebuild_sales_rollups():
+    """Recompute every rollup from the ledger. Returns the number of rows per model"""
+    # Read the ledger in the same transaction that replaces the rollups, so a
+    # sale recorded in between cannot be lost or counted twice
+    with transaction.atomic():
+        computed = {model: compute_rollup(model, key_fields, total_fields) for model, key_fields, total_fields in ROLLUPS}
+        for model, key_fields, _ in ROLLUPS:
+            rows = []
+            for key, totals in computed[model].items():
+                if 'last_name' in totals:
+                    totals['medicine_name'] = totals.pop('last_name')
+                rows.append(model(**dict(zip(key_fields, key)), **totals))
+            model.objects.all().delete()
+            model.objects.bulk_create(rows, batch_size=2000)
+    return {model: len(rows) for model, rows in computed.items()}
+
+
+def month_start(day, months_back=0):
+    """First day of the month `months_back` months before `day`'s"""
+    index = day.year * 12 + day.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _summed(queryset, *fields):
+    totals = queryset.aggregate(**{field: Sum(field) for field in fields})
+    return {field: value or 0 for field, value in totals.items()}
+
+
+def sales_summary(since_month):
+    """Sales, units and revenue from `since_month` on"""
+    return _summed(SalesMonth.objects.filter(month__gte=since_month), 'sales', 'units', 'revenue')
+
+
+def revenue_by_month(since_month):
+    """SalesMonth rows from `since_month` on, newest first"""
+    return SalesMonth.objects.filter(month__gte=since_month).order_by('-month')
+
+
+def revenue_by_day(since):
+    """SalesDay rows from `since` on, newest first"""
+    return SalesDay.objects.filter(day__gte=since).order_by('-day')
+
+
+def category_sales(since_month):
+    """Units and revenue per category from `since_month` on, best selling first"""
+    return (
+        CategorySales.objects.filter(month__gte=since_month)
+        .values('category').annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', 'category')
+    )
+
+
+def top_sellers(since_month, limit=20):
+    """The medicines that sold the most units from `since_month` on"""
+    return (
+        MedicineSales.objects.filter(month__gte=since_month)
+        .values('medicine_id', 'medicine_name').annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-units', '-revenue', 'medicine_name')[:limit]
+    )
@@ -0,0 +1,209 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Sum, Value, When
+from django.utils import timezone
+from .models import Medicine, CashBox, Checkout, Sale
+from .batches import consume_stock
+from .rollups import record_sales
+
+
+# Fold the ledger tail into the cash box checkpoint every N sales so that
+# reading the balance only ever sums a bounded number of rows.
+CASH_ROLLUP_INTERVAL = 500
+
+
+class InsufficientStock(Exception):
+    """Raised when a sale asks for more units than are in stock"""
+
+    def __init__(self, medicine, requested):
+        self.medicine = medicine
+        self.requested = requested
+        super().__init__(
+            f'Cannot sell {requested} units. Only {medicine.stock_quantity} units available.'
+        )
+
+
+class CartUnavailable(Exception):
+    """Raised when one or more lines of a checkout cannot be sold"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(' '.join(
+            f'{shortage.medicine.name}: {shortage}' for shortage in shortages
+        ) or 'Stock changed during checkout. Please try again.')
+
+
+def get_cash_box():
+    """Return the pharmacy cash box, creating it on first use"""
+    cash_box = CashBox.objects.first()
+    if cash_box is None:
+        cash_box = CashBox.objects.create(current_cash=0)
+    return cash_box
+
+
+def sell_medicine(medicine_id, quantity, user=None):
+    """
+    Sell `quantity` units of a medicine atomically and record it in the ledger.
+
+    The stock check and decrement happen in a single conditional UPDATE, so
+    two tills selling the last units at the same time can never both succeed.
+    The units are then taken from the medicine's lots, first-expiring first.
+    The cash movement is an append-only Sale insert, also added to the sales
+    rollups; the cash box row is only touched by the periodic rollup every
+    CASH_ROLLUP_INTERVAL sales.
+
+    Returns the new Sale. Raises InsufficientStock if the stock ran out and
+    Medicine.DoesNotExist if the medicine is gone.
+    """
+    if quantity <= 0:
+        raise ValueError('Sold quantity must be greater than 0.')
+
+    with transaction.atomic():
+        updated = Medicine.objects.filter(
+            pk=medicine_id, stock_quantity__gte=quantity
+        ).update(stock_quantity=F('stock_quantity') - quantity)
+
+        medicine = Medicine.objects.get(pk=medicine_id)
+        if not updated:
+            raise InsufficientStock(medicine, quantity)
+        consume_stock(medicine, quantity)
+
+        sale = Sale.objects.create(
+            medicine=medicine,
+            medicine_name=medicine.name,
+            category=medicine.category,
+            quantity=quantity,
+            unit_price=medicine.price,
+            total=quantity * medicine.price,
+            sold_by=user if user is not None and user.is_authenticated else None,
+        )
+        record_sales([sale])
+        # Piggyback the periodic rollup on a transaction that already holds
+        # the write lock rather than contending for it separately.
+        if sale.pk % CASH_ROLLUP_INTERVAL == 0:
+            rollup_cash()
+
+    return sale
+
+
+def merge_cart_lines(lines):
+    """
+    Return {medicine_id: quantity} for (medicine_id, quantity) pairs,
+    adding up lines for the same medicine.
+    """
+    quantities = {}
+    for medicine_id, quantity in lines:
+        if quantity <= 0:
+            raise ValueError('Sold quantity must be greater than 0.')
+        quantities[medicine_id] = quantities.get(medicine_id, 0) + quantity
+    if not quantities:
+        raise ValueError('The cart is empty.')
+    return quantities
+
+
+def checkout(lines, user=None):
+    """
+    Sell a whole cart of (medicine_id, quantity) lines in one transaction.
+
+    Either every line is sold or none is. The stock of all lines is checked
+    up front, then decremented by a single conditional UPDATE and allocated
+    to each medicine's lots first-expiring first; the ledger
+    gets one Checkout (the cash movement) and its Sale lines in one insert,
+    and the lines are added to the sales rollups.
+
+    Returns the Checkout. Raises CartUnavailable listing every line that
+    lacks stock, and Medicine.DoesNotExist if a medicine is gone.
+    """
+    quantities = merge_cart_lines(lines)
+
+    with transaction.atomic():
+        medicines = Medicine.objects.in_bulk(list(quantities))
+        missing = [pk for pk in quantities if pk not in medicines]
+        if missing:
+            raise Medicine.DoesNotExist(f'Medicine(s) {", ".join(map(str, missing))} no longer exist.')
+        shortages = [
+            InsufficientStock(medicines[pk], quantity)
+            for pk, quantity in quantities.items()
+            if medicines[pk].stock_quantity < quantity
+        ]
+        if shortages:
+            raise CartUnavailable(shortages)
+
+        # Conditional per line like sell_medicine, so a sale committed by
+        # another till since the read above cannot drive any line negative
+        enough = Q()
+        for pk, quantity in quantities.items():
+            enough |= Q(pk=pk, stock_quantity__gte=quantity)
+        updated = Medicine.objects.filter(enough).update(
+            stock_quantity=F('stock_quantity') - Case(
+                *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+                output_field=IntegerField(),
+            )
+        )
+        if updated == len(quantities):
+            # Re-read under the write lock: other tills may have sold some
+            # of these medicines since the check above
+            for pk, stock in Medicine.objects.filter(pk__in=list(quantities)).values_list('pk', 'stock_quantity'):
+                medicines[pk].stock_quantity = stock
+            for pk, quantity in quantities.items():
+                consume_stock(medicines[pk], quantity)
+            sold_by = user if user is not None and user.is_authenticated else None
+            sales = [
+                Sale(
+                    medicine=medicines[pk],
+                    medicine_name=medicines[pk].name,
+                    category=medicines[pk].category,
+                    quantity=quantity,
+                    unit_price=medicines[pk].price,
+                    total=quantity * medicines[pk].price,
+                    sold_by=sold_by,
+                )
+                for pk, quantity in quantities.items()
+            ]
+            cart = Checkout.objects.create(
+                total=sum(sale.total for sale in sales),
+                line_count=len(sales),
+                sold_by=sold_by,
+            )
+            for sale in sales:
+                sale.checkout = cart
+            Sale.objects.bulk_create(sales)
+            record_sales(sales)
+            # Same cadence as sell_medicine: roll up when the cart's sales
+            # cross a multiple of CASH_ROLLUP_INTERVAL
+            if sales[-1].pk // CASH_ROLLUP_INTERVAL > (sales[0].pk - 1) // CASH_ROLLUP_INTERVAL:
+                rollup_cash()
+            return cart
+        transaction.set_rollback(True)
+
+    # Lost a race for the last units: report the stock as it is now
+    current = Medicine.objects.in_bulk(list(quantities))
+    raise CartUnavailable([
+        InsufficientStock(current[pk], quantity)
+        for pk, quantity in quantities.items()
+        if pk in current and current[pk].stock_quantity < quantity
+    ])
+
+
+def rollup_cash():
+    """
+    Fold every sale recorded since the last checkpoint into the cash box.
+
+    Returns the number of sales rolled up.
+    """
+    with transaction.atomic():
+        cash_box = get_cash_box()
+        upto = Sale.objects.aggregate(last=Max('pk'))['last'] or 0
+        if upto <= cash_box.rolled_up_to:
+            return 0
+        tail = Sale.objects.filter(pk__gt=cash_box.rolled_up_to, pk__lte=upto)
+        summary = tail.aggregate(total=Sum('total'), count=Count('pk'))
+        # Conditional on the checkpoint we read, so two concurrent rollups
+        # can never add the same tail twice.
+        updated = CashBox.objects.filter(
+            pk=cash_box.pk, rolled_up_to=cash_box.rolled_up_to
+        ).update(
+            current_cash=F('current_cash') + (summary['total'] or 0),
+            rolled_up_to=upto,
+            last_updated=timezone.now(),
+        )
+    return summary['count'] if updated else 0
@@ -0,0 +1,270 @@
+import bisect
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from django.db import connection
+from .models import Medicine
+
+
+# Signals keep the index in step with this process's writes. Writes made by
+# other worker processes show up once a background rebuild, started when
+# the index is this old, swaps a fresh copy in.
+SEARCH_INDEX_MAX_AGE = 300
+
+# Upper bound on the ranked matches returned for one query.
+MAX_RESULTS = 500
+
+# Rank tiers; fuzzy matches score their trigram similarity (0..1).
+EXACT_MATCH_SCORE = 4.0
+NAME_PREFIX_SCORE = 3.0
+WORD_PREFIX_SCORE = 2.0
+CATEGORY_SCORE = 1.5
+
+# Minimum trigram similarity for a fuzzy (typo-tolerant) match.
+FUZZY_THRESHOLD = 0.3
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def trigrams(text):
+    """Padded trigrams of every word in `text`, pg_trgm style"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets"""
+    overlap = len(a & b)
+    return overlap / (len(a) + len(b) - overlap) if overlap else 0.0
+
+
+class MedicineSearchIndex:
+    """
+    In-process index over medicine name and category.
+
+    Matches are ranked exact name first, then name prefix, word prefix,
+    category prefix and finally fuzzy trigram similarity, so "amox",
+    "Amoxicilin" and "antibiotic" all find Amoxicillin. Prefix tiers are
+    answered by bisecting sorted key lists; the fuzzy tier only walks the
+    postings of the query's rarest trigrams. The index holds ids and the two
+    text columns only; callers load full rows for the page they display.
+
+    Only the very first search waits for the index to load. Later rebuilds
+    load a new copy in a background thread while the old one keeps
+    answering, then swap it in, replaying the saves and deletes signalled
+    while it loaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self._built_at = None
+        self._changes = None
+        self._refresher = None
+
+    def _reset(self):
+        self._docs = {}
+        self._names = []
+        self._words = []
+        self._categories = defaultdict(set)
+        self._postings = defaultdict(set)
+
+    def _add(self, pk, name, category, presorted=False):
+        name_norm = normalize(name)
+        category_norm = normalize(category)
+        grams = trigrams(name)
+        self._docs[pk] = (name, category, name_norm, category_norm, grams)
+        if presorted:
+            self._names.append((name_norm, pk))
+            self._words.extend((word, pk) for word in set(name_norm.split()))
+        else:
+            bisect.insort(self._names, (name_norm, pk))
+            for word in set(name_norm.split()):
+                bisect.insort(self._words, (word, pk))
+        self._categories[category_norm].add(pk)
+        for gram in grams:
+            self._postings[gram].add(pk)
+
+    def _remove(self, pk):
+        doc = self._docs.pop(pk, None)
+        if doc is None:
+            return
+        _, _, name_norm, category_norm, grams = doc
+        self._discard_sorted(self._names, (name_norm, pk))
+        for word in set(name_norm.split()):
+            self._discard_sorted(self._words, (word, pk))
+        self._categories[category_norm].discard(pk)
+        if not self._categories[category_norm]:
+            del self._categories[category_norm]
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(pk)
+                if not postings:
+                    del self._postings[gram]
+
+    @staticmethod
+    def _discard_sorted(keys, key):
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    @staticmethod
+    def _prefixed(keys, prefix):
+        """Yield pks whose sorted key starts with `prefix`, in key order"""
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            yield keys[i][1]
+            i += 1
+
+    @classmethod
+    def _load(cls):
+        """A new index filled from the database; touches no shared state"""
+        fresh = cls()
+        rows = Medicine.objects.values_list('pk', 'name', 'category').iterator(chunk_size=5000)
+        for pk, name, category in rows:
+            fresh._add(pk, name, category, presorted=True)
+        fresh._names.sort()
+        fresh._words.sort()
+        return fresh
+
+    def rebuild(self):
+        """Reload the whole index from the database and swap it in"""
+        with self._lock:
+            if self._changes is None:
+                self._changes = []
+        fresh = self._load()
+        with self._lock:
+            self._docs, self._names, self._words = fresh._docs, fresh._names, fresh._words
+            self._categories, self._postings = fresh._categories, fresh._postings
+            # The load may have read a row before or after a change signalled
+            # meanwhile; replaying it is right either way
+            changes, self._changes = self._changes or [], None
+            for pk, doc in changes:
+                self._remove(pk)
+                if doc is not None:
+                    self._add(pk, *doc)
+            self._built_at = time.monotonic()
+
+    def _refresh(self):
+        try:
+            self.rebuild()
+        finally:
+            # The thread's own connection, opened by the load
+            connection.close()
+            with self._lock:
+                self._refresher = None
+
+    def _ensure_fresh(self):
+        """Load the first index; after that, rebuild a stale one in the background"""
+        if self._built_at is None:
+            self.rebuild()
+        elif time.monotonic() - self._built_at > SEARCH_INDEX_MAX_AGE and self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh, name='search-index-rebuild', daemon=True)
+            self._refresher.start()
+
+    def invalidate(self):
+        """Rebuild in the background on next use, e.g. after a bulk write that sent no signals"""
+        with self._lock:
+            if self._built_at is not None:
+                self._built_at = -math.inf
+
+    def _record(self, pk, doc):
+        if self._changes is not None:
+            self._changes.append((pk, doc))
+
+    def update(self, medicine):
+        """Re-index one medicine after it was saved"""
+        with self._lock:
+            self._record(medicine.pk, (medicine.name, medicine.category))
+            if self._built_at is None:
+                return
+            self._remove(medicine.pk)
+            self._add(medicine.pk, medicine.name, medicine.category)
+
+    def discard(self, pk):
+        """Drop one medicine after it was deleted"""
+        with self._lock:
+            self._record(pk, None)
+            if self._built_at is not None:
+                self._remove(pk)
+
+    def _fuzzy(self, query, exclude, cap):
+        """
+        Trigram matches at or above FUZZY_THRESHOLD.
+
+        A document reaching the threshold must share at least
+        ceil(threshold * |Q|) of the query's trigrams, so it must contain one
+        of the |Q| - that + 1 rarest ones; only those postings are walked.
+        """
+        grams = trigrams(query)
+        needed = math.ceil(FUZZY_THRESHOLD * len(grams))
+        rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(grams) - needed + 1]:
+            candidates.update(self._postings.get(gram, ()))
+        matches = []
+        for pk in candidates - exclude:
+            score = similarity(grams, self._docs[pk][4])
+            if score >= FUZZY_THRESHOLD:
+                matches.append((pk, score))
+        matches.sort(key=lambda item: (-item[1], self._docs[item[0]][2]))
+        return matches[:cap]
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Return [(pk, score), ...] best first, at most `limit` of them"""
+        query_norm = normalize(query)
+        if not query_norm:
+            return []
+        limit = min(limit, MAX_RESULTS)
+
+        with self._lock:
+            self._ensure_fresh()
+            found = {}
+
+            for pk in self._prefixed(self._names, query_norm):
+                if len(found) >= limit:
+                    break
+                name_norm = self._docs[pk][2]
+                found[pk] = EXACT_MATCH_SCORE if name_norm == query_norm else NAME_PREFIX_SCORE
+
+            if len(found) < limit and ' ' not in query_norm:
+                for pk in self._prefixed(self._words, query_norm):
+                    if len(found) >= limit:
+                        break
+                    found.setdefault(pk, WORD_PREFIX_SCORE)
+
+            if len(found) < limit:
+                for category_norm, pks in self._categories.items():
+                    if category_norm.startswith(query_norm):
+                        for pk in pks:
+                            if len(found) >= limit:
+                                break
+                            found.setdefault(pk, CATEGORY_SCORE)
+
+            if len(found) < limit and len(query_norm) >= 3:
+                for pk, score in self._fuzzy(query_norm, set(found), limit - len(found)):
+                    found[pk] = score
+
+            ranked = sorted(found.items(), key=lambda item: (-item[1], self._docs[item[0]][2], item[0]))
+        return ranked
+
+    def suggest(self, query, limit=10):
+        """Autocomplete suggestions straight from the index, without a query"""
+        with self._lock:
+            return [
+                {'id': pk, 'name': self._docs[pk][0], 'category': self._docs[pk][1]}
+                for pk, _ in self.search(query, limit=limit)
+            ]
+
+
+search_index = MedicineSearchIndex()
@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
+from django.dispatch import receiver
+from .models import CashBox, Medicine, StockBatch
+from .expiry_calendar import CalendarDelta, reprice
+from .roles import invalidate_roles
+from .search import search_index
+from .stock_levels import StockDelta
+from .stats import invalidate_medicine_categories
+from .versioning import bump_inventory_version
+
+
+@receiver([post_save, post_delete], sender=Medicine)
+@receiver(post_save, sender=CashBox)
+def medicine_changed(sender, **kwargs):
+    """Keep the inventory version in step with catalog edits; sales and lots carry their own ids"""
+    bump_inventory_version()
+
+
+@receiver([post_save, post_delete], sender=Medicine)
+def medicine_categories_changed(sender, **kwargs):
+    """A saved or deleted medicine may add or remove a category"""
+    invalidate_medicine_categories()
+
+
+@receiver(pre_save, sender=Medicine)
+def remember_calendar_fields(sender, instance, raw=False, **kwargs):
+    """Note the stored expiry, price and stock of an edited medicine for the receivers below"""
+    if raw or instance.pk is None:
+        instance._calendar_before = None
+    else:
+        instance._calendar_before = (
+            Medicine.objects.filter(pk=instance.pk).values_list('expiry_date', 'price', 'stock_quantity').first()
+        )
+
+
+def _saved_value(instance, update_fields, name, stored):
+    """The value a save wrote to `name`: the stored one when update_fields left it out"""
+    if update_fields is not None and name not in update_fields:
+        return stored
+    return getattr(instance, name)
+
+
+@receiver(post_save, sender=Medicine)
+def calendar_medicine_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Move a saved medicine on the expiry calendar"""
+    if raw:
+        return
+    before = getattr(instance, '_calendar_before', None)
+    delta = CalendarDelta()
+    if created or before is None:
+        delta.medicine(instance.expiry_date)
+    else:
+        old_expiry, old_price, _ = before
+        delta.move_medicine(old_expiry, _saved_value(instance, update_fields, 'expiry_date', old_expiry))
+        new_price = _saved_value(instance, update_fields, 'price', old_price)
+        if old_price != new_price:
+            reprice(instance.pk, old_price, new_price)
+    delta.apply()
+
+
+@receiver(post_save, sender=Medicine)
+def stock_level_medicine_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Count a new medicine, or move an edited one, on the stock level counters"""
+    if raw:
+        return
+    before = getattr(instance, '_calendar_before', None)
+    delta = StockDelta()
+    if created or before is None:
+        delta.medicine(instance.stock_quantity)
+    else:
+        delta.move(before[2], _saved_value(instance, update_fields, 'stock_quantity', before[2]))
+    delta.apply()
+
+
+@receiver(post_save, sender=StockBatch)
+def calendar_batch_received(sender, instance, created, raw=False, **kwargs):
+    """Put a newly received lot on the expiry calendar"""
+    if created and not raw and instance.quantity > 0:
+        delta = CalendarDelta()
+        delta.stock(instance.expiry_date, instance.quantity, instance.medicine.price)
+        delta.apply()
+
+
+@receiver(post_save, sender=Medicine)
+def reindex_medicine(sender, instance, **kwargs):
+    """Keep the in-process search index in step with saved medicines"""
+    transaction.on_commit(lambda: search_index.update(instance))
+
+
+@receiver(post_delete, sender=Medicine)
+def unindex_medicine(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: search_index.discard(pk))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def group_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Expire session-cached roles of every user whose groups changed"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_roles(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            invalidate_roles(user_id)
+    else:
+        invalidate_roles()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def group_changed(sender, **kwargs):
+    invalidate_roles()
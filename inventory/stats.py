@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from .models import Medicine
+from .expiry_calendar import aexpiry_counters, expiry_counters
+from .stock_levels import LOW_STOCK_THRESHOLD, astock_counters, stock_counters
+
+
+EXPIRING_SOON_DAYS = 30
+
+CATEGORIES_CACHE_KEY = 'inventory:categories'
+CATEGORIES_CACHE_TIMEOUT = 300
+
+
+def get_inventory_stats(today=None):
+    """
+    Every inventory counter: stock levels from the stock level counters,
+    expiry counters from the expiry calendar. Both are kept up to date by
+    the writes themselves, so this reads a few small rows and needs no
+    cache.
+    """
+    today = today or date.today()
+    stats = stock_counters()
+    stats.update(expiry_counters(today, today + timedelta(days=EXPIRING_SOON_DAYS)))
+    return stats
+
+
+async def aget_inventory_stats(today=None):
+    """get_inventory_stats() on the async ORM"""
+    today = today or date.today()
+    stats = await astock_counters()
+    stats.update(await aexpiry_counters(today, today + timedelta(days=EXPIRING_SOON_DAYS)))
+    return stats
+
+
+def medicine_categories():
+    """
+    Every medicine category, sorted and cached. Saved and deleted medicines
+    clear it; bulk loaders' new categories show up within
+    CATEGORIES_CACHE_TIMEOUT.
+    """
+    categories = cache.get(CATEGORIES_CACHE_KEY)
+    if categories is None:
+        categories = distinct_categories()
+        cache.set(CATEGORIES_CACHE_KEY, categories, CATEGORIES_CACHE_TIMEOUT)
+    return categories
+
+
+def distinct_categories():
+    """
+    Every medicine category, sorted, by hopping along
+    medicine_category_name_idx: one seek per category rather than a DISTINCT
+    that reads an index entry per medicine.
+    """
+    categories = []
+    ordered = Medicine.objects.order_by('category').values_list('category', flat=True)
+    category = ordered.first()
+    while category is not None:
+        categories.append(category)
+        category = ordered.filter(category__gt=category).first()
+    return categories
+
+
+def invalidate_medicine_categories():
+    transaction.on_commit(lambda: cache.delete(CATEGORIES_CACHE_KEY))
@@ -0,0 +1,118 @@
+"""
+Stock level counters: how many medicines are out of stock, low on stock
+and stocked.
+
+StockLevel holds one row per band, moved by deltas in the same transaction
+as the stock change that causes them, like the expiry calendar. A sale
+only writes a row when it takes its medicine into another band, so the
+counters are no hot spot for the tills. Bulk loaders that bypass the deltas
+call rebuild_stock_levels() once at the end, as does a change of
+LOW_STOCK_THRESHOLD.
+"""
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, Q
+from .models import Medicine, StockLevel
+
+
+LOW_STOCK_THRESHOLD = 10
+
+OUT_OF_STOCK = 'out'
+LOW_STOCK = 'low'
+IN_STOCK = 'ok'
+BANDS = [OUT_OF_STOCK, LOW_STOCK, IN_STOCK]
+
+
+def stock_band(stock):
+    if stock == 0:
+        return OUT_OF_STOCK
+    if stock <= LOW_STOCK_THRESHOLD:
+        return LOW_STOCK
+    return IN_STOCK
+
+
+class StockDelta:
+    """Medicines entering and leaving stock bands, collected and applied together"""
+
+    def __init__(self):
+        self.bands = Counter()
+
+    def medicine(self, stock, count=1):
+        self.bands[stock_band(stock)] += count
+
+    def move(self, old_stock, new_stock):
+        self.medicine(old_stock, -1)
+        self.medicine(new_stock)
+
+    def apply(self):
+        """Write the deltas: one insert for unseen bands, one update per band that changed"""
+        changes = {band: count for band, count in self.bands.items() if count}
+        if not changes:
+            return
+        StockLevel.objects.bulk_create([StockLevel(band=band) for band in changes], ignore_conflicts=True)
+        for band, count in changes.items():
+            StockLevel.objects.filter(band=band).update(medicines=F('medicines') + count)
+        self.bands.clear()
+
+
+def _band_counts():
+    return {
+        OUT_OF_STOCK: Count('pk', filter=Q(stock_quantity=0)),
+        LOW_STOCK: Count('pk', filter=~Q(stock_quantity=0) & Q(stock_quantity__lte=LOW_STOCK_THRESHOLD)),
+        IN_STOCK: Count('pk', filter=Q(stock_quantity__gt=LOW_STOCK_THRESHOLD)),
+    }
+
+
+def forget_stock(medicine_ids):
+    """Take medicines about to be deleted off the counters"""
+    delta = StockDelta()
+    for band, count in Medicine.objects.filter(pk__in=medicine_ids).aggregate(**_band_counts()).items():
+        delta.bands[band] -= count
+    delta.apply()
+
+
+def compute_stock_levels():
+    """Count the medicines in each band from the catalog itself: {band: medicines}"""
+    return Medicine.objects.aggregate(**_band_counts())
+
+
+def stock_level_drift():
+    """[(band, stored, computed)] for every band whose counter is wrong"""
+    stored = dict(StockLevel.objects.values_list('band', 'medicines'))
+    computed = compute_stock_levels()
+    return [
+        (band, stored.get(band, 0), computed[band])
+        for band in BANDS
+        if stored.get(band, 0) != computed[band]
+    ]
+
+
+def rebuild_stock_levels():
+    """Recount every band from the catalog. Returns {band: medicines}"""
+    # Count inside the transaction that replaces the counters, so a delta
+    # committed in between cannot be lost or applied twice
+    with transaction.atomic():
+        computed = compute_stock_levels()
+        StockLevel.objects.all().delete()
+        StockLevel.objects.bulk_create([StockLevel(band=band, medicines=computed[band]) for band in BANDS])
+    return computed
+
+
+def _counters(levels):
+    levels = dict(levels)
+    out_of_stock = levels.get(OUT_OF_STOCK, 0)
+    return {
+        'total_medicines': sum(levels.values()),
+        'low_stock': out_of_stock + levels.get(LOW_STOCK, 0),
+        'out_of_stock': out_of_stock,
+    }
+
+
+def stock_counters():
+    """Total, low-stock (out of stock included) and out-of-stock medicines, from the counters"""
+    return _counters(StockLevel.objects.values_list('band', 'medicines'))
+
+
+async def astock_counters():
+    """stock_counters() on the async ORM"""
+    return _counters([row async for row in StockLevel.objects.values_list('band', 'medicines')])
@@ -0,0 +1,16 @@
+from django import template
+from django.templatetags.static import static
+from inventory.assets import VENDOR_FILES
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_static(path):
+    """
+    {% static %} URL of a vendored asset. There is no CDN fallback: the
+    inventory.E001 check stops the site while a file is not vendored.
+    """
+    if path not in VENDOR_FILES:
+        raise template.TemplateSyntaxError(f'{path} is not a vendored asset; add it to VENDOR_FILES')
+    return static(path)
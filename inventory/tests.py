@@ -1,3 +1,417 @@
-from django.test import TestCase
+import base64
+import csv
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .batches import OPENING_LOT, opening_batch, receive_batch, write_off_expired_batches
+from .bulk import adjust_stock, reprice_medicines
+from .filters import filter_medicines
+from .forms import MedicineForm
+from .expiry_calendar import calendar_drift, forget_medicines
+from .models import ArchivedMedicine, Medicine, PriceChange, Sale, StockBatch
+from .purge import run_purge, start_purge
+from .search import MedicineSearchIndex
+from .roles import MANAGER, ROLES_SESSION_TTL, ROLES_VERSION_KEY
+from .rollups import rollup_drift
+from .reorder import reorder_due, reorder_suggestions, reorder_summary
+from .sales import InsufficientStock, checkout, get_cash_box, sell_medicine
+from .stats import get_inventory_stats
+from .stock_levels import stock_level_drift
+
+
+# Pages link the vendored assets; the tests need no collected manifest
+PLAIN_STATIC = override_settings(STORAGES={
+    **settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+def make_medicine(name='Paracetamol', category='Analgesic', price='10.00', stock=20, expires_in=200):
+    """A saved medicine with its stock in an opening lot, as the add page creates it"""
+    today = date.today()
+    medicine = Medicine.objects.create(
+        name=name, category=category, price=Decimal(price), stock_quantity=stock,
+        manufacture_date=today - timedelta(days=100), expiry_date=today + timedelta(days=expires_in),
+    )
+    if stock:
+        opening_batch(medicine).save()
+    return medicine
+
+
+class ConcurrentSaleTests(TransactionTestCase):
+    def test_concurrent_sales_never_oversell(self):
+        medicine = make_medicine(stock=5)
+        tills = 12
+        start = Barrier(tills)
+
+        def sell():
+            start.wait()
+            try:
+                while True:
+                    try:
+                        sell_medicine(medicine.pk, 1)
+                        return True
+                    except InsufficientStock:
+                        return False
+                    except OperationalError:
+                        # The database was locked by another till; try again
+                        continue
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=tills) as pool:
+            sold = list(pool.map(lambda _: sell(), range(tills)))
+
+        medicine.refresh_from_db()
+        self.assertEqual(sold.count(True), 5)
+        self.assertEqual(medicine.stock_quantity, 0)
+        self.assertEqual(Sale.objects.count(), 5)
+        self.assertEqual(sum(StockBatch.objects.values_list('quantity', flat=True)), 0)
+
+
+class RepriceTests(TestCase):
+    def setUp(self):
+        self.medicine = make_medicine(price='10.00')
+
+    def test_int_percent(self):
+        change = reprice_medicines([self.medicine.pk], percent=10)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.price, Decimal('11.00'))
+        self.assertEqual(change.adjustment, '+10%')
+        self.assertEqual(PriceChange.objects.get().percent, Decimal('10'))
+
+    def test_int_amount(self):
+        change = reprice_medicines([self.medicine.pk], amount=-3)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.price, Decimal('7.00'))
+        self.assertEqual(change.adjustment, '-₹3.00')
+
+    def test_rejects_non_finite(self):
+        for value in ('nan', float('inf'), 'ten'):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                reprice_medicines([self.medicine.pk], percent=value)
+        self.assertFalse(PriceChange.objects.exists())
+
+
+class EditMedicineTests(TestCase):
+    def test_edit_keeps_lot_fields_moved_meanwhile(self):
+        medicine = make_medicine(stock=20)
+        opened = Medicine.objects.get(pk=medicine.pk)
+        form = MedicineForm({
+            'name': 'Paracetamol 500', 'category': opened.category, 'price': '12.00',
+            'stock_quantity': opened.stock_quantity, 'manufacture_date': opened.manufacture_date,
+            'expiry_date': opened.expiry_date,
+        }, instance=opened)
+        self.assertTrue(form.is_valid(), form.errors)
+        # A till sells while the edit page is open
+        sell_medicine(medicine.pk, 7)
+        form.save()
+
+        medicine.refresh_from_db()
+        self.assertEqual((medicine.name, medicine.price, medicine.stock_quantity), ('Paracetamol 500', Decimal('12.00'), 13))
+        self.assertEqual(sum(medicine.batches.values_list('quantity', flat=True)), 13)
+        self.assertEqual(stock_level_drift(), [])
+        self.assertEqual(calendar_drift(), [])
+
+
+class ImportMedicinesTests(TestCase):
+    FIELDS = ['name', 'category', 'price', 'stock_quantity', 'manufacture_date', 'expiry_date']
+
+    def run_import(self, *rows):
+        """Import the rows as a CSV catalog; returns the rejects file's rows"""
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        catalog, rejects = root / 'catalog.csv', root / 'rejects.csv'
+        with open(catalog, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.writer(output)
+            writer.writerow(self.FIELDS)
+            writer.writerows(rows)
+        call_command('import_medicines', str(catalog), '--rejects', str(rejects), stdout=io.StringIO())
+        with open(rejects, newline='', encoding='utf-8') as rejected:
+            return list(csv.DictReader(rejected))
+
+    def row(self, name, price='10.00', stock=20, made=-100, expires=200):
+        today = date.today()
+        return [name, 'Analgesic', price, stock, today + timedelta(days=made), today + timedelta(days=expires)]
+
+    def test_invalid_rows_are_rejected(self):
+        rejects = self.run_import(
+            self.row('Bad price', price='ten'),
+            self.row('Backdated', made=10, expires=5),
+            self.row('Ibuprofen'),
+        )
+
+        self.assertEqual([(reject['line'], reject['name']) for reject in rejects], [('2', 'Bad price'), ('3', 'Backdated')])
+        self.assertIn('price:', rejects[0]['errors'])
+        self.assertEqual(rejects[1]['errors'], 'Expiry date must be after manufacture date.')
+        self.assertEqual(list(Medicine.objects.values_list('name', flat=True)), ['Ibuprofen'])
+
+    def test_new_medicine_gets_opening_lot(self):
+        self.run_import(self.row('Ibuprofen', stock=15))
+
+        medicine = Medicine.objects.get(name='Ibuprofen')
+        lot = medicine.batches.get()
+        self.assertEqual((lot.lot_number, lot.quantity, lot.expiry_date), (OPENING_LOT, 15, medicine.expiry_date))
+        self.assertEqual(get_inventory_stats()['total_medicines'], 1)
+        self.assertEqual(stock_level_drift(), [])
+        self.assertEqual(calendar_drift(), [])
+
+    def test_existing_name_is_updated_not_duplicated(self):
+        medicine = make_medicine(name='Paracetamol', stock=20)
+        receive_batch(medicine, 'LOT2', 10, date.today() - timedelta(days=10), date.today() + timedelta(days=300))
+
+        self.run_import(self.row('Paracetamol', price='12.50', stock=8))
+
+        updated = Medicine.objects.get()
+        self.assertEqual((updated.pk, updated.price, updated.stock_quantity), (medicine.pk, Decimal('12.50'), 8))
+        # The imported stock replaces the lots
+        self.assertEqual(list(updated.batches.values_list('lot_number', 'quantity')), [(OPENING_LOT, 8)])
+        self.assertEqual(stock_level_drift(), [])
+        self.assertEqual(calendar_drift(), [])
+
+
+class FilterTests(TestCase):
+    def test_q_matches_name_prefix_in_any_case(self):
+        make_medicine(name='Paracetamol')
+        make_medicine(name='PARAFFIN oil')
+        make_medicine(name='Cough syrup with paracetamol')
+        queryset, filters = filter_medicines(Medicine.objects.order_by('name'), {'q': ' pArA '})
+        self.assertEqual(filters['q'], 'pArA')
+        self.assertEqual(list(queryset.values_list('name', flat=True)), ['PARAFFIN oil', 'Paracetamol'])
+
+
+class StockLevelTests(TestCase):
+    def test_counters_follow_every_stock_change(self):
+        plenty = make_medicine(stock=20)
+        few = make_medicine(name='Ibuprofen', stock=11)
+        stats = get_inventory_stats()
+        self.assertEqual((stats['total_medicines'], stats['low_stock'], stats['out_of_stock']), (2, 0, 0))
+
+        sell_medicine(few.pk, 1)
+        checkout([(few.pk, 10), (plenty.pk, 1)])
+        stats = get_inventory_stats()
+        self.assertEqual((stats['low_stock'], stats['out_of_stock']), (1, 1))
+
+        receive_batch(few, 'LOT2', 5, date.today() - timedelta(days=10), date.today() + timedelta(days=50))
+        adjust_stock([plenty.pk], -15)
+        adjust_stock([few.pk], 30)
+        write_off_expired_batches([few.pk], cutoff=date.today() + timedelta(days=100))
+        plenty.stock_quantity = 0
+        plenty.save()
+        make_medicine(name='Aspirin', stock=0)
+        self.assertEqual(stock_level_drift(), [])
+        stats = get_inventory_stats()
+        self.assertEqual((stats['total_medicines'], stats['low_stock'], stats['out_of_stock']), (3, 3, 3))
+
+
+class ExpiryCalendarTests(TestCase):
+    def test_calendar_matches_a_full_recompute(self):
+        medicine = make_medicine(stock=30)
+        other = make_medicine(name='Cetirizine', category='Antihistamine', stock=8, expires_in=40)
+        self.assertEqual(calendar_drift(), [])
+
+        def edit():
+            other.refresh_from_db()
+            other.price = Decimal('9.99')
+            other.save()
+
+        steps = [
+            ('sell', lambda: sell_medicine(medicine.pk, 4)),
+            ('checkout', lambda: checkout([(medicine.pk, 2), (other.pk, 3)])),
+            ('receive', lambda: receive_batch(
+                other, 'LOT2', 12, date.today() - timedelta(days=5), date.today() + timedelta(days=90),
+            )),
+            ('reprice', lambda: reprice_medicines([medicine.pk, other.pk], percent=15)),
+            ('adjust', lambda: adjust_stock([medicine.pk], -5)),
+            ('edit', edit),
+            ('write off', lambda: write_off_expired_batches([other.pk], cutoff=date.today() + timedelta(days=60))),
+            ('forget', lambda: (forget_medicines([medicine.pk]), Medicine.objects.filter(pk=medicine.pk).delete())),
+        ]
+        for name, step in steps:
+            step()
+            self.assertEqual(calendar_drift(), [], name)
+
+
+class SalesRollupTests(TestCase):
+    def test_rollups_match_a_full_recompute(self):
+        medicine = make_medicine(stock=30)
+        other = make_medicine(name='Cetirizine', category='Antihistamine', stock=20)
+
+        steps = [
+            ('sell', lambda: sell_medicine(medicine.pk, 4)),
+            ('checkout', lambda: checkout([(medicine.pk, 2), (other.pk, 3)])),
+            ('receive', lambda: receive_batch(
+                other, 'LOT2', 12, date.today() - timedelta(days=5), date.today() + timedelta(days=90),
+            )),
+            ('reprice', lambda: reprice_medicines([medicine.pk, other.pk], percent=15)),
+            ('sell repriced', lambda: checkout([(medicine.pk, 1), (other.pk, 10)])),
+            ('forget', lambda: (forget_medicines([other.pk]), Medicine.objects.filter(pk=other.pk).delete())),
+        ]
+        for name, step in steps:
+            step()
+            self.assertEqual(rollup_drift(), [], name)
+
+
+class PurgeTests(TestCase):
+    def test_counts_match_the_rows_archived(self):
+        make_medicine(name='Expired', stock=5, expires_in=-5)
+        restocked = make_medicine(name='Restocked', stock=5, expires_in=-5)
+        receive_batch(restocked, 'LOT2', 10, date.today() - timedelta(days=10), date.today() + timedelta(days=100))
+        make_medicine(name='In date', stock=5)
+
+        purge = start_purge()
+        self.assertEqual(purge.total, 2)
+        purge = run_purge(purge.pk, batch_size=1, pause=0)
+        self.assertEqual(purge.archived, ArchivedMedicine.objects.filter(purge=purge).count())
+        self.assertEqual((purge.archived, purge.kept, purge.percent), (1, 1, 100))
+        self.assertEqual(sorted(Medicine.objects.values_list('name', flat=True)), ['In date', 'Restocked'])
+        self.assertEqual(stock_level_drift(), [])
+
+
+class ReorderTests(TestCase):
+    def test_only_selling_medicines_low_on_cover_are_due(self):
+        selling = make_medicine(stock=40)
+        make_medicine(name='Unsold', stock=1)
+        sell_medicine(selling.pk, 30)
+
+        suggestions = reorder_suggestions(window_days=30, lead_time_days=7, safety_days=7, cover_days=30)
+        self.assertEqual([suggestion['id'] for suggestion in suggestions], [selling.pk])
+        due, = reorder_due(suggestions)
+        # 1 unit a day: reorder at 14 units, order 37 days' worth less the 10 left
+        self.assertEqual((due['velocity'], due['reorder_point'], due['suggested_quantity']), (1.0, 14, 27))
+        self.assertEqual(reorder_summary(suggestions), {'medicines': 1, 'units': 27, 'cost': Decimal('270.00')})
+
+
+@PLAIN_STATIC
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.medicine = make_medicine()
+        get_cash_box()
+        self.user = User.objects.create_user('manager', password='x')
+        self.group = Group.objects.create(name=MANAGER)
+        self.user.groups.add(self.group)
+        self.client.force_login(self.user)
+        self.url = reverse('medicine_dashboard')
+
+    def etag(self):
+        # The first visit may hand out the CSRF cookie the page's tokens come from
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        return response['ETag']
+
+    def test_sale_changes_etag(self):
+        etag = self.etag()
+        sell_medicine(self.medicine.pk, 1)
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_role_change_changes_etag(self):
+        etag = self.etag()
+        self.user.groups.remove(self.group)
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_new_login_changes_etag_of_form_pages(self):
+        self.url = reverse('update_stock', args=[self.medicine.pk])
+        etag = self.etag()
+        self.client.logout()
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@PLAIN_STATIC
+class RoleRevocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('manager', password='x')
+        self.group = Group.objects.create(name=MANAGER)
+        self.user.groups.add(self.group)
+        self.client.force_login(self.user)
+        self.url = reverse('add_medicine')
+
+    def test_revocation_takes_effect_at_once(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.groups.remove(self.group)
+        self.assertRedirects(self.client.get(self.url), reverse('medicine_dashboard'), fetch_redirect_response=False)
+
+    def test_revocation_reaches_workers_that_missed_it(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        # Another worker's cache still holds the tokens from before the change
+        tokens = cache.get_many([ROLES_VERSION_KEY, f'{ROLES_VERSION_KEY}:{self.user.pk}'])
+        self.user.groups.remove(self.group)
+        cache.set_many(tokens, None)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with mock.patch('inventory.roles.time.time', return_value=time.time() + ROLES_SESSION_TTL):
+            self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class SearchIndexTests(TransactionTestCase):
+    def test_stale_index_answers_while_a_thread_rebuilds_it(self):
+        index = MedicineSearchIndex()
+        make_medicine(name='Amoxicillin')
+        self.assertEqual(len(index.search('amox')), 1)
+
+        # Written by "another process": no signal reaches this index
+        Medicine.objects.bulk_create([Medicine(
+            name='Amoxil', category='Antibiotic', price=Decimal('5.00'), stock_quantity=0,
+            manufacture_date=date.today(), expiry_date=date.today() + timedelta(days=100),
+        )])
+        index.invalidate()
+        # Holding the lock keeps the thread from swapping before we look
+        with index._lock:
+            self.assertEqual(len(index.search('amox')), 1)
+            refresher = index._refresher
+        refresher.join()
+        self.assertEqual(len(index.search('amox')), 2)
+
+
+class VendorAssetsTests(TestCase):
+    CONTENT = b'body{}\n/*# sourceMappingURL=bootstrap.min.css.map */'
+    PATH = 'vendor/bootstrap/bootstrap.min.css'
+
+    def vendor(self, pins, *args):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root)
+        lock = root / 'vendor-lock.json'
+        lock.write_text(json.dumps(pins))
+        command = 'inventory.management.commands.vendor_assets'
+        with mock.patch(f'{command}.VENDOR_FILES', {self.PATH: 'https://cdn.example/bootstrap.min.css'}), \
+                mock.patch(f'{command}.VENDOR_ROOT', root), mock.patch(f'{command}.VENDOR_LOCK', lock), \
+                mock.patch('inventory.assets.VENDOR_LOCK', lock), \
+                mock.patch('urllib.request.urlopen', return_value=io.BytesIO(self.CONTENT)):
+            call_command('vendor_assets', *args, stdout=io.StringIO())
+        return root / self.PATH, json.loads(lock.read_text())
+
+    def test_pinned_download_is_vendored_without_its_source_map(self):
+        integrity = 'sha384-' + base64.b64encode(hashlib.sha384(self.CONTENT).digest()).decode()
+        target, _ = self.vendor({self.PATH: integrity})
+        self.assertEqual(target.read_bytes(), b'body{}')
+
+    def test_mismatched_download_is_refused(self):
+        with self.assertRaisesMessage(CommandError, 'does not match its pinned hash'):
+            self.vendor({self.PATH: 'sha384-tampered'})
+
+    def test_unpinned_download_needs_pin(self):
+        with self.assertRaisesMessage(CommandError, 'has no pinned hash'):
+            self.vendor({})
+        target, pins = self.vendor({}, '--pin')
+        self.assertTrue(target.is_file())
+        self.assertTrue(pins[self.PATH].startswith('sha384-'))
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth.views import LogoutView
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Authentication
@@ -10,11 +10,26 @@ urlpatterns = [
     # Medicine Management
     path('', views.MedicineDashboardView.as_view(), name='medicine_dashboard'),
     path('medicines/', views.MedicineListView.as_view(), name='medicine_list'),
+    path('medicines/export/<str:fmt>/', views.export_medicines, name='export_medicines'),
+    path('medicines/reprice/', views.bulk_reprice, name='bulk_reprice'),
+    path('reports/expiry/', views.expiry_report, name='expiry_report'),
+    path('reports/reorder/', views.reorder_report, name='reorder_report'),
+    path('reports/sales/', views.sales_report, name='sales_report'),
     path('search/', views.search_medicine, name='search_medicine'),
+    path('search/autocomplete/', views.search_autocomplete, name='search_autocomplete'),
     path('add/', views.AddMedicineView.as_view(), name='add_medicine'),
     path('edit/<int:pk>/', views.EditMedicineView.as_view(), name='edit_medicine'),
+    path('receive/<int:pk>/', views.receive_stock, name='receive_stock'),
     path('delete-expired/', views.delete_all_expired, name='delete_expired'),
+    path('delete-expired/<int:pk>/', views.purge_status, name='purge_status'),
     path('update-stock/<int:pk>/', views.update_stock, name='update_stock'),
+    path('checkout/', views.checkout_cart, name='checkout'),
+    
+    # JSON API (async)
+    path('api/medicines/', api.medicine_list, name='api_medicine_list'),
+    path('api/medicines/<int:pk>/', api.medicine_detail, name='api_medicine'),
+    path('api/stock/', api.stock_status, name='api_stock_status'),
+    path('api/stats/', api.inventory_stats, name='api_stats'),
     
     # Employee Management
     path('employees/', views.employee_list, name='employee_list'),
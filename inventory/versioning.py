@@ -0,0 +1,135 @@
+"""
+The inventory version marker, and conditional GET for the read views.
+
+The version combines the InventoryVersion row, which catalog writes bump
+inside their own transaction, with the ids of the newest sale and the
+newest lot: the ledgers are append-only, so the tills and goods-in never
+queue on the marker row, yet every sale or delivery still moves the
+version. Views wrapped in inventory_conditional() answer If-None-Match and
+If-Modified-Since from the marker alone: one primary-key read and two
+index probes, then a 304
+without running the view's queries or rendering anything.
+"""
+import hashlib
+from datetime import date, datetime, time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.contrib.messages import get_messages
+from django.db.models import F, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .models import InventoryVersion, Sale, StockBatch
+from .roles import aresolve_roles, get_roles
+
+
+MARKER_PK = 1
+
+
+def bump_inventory_version():
+    """Record an inventory change; call it inside the writing transaction"""
+    now = timezone.now()
+    updated = InventoryVersion.objects.filter(pk=MARKER_PK).update(version=F('version') + 1, updated_at=now)
+    if not updated:
+        InventoryVersion.objects.get_or_create(pk=MARKER_PK, defaults={'version': 1, 'updated_at': now})
+
+
+def _marker():
+    newest_sale = Sale.objects.order_by('-pk')
+    newest_batch = StockBatch.objects.order_by('-pk')
+    return InventoryVersion.objects.filter(pk=MARKER_PK).annotate(
+        sale=Subquery(newest_sale.values('pk')[:1]),
+        sold_at=Subquery(newest_sale.values('sold_at')[:1]),
+        batch=Subquery(newest_batch.values('pk')[:1]),
+        received_at=Subquery(newest_batch.values('received_at')[:1]),
+    ).values_list('version', 'updated_at', 'sale', 'sold_at', 'batch', 'received_at')
+
+
+def _version(row):
+    if row is None:
+        return None
+    version, updated_at, sale, sold_at, batch, received_at = row
+    changed_at = max(moment for moment in (updated_at, sold_at, received_at) if moment is not None)
+    return f'{version}.{sale or 0}.{batch or 0}', changed_at
+
+
+def inventory_version():
+    """(version, updated_at) of the last inventory change, None before the first"""
+    return _version(_marker().first())
+
+
+async def ainventory_version():
+    """inventory_version() for async views"""
+    return _version(await _marker().afirst())
+
+
+def validators(marker, user, roles, csrf_secret=''):
+    """
+    (ETag, Last-Modified timestamp) of a page as `user` with `roles` sees
+    it at `marker`.
+
+    Pages differ per user and per role, their forms embed a token derived
+    from the CSRF secret, which login rotates, and expiry statuses turn
+    over at midnight, so the ETag carries all four, and Last-Modified is
+    never older than the user's last login or the start of today.
+    """
+    version, updated_at = marker
+    today = date.today()
+    csrf = hashlib.md5(csrf_secret.encode()).hexdigest()[:8]
+    etag = quote_etag(f'{version}-{user.pk}-{roles.token}-{csrf}-{today.isoformat()}')
+    last_modified = max(
+        updated_at,
+        timezone.make_aware(datetime.combine(today, time.min)),
+        user.last_login or updated_at,
+    )
+    return etag, int(last_modified.timestamp())
+
+
+def _with_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Browsers keep the page but check back on every visit
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def inventory_conditional(view):
+    """
+    Decorate a read view (sync or async) to answer conditional GETs from
+    the inventory version. Anonymous requests, other methods and pages
+    with flash messages waiting to be shown always reach the view.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            user = await request.auser()
+            marker = await ainventory_version() if user.is_authenticated else None
+            if marker is None:
+                return await view(request, *args, **kwargs)
+            etag, last_modified = validators(
+                marker, user, await aresolve_roles(request), request.META.get('CSRF_COOKIE', ''),
+            )
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _with_validators(response, etag, last_modified)
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated or get_messages(request):
+            return view(request, *args, **kwargs)
+        marker = inventory_version()
+        if marker is None:
+            return view(request, *args, **kwargs)
+        etag, last_modified = validators(
+            marker, request.user, get_roles(request), request.META.get('CSRF_COOKIE', ''),
+        )
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return _with_validators(response, etag, last_modified)
+    return wrapper
@@ -2,16 +2,35 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, CreateView, DeleteView, UpdateView
 from django.urls import reverse_lazy
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
-from datetime import date
+from datetime import date, timedelta
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.models import User, Group
-from django.http import HttpResponseForbidden
-from .models import Medicine
-from .forms import MedicineForm
+from django.http import Http404, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from django.core.paginator import Paginator
+from .models import ExpiryPurge, Medicine, PriceChange
+from .forms import MedicineForm, NewMedicineForm, PriceChangeForm, StockBatchForm
+from .sales import CartUnavailable, InsufficientStock, checkout, get_cash_box, sell_medicine
+from .stats import LOW_STOCK_THRESHOLD, get_inventory_stats
+from .search import EXACT_MATCH_SCORE, search_index
+from .expressions import DaysUntil
+from .pagination import KeysetPaginator
+from .filters import STATUS_CHOICES, filter_medicines
+from .exports import EXPORT_FORMATS, export_rows
+from .purge import active_purge, expired_medicines, run_purge_in_background, start_purge
+from .batches import in_stock_batches, opening_batch, receive_batch
+from .expiry_calendar import PERIODS, expiry_horizon
+from .versioning import inventory_conditional
+from .fragments import render_medicine_rows
+from .rollups import category_sales, month_start, revenue_by_day, revenue_by_month, sales_summary, top_sellers
+from .bulk import price_change_medicines, reprice_medicines, repriced
+from .reorder import VELOCITY_WINDOW_DAYS, WINDOW_CHOICES, reorder_due, reorder_suggestions, reorder_summary
 
 
 class CustomLoginView(LoginView):
@@ -20,6 +39,7 @@ class CustomLoginView(LoginView):
     redirect_authenticated_user = True
 
 
+@method_decorator(inventory_conditional, name='dispatch')
 class MedicineDashboardView(LoginRequiredMixin, ListView):
     """Display all medicines in the inventory - Login Required"""
     model = Medicine
@@ -28,34 +48,46 @@ class MedicineDashboardView(LoginRequiredMixin, ListView):
     paginate_by = 20
     ordering = ['-id']
     
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination on -id: no COUNT of the catalog, and deep pages stay cheap"""
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.ordering)
+        page = paginator.page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['total_medicines'] = Medicine.objects.count()
-        context['low_stock'] = Medicine.objects.filter(stock_quantity__lte=10).count()
-        context['expired'] = Medicine.objects.filter(expiry_date__lt=date.today()).count()
+        context.update(get_inventory_stats())
         context['today'] = date.today()
-        from .models import CashBox
-        cash_box = CashBox.objects.first()
-        context['cash_box'] = cash_box
+        context['cash_box'] = get_cash_box()
+        context['medicine_rows'] = render_medicine_rows(
+            context['medicines'], 'inventory/rows/dashboard_row.html', self.request.roles, context['today'],
+        )
         return context
 
 
 class AddMedicineView(LoginRequiredMixin, CreateView):
     """Form view to add new medicine stock - Manager Only"""
     model = Medicine
-    form_class = MedicineForm
+    form_class = NewMedicineForm
     template_name = 'inventory/add_medicine.html'
     success_url = reverse_lazy('medicine_dashboard')
     
     def form_valid(self, form):
         messages.success(self.request, f'Medicine "{form.instance.name}" added successfully!')
-        return super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            if self.object.stock_quantity > 0:
+                opening_batch(self.object, form.cleaned_data['lot_number']).save()
+        return response
     
     def dispatch(self, request, *args, **kwargs):
         # Check if user has permission to add medicines - MANAGER ONLY
         if not request.user.is_authenticated:
             return self.handle_no_permission()
-        if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+        if not request.roles.is_manager:
             messages.error(request, 'Only Managers have permission to add medicines.')
             return redirect('medicine_dashboard')
         return super().dispatch(request, *args, **kwargs)
@@ -77,18 +109,47 @@ class EditMedicineView(LoginRequiredMixin, UpdateView):
         # Check if user has permission to change medicines - MANAGER ONLY
         if not request.user.is_authenticated:
             return self.handle_no_permission()
-        if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+        if not request.roles.is_manager:
             messages.error(request, 'Only Managers have permission to edit medicines.')
             return redirect('medicine_dashboard')
         return super().dispatch(request, *args, **kwargs)
 
 
 @login_required
+def receive_stock(request, pk):
+    """Receive a new lot of a medicine - Manager Only"""
+    if not request.roles.is_manager:
+        messages.error(request, 'Only Managers have permission to receive stock.')
+        return redirect('medicine_dashboard')
+    
+    medicine = get_object_or_404(Medicine, pk=pk)
+    
+    if request.method == 'POST':
+        form = StockBatchForm(request.POST)
+        if form.is_valid():
+            batch = receive_batch(medicine, **form.cleaned_data)
+            messages.success(request, f'Received {batch.quantity} units of "{medicine.name}" (lot {batch.lot_number}, expires {batch.expiry_date:%b %d, %Y}).')
+            return redirect('receive_stock', pk=medicine.pk)
+    else:
+        form = StockBatchForm()
+    
+    context = {
+        'medicine': medicine,
+        'form': form,
+        'batches': in_stock_batches(medicine.pk),
+        'today': date.today(),
+    }
+    return render(request, 'inventory/receive_stock.html', context)
+
+
+@login_required
+@inventory_conditional
 def search_medicine(request):
-    """Search for medicines by name and display details - Login Required"""
+    """Search for medicines by name or category and display details - Login Required"""
     context = {
         'searched': False,
         'medicine': None,
+        'results': [],
         'query': ''
     }
     
@@ -98,16 +159,25 @@ def search_medicine(request):
         context['searched'] = True
         
         if query:
-            # Search for medicine (case-insensitive)
-            try:
-                medicine = Medicine.objects.get(name__iexact=query)
+            # Rank matches through the trigram index, then load only the
+            # medicines on the requested page
+            ranked = search_index.search(query)
+            page = Paginator(ranked, 20).get_page(request.GET.get('page'))
+            medicines = Medicine.objects.in_bulk([pk for pk, _ in page])
+            results = [medicines[pk] for pk, _ in page if pk in medicines]
+            context['results'] = results
+            context['page_obj'] = page
+            
+            # Show the detail card when the best match is the exact name
+            if page.number == 1 and results and page[0][1] == EXACT_MATCH_SCORE:
+                medicine = results[0]
                 context['medicine'] = medicine
                 
                 # Determine stock status
                 if medicine.stock_quantity == 0:
                     context['stock_status'] = 'Out of Stock'
                     context['stock_class'] = 'danger'
-                elif medicine.stock_quantity <= 10:
+                elif medicine.stock_quantity <= LOW_STOCK_THRESHOLD:
                     context['stock_status'] = 'Low Stock'
                     context['stock_class'] = 'warning'
                 else:
@@ -116,18 +186,26 @@ def search_medicine(request):
                 
                 # Check if expired
                 context['is_expired'] = medicine.expiry_date < date.today()
-                
-            except Medicine.DoesNotExist:
+            
+            if not ranked:
                 messages.warning(request, f'Medicine "{query}" not found in inventory.')
-            except Medicine.MultipleObjectsReturned:
-                # If multiple medicines with same name, get the first one
-                medicine = Medicine.objects.filter(name__iexact=query).first()
-                context['medicine'] = medicine
-                messages.info(request, 'Multiple medicines found with this name. Showing the first match.')
     
+    context['today'] = date.today()
     return render(request, 'inventory/search_medicine.html', context)
 
 
+@login_required
+@inventory_conditional
+def search_autocomplete(request):
+    """JSON name suggestions for the search box, answered from the index - Login Required"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return JsonResponse({'query': query, 'results': search_index.suggest(query, limit=limit)})
+
+
 class DeleteExpiredMedicinesView(DeleteView):
     """View to delete expired medicines"""
     model = Medicine
@@ -144,85 +222,292 @@ class DeleteExpiredMedicinesView(DeleteView):
         return context
 
 
+# Expired medicines listed on the purge confirmation page.
+EXPIRED_PREVIEW_ROWS = 50
+
+
 @login_required
 @permission_required('inventory.delete_medicine', raise_exception=True)
 def delete_all_expired(request):
-    """Delete all expired medicines at once - Manager Only"""
+    """Archive all expired medicines in the background - Manager Only"""
     # Check if user is in Manager group
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not request.roles.is_manager:
         messages.error(request, 'Only Managers have permission to delete medicines.')
         return redirect('medicine_dashboard')
     
     if request.method == 'POST':
-        expired_medicines = Medicine.objects.filter(expiry_date__lt=date.today())
-        count = expired_medicines.count()
-        
-        if count > 0:
-            expired_medicines.delete()
-            messages.success(request, f'Successfully deleted {count} expired medicine(s).')
-        else:
-            messages.info(request, 'No expired medicines found.')
-        
-        return redirect('medicine_dashboard')
+        purge = active_purge()
+        if purge is None:
+            if not expired_medicines().exists():
+                messages.info(request, 'No expired medicines found.')
+                return redirect('medicine_dashboard')
+            purge = start_purge(request.user)
+            messages.success(request, f'Archiving {purge.total} expired medicine(s) in the background.')
+        # Resumes a failed or abandoned purge; one still running elsewhere is left alone
+        run_purge_in_background(purge)
+        return redirect('purge_status', pk=purge.pk)
     
     # If GET request, show confirmation page
-    expired_medicines = Medicine.objects.filter(expiry_date__lt=date.today())
+    expired = expired_medicines()
     context = {
-        'expired_medicines': expired_medicines,
-        'count': expired_medicines.count()
+        'expired_medicines': expired.order_by('expiry_date', 'id')[:EXPIRED_PREVIEW_ROWS],
+        'count': expired.count(),
+        'active_purge': active_purge(),
     }
     return render(request, 'inventory/confirm_delete_expired.html', context)
 
 
+@login_required
+@permission_required('inventory.delete_medicine', raise_exception=True)
+def purge_status(request, pk):
+    """Progress of an expired-stock purge - Manager Only"""
+    if not request.roles.is_manager:
+        messages.error(request, 'Only Managers have permission to delete medicines.')
+        return redirect('medicine_dashboard')
+    
+    purge = get_object_or_404(ExpiryPurge, pk=pk)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'status': purge.status,
+            'total': purge.total,
+            'archived': purge.archived,
+            'kept': purge.kept,
+            'percent': purge.percent,
+            'error': purge.error,
+        })
+    return render(request, 'inventory/purge_status.html', {'purge': purge})
+
+
+@method_decorator(inventory_conditional, name='dispatch')
 class MedicineListView(LoginRequiredMixin, ListView):
     """Display all medicines in a detailed table with expiry highlighting - Login Required"""
     model = Medicine
     template_name = 'inventory/medicine_list.html'
     context_object_name = 'medicines'
     paginate_by = 50
-    ordering = ['expiry_date']  # Order by expiry date to show expiring items first
+    ordering = ['expiry_date', 'id']  # Order by expiry date to show expiring items first
     
     def get_queryset(self):
-        queryset = super().get_queryset()
-        # Annotate each medicine with days until expiry
-        from datetime import timedelta
-        for medicine in queryset:
-            delta = medicine.expiry_date - date.today()
-            medicine.days_until_expiry = delta.days
-        return queryset
+        # Days until expiry is computed by the database, and only for the
+        # rows of the page being shown
+        queryset, self.filters = filter_medicines(super().get_queryset(), self.request.GET)
+        return queryset.annotate(days_until_expiry=DaysUntil('expiry_date'))
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination on (expiry_date, id) so deep pages stay cheap"""
+        paginator = KeysetPaginator(queryset, page_size, ordering=self.ordering)
+        page = paginator.page(
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return (paginator, page, page.object_list, page.has_other_pages())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        today = date.today()
-        from datetime import timedelta
-        thirty_days_later = today + timedelta(days=30)
-        
-        context['total_medicines'] = Medicine.objects.count()
-        context['expired'] = Medicine.objects.filter(expiry_date__lt=today).count()
-        context['expiring_soon'] = Medicine.objects.filter(
-            expiry_date__gte=today,
-            expiry_date__lte=thirty_days_later
-        ).count()
-        context['low_stock'] = Medicine.objects.filter(stock_quantity__lte=10).count()
-        context['today'] = today
+        context.update(get_inventory_stats())
+        context['today'] = date.today()
+        context['medicine_rows'] = render_medicine_rows(
+            context['medicines'], 'inventory/rows/medicine_list_row.html', self.request.roles, context['today'],
+        )
+        context['filters'] = self.filters
+        context['filter_query'] = urlencode({key: value for key, value in self.filters.items() if value})
+        context['status_choices'] = STATUS_CHOICES
         return context
 
 
+# Horizons offered on the expiry report, in months.
+EXPIRY_HORIZONS = [3, 6, 12, 24, 60]
+
+
+@login_required
+@inventory_conditional
+def expiry_report(request):
+    """Medicines, units and value expiring per day, week or month - Login Required"""
+    period = request.GET.get('period')
+    if period not in PERIODS:
+        period = 'month'
+    try:
+        months = int(request.GET.get('months', 12))
+    except ValueError:
+        months = 12
+    if months not in EXPIRY_HORIZONS:
+        months = 12
+    
+    rows = expiry_horizon(period, months)
+    context = {
+        'expired': rows[0],
+        'rows': rows[1:],
+        'period': period,
+        'periods': PERIODS,
+        'months': months,
+        'horizons': EXPIRY_HORIZONS,
+        'today': date.today(),
+    }
+    return render(request, 'inventory/expiry_report.html', context)
+
+
+# Medicines listed on the reorder report, most urgent first.
+REORDER_REPORT_ROWS = 200
+
+
+@login_required
+@inventory_conditional
+def reorder_report(request):
+    """Medicines due for reorder, with sales velocity and days of cover - Manager Only"""
+    if not request.roles.is_manager:
+        messages.error(request, 'Only Managers have permission to view reorder suggestions.')
+        return redirect('medicine_dashboard')
+    
+    try:
+        window = int(request.GET.get('window', VELOCITY_WINDOW_DAYS))
+    except ValueError:
+        window = VELOCITY_WINDOW_DAYS
+    if window not in WINDOW_CHOICES:
+        window = VELOCITY_WINDOW_DAYS
+    
+    suggestions = reorder_suggestions(window_days=window)
+    context = {
+        'medicines': reorder_due(suggestions)[:REORDER_REPORT_ROWS],
+        'summary': reorder_summary(suggestions),
+        'window': window,
+        'windows': WINDOW_CHOICES,
+        'max_rows': REORDER_REPORT_ROWS,
+    }
+    return render(request, 'inventory/reorder_report.html', context)
+
+
+# Months of history offered on the sales report.
+SALES_REPORT_MONTHS = [1, 3, 6, 12, 24, 60]
+
+# Days of daily revenue and number of top sellers shown on the sales report.
+SALES_REPORT_DAYS = 30
+TOP_SELLERS = 20
+
+
+@login_required
+@inventory_conditional
+def sales_report(request):
+    """Revenue per day and month, sales per category and top sellers - Manager Only"""
+    if not request.roles.is_manager:
+        messages.error(request, 'Only Managers have permission to view sales reports.')
+        return redirect('medicine_dashboard')
+    
+    try:
+        months = int(request.GET.get('months', 12))
+    except ValueError:
+        months = 12
+    if months not in SALES_REPORT_MONTHS:
+        months = 12
+    
+    today = timezone.localdate()
+    since_month = month_start(today, months - 1)
+    context = {
+        'summary': sales_summary(since_month),
+        'monthly': revenue_by_month(since_month),
+        'daily': revenue_by_day(today - timedelta(days=SALES_REPORT_DAYS - 1)),
+        'categories': category_sales(since_month),
+        'top_sellers': top_sellers(since_month, TOP_SELLERS),
+        'since_month': since_month,
+        'months': months,
+        'month_choices': SALES_REPORT_MONTHS,
+        'days': SALES_REPORT_DAYS,
+    }
+    return render(request, 'inventory/sales_report.html', context)
+
+
+# Medicines listed in the bulk repricing preview, and past changes shown.
+PRICE_PREVIEW_ROWS = 50
+RECENT_PRICE_CHANGES = 10
+
+
+@login_required
+@inventory_conditional
+def bulk_reprice(request):
+    """Preview, then apply, one price change to many medicines - Manager Only"""
+    if not request.roles.is_manager:
+        messages.error(request, 'Only Managers have permission to change prices.')
+        return redirect('medicine_dashboard')
+    
+    form = PriceChangeForm(request.POST if request.method == 'POST' else request.GET or None)
+    preview = None
+    if form.is_valid():
+        medicines = price_change_medicines(**form.limits)
+        if request.method == 'POST':
+            change = reprice_medicines(medicines.values('pk'), changed_by=request.user, **form.change, **form.limits)
+            if change.medicines:
+                messages.success(request, f'Repriced {change.medicines} medicine(s) by {change.adjustment}.')
+            else:
+                messages.info(request, 'No medicine prices were changed.')
+            return redirect('bulk_reprice')
+        
+        changed = repriced(medicines, **form.change)
+        count = changed.count()
+        preview = {
+            'medicines': changed.order_by('name', 'id')[:PRICE_PREVIEW_ROWS],
+            'count': count,
+            'skipped': medicines.count() - count,
+        }
+    
+    context = {
+        'form': form,
+        'preview': preview,
+        'recent_changes': PriceChange.objects.select_related('changed_by')[:RECENT_PRICE_CHANGES],
+    }
+    return render(request, 'inventory/bulk_reprice.html', context)
+
+
+@login_required
+@inventory_conditional
+def export_medicines(request, fmt):
+    """Stream the (filtered) medicine list as CSV or JSON Lines - Login Required"""
+    if fmt not in EXPORT_FORMATS:
+        raise Http404('Unknown export format')
+    
+    queryset, _ = filter_medicines(Medicine.objects.all(), request.GET)
+    render_lines, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(render_lines(export_rows(queryset)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="medicines-{date.today().isoformat()}.{fmt}"'
+    return response
+
+
 @login_required
 def employee_list(request):
-    """Display all employees - Manager Only"""
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    """Display employees with search and pagination - Manager Only"""
+    if not request.roles.is_manager:
         messages.error(request, 'Only Managers have permission to view employees.')
         return redirect('medicine_dashboard')
     
-    employees = User.objects.all().order_by('-date_joined')
-    return render(request, 'inventory/employee_list.html', {'employees': employees})
+    # Users, their Pharmacist profile and their groups in a fixed number of
+    # queries regardless of page size
+    employees = (
+        User.objects.select_related('pharmacist')
+        .prefetch_related('groups')
+        .order_by('-date_joined', '-id')
+    )
+    query = request.GET.get('q', '').strip()
+    if query:
+        employees = employees.filter(
+            Q(username__icontains=query)
+            | Q(first_name__icontains=query)
+            | Q(last_name__icontains=query)
+            | Q(email__icontains=query)
+            | Q(pharmacist__employee_id__iexact=query)
+        )
+    
+    page_obj = Paginator(employees, 25).get_page(request.GET.get('page'))
+    context = {
+        'employees': page_obj.object_list,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'query': query,
+    }
+    return render(request, 'inventory/employee_list.html', context)
 
 
 @login_required
 def add_employee(request):
     """Add new employee - Manager Only"""
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not request.roles.is_manager:
         messages.error(request, 'Only Managers have permission to add employees.')
         return redirect('medicine_dashboard')
     
@@ -250,7 +535,7 @@ def add_employee(request):
 @login_required
 def edit_employee(request, pk):
     """Edit existing employee - Manager Only"""
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not request.roles.is_manager:
         messages.error(request, 'Only Managers have permission to edit employees.')
         return redirect('medicine_dashboard')
     
@@ -281,7 +566,7 @@ def edit_employee(request, pk):
 @login_required
 def delete_employee(request, pk):
     """Delete employee - Manager Only"""
-    if not (request.user.groups.filter(name='Manager').exists() or request.user.is_superuser):
+    if not request.roles.is_manager:
         messages.error(request, 'Only Managers have permission to delete employees.')
         return redirect('medicine_dashboard')
     
@@ -298,33 +583,83 @@ def delete_employee(request, pk):
 
 
 @login_required
+@inventory_conditional
 def update_stock(request, pk):
     """Update medicine stock after sale - Staff can use this"""
-    from .models import CashBox
     medicine = get_object_or_404(Medicine, pk=pk)
-    cash_box = CashBox.objects.first()
-    if not cash_box:
-        # Create a cash box if not exists
-        cash_box = CashBox.objects.create(current_cash=0)
     
     if request.method == 'POST':
-        sold_quantity = int(request.POST.get('sold_quantity', 0))
+        try:
+            sold_quantity = int(request.POST.get('sold_quantity', 0))
+        except (TypeError, ValueError):
+            sold_quantity = 0
         
         if sold_quantity <= 0:
             messages.error(request, 'Sold quantity must be greater than 0.')
-        elif sold_quantity > medicine.stock_quantity:
-            messages.error(request, f'Cannot sell {sold_quantity} units. Only {medicine.stock_quantity} units available.')
         else:
-            medicine.stock_quantity -= sold_quantity
-            medicine.save()
-            # Add cash to cash box
-            total_sale = sold_quantity * medicine.price
-            cash_box.current_cash += total_sale
-            cash_box.save()
-            messages.success(request, f'Stock updated! Sold {sold_quantity} units of "{medicine.name}". Remaining: {medicine.stock_quantity}. Cash in box: ₹{cash_box.current_cash}')
+            try:
+                sale = sell_medicine(medicine.pk, sold_quantity, user=request.user)
+            except InsufficientStock as exc:
+                messages.error(request, str(exc))
+            except Medicine.DoesNotExist:
+                messages.error(request, 'This medicine no longer exists.')
+            else:
+                medicine = sale.medicine
+                cash_box = get_cash_box()
+                messages.success(request, f'Stock updated! Sold {sold_quantity} units of "{medicine.name}". Remaining: {medicine.stock_quantity}. Cash in box: ₹{cash_box.balance}')
         
         return redirect('medicine_dashboard')
     
+    cash_box = get_cash_box()
     return render(request, 'inventory/update_stock.html', {'medicine': medicine, 'cash_box': cash_box})
 
 
+# Lines accepted in one checkout.
+MAX_CART_LINES = 100
+
+
+@login_required
+@inventory_conditional
+def checkout_cart(request):
+    """Sell several medicines to one customer in a single transaction - Staff can use this"""
+    if request.method == 'POST':
+        medicine_ids = request.POST.getlist('medicine')
+        quantities = request.POST.getlist('quantity')
+        try:
+            lines = [(int(pk), int(quantity)) for pk, quantity in zip(medicine_ids, quantities, strict=True)]
+        except ValueError:
+            lines = None
+            messages.error(request, 'Every cart line needs a medicine and a whole quantity.')
+        
+        if lines is not None:
+            if len(lines) > MAX_CART_LINES:
+                messages.error(request, f'A checkout can have at most {MAX_CART_LINES} lines.')
+            else:
+                try:
+                    cart = checkout(lines, user=request.user)
+                except (ValueError, CartUnavailable) as exc:
+                    messages.error(request, str(exc))
+                except Medicine.DoesNotExist:
+                    messages.error(request, 'A medicine in the cart no longer exists.')
+                else:
+                    cash_box = get_cash_box()
+                    messages.success(request, f'Checkout #{cart.pk} complete: {cart.line_count} medicine(s) sold for ₹{cart.total}. Cash in box: ₹{cash_box.balance}')
+                    return redirect('checkout')
+        # Nothing was sold; show the cart again so it can be corrected
+        cart_lines = list(zip(medicine_ids, quantities))
+    else:
+        cart_lines = [(pk, 1) for pk in request.GET.getlist('add')]
+    
+    wanted = {int(pk) for pk, _ in cart_lines if str(pk).isdigit()}
+    medicines = Medicine.objects.in_bulk(wanted) if wanted else {}
+    lines = [
+        {'medicine': medicines[int(pk)], 'quantity': quantity}
+        for pk, quantity in cart_lines
+        if str(pk).isdigit() and int(pk) in medicines
+    ]
+    context = {
+        'lines': lines,
+        'cash_box': get_cash_box(),
+        'max_lines': MAX_CART_LINES,
+    }
+    return render(request, 'inventory/checkout.html', context)
@@ -2,6 +2,9 @@
 ASGI config for pharmacy_pro project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn pharmacy_pro.asgi:application``)
+so the async JSON API in inventory.api runs on the event loop; the HTML
+views work here too.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -15,9 +15,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
+from inventory.assets import serve_static
+from inventory.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path(f'{settings.STATIC_URL.lstrip("/")}<path:path>', serve_static, name='static'),
     path('', include('inventory.urls')),
 ]